@@ -5,58 +5,308 @@ Autor: André Rizzo
 """
 
 import os
+import asyncio
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Importar funções de consulta
 from poc_queries import (
     search_books_for_summary,
+    get_top_books_for_summary,
     get_book_info,
-    get_all_reviews_for_book
+    get_top_reviews_for_summary
 )
 
 # Tentar importar OpenAI
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI, RateLimitError
     from dotenv import load_dotenv
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Carregar .env uma única vez, na importação do módulo
+if OPENAI_AVAILABLE:
+    load_dotenv(override=True)
+
+# Cliente síncrono reutilizado por todo o processo (mantém o pool HTTP aquecido)
+_OPENAI_CLIENT = None
+
 
 def setup_openai():
-    """Configura cliente OpenAI."""
+    """Configura cliente OpenAI (criado uma vez e reutilizado)."""
+    global _OPENAI_CLIENT
+    
+    if not OPENAI_AVAILABLE:
+        return None, "OpenAI não instalado. Execute: pip install openai python-dotenv"
+    
+    if _OPENAI_CLIENT is not None:
+        return _OPENAI_CLIENT, "OpenAI configurado com sucesso"
+    
+    try:
+        api_key = os.getenv("OPENAI_API_KEY")
+        
+        if not api_key:
+            return None, "OPENAI_API_KEY não encontrada. Crie arquivo .env com sua chave"
+        
+        _OPENAI_CLIENT = OpenAI(api_key=api_key)
+        return _OPENAI_CLIENT, "OpenAI configurado com sucesso"
+        
+    except Exception as e:
+        return None, f"Erro ao configurar OpenAI: {e}"
+
+
+def setup_async_openai():
+    """
+    Configura cliente OpenAI assíncrono (pré-cálculo em massa, ver
+    aprocess_requests_rate_limited).
+    
+    Chamado uma vez por execução e não reutilizado entre elas: o pool de
+    conexões fica preso ao event loop que o criou, e cada asyncio.run()
+    abre um loop novo.
+    """
     if not OPENAI_AVAILABLE:
         return None, "OpenAI não instalado. Execute: pip install openai python-dotenv"
     
     try:
-        load_dotenv(override=True)
         api_key = os.getenv("OPENAI_API_KEY")
         
         if not api_key:
             return None, "OPENAI_API_KEY não encontrada. Crie arquivo .env com sua chave"
         
-        client = OpenAI(api_key=api_key)
+        client = AsyncOpenAI(api_key=api_key)
         return client, "OpenAI configurado com sucesso"
         
     except Exception as e:
         return None, f"Erro ao configurar OpenAI: {e}"
 
 
+# =================
+# CACHE DE RESUMOS
+# =================
+
+# Banco de livros padrão; as funções de geração recebem db_path
+SUMMARY_CACHE_DB = "books_database.db"
+
+# Os resumos ficam em um arquivo SQLite próprio, ao lado do banco de livros:
+# sobrevivem a reinícios e são compartilhados por todos os processos/workers,
+# sem que as gravações mudem o mtime do banco de livros (que é a chave dos
+# caches e das conexões do dashboard)
+SUMMARY_CACHE_FILE = "ai_summaries.db"
+SUMMARY_CACHE_MAX_ENTRIES = 10_000
+
+# Conexão do cache reaproveitada entre leituras/gravações: {caminho absoluto:
+# (inode, conexão)}. Usada só com _SUMMARY_CACHE_LOCK (as gerações em
+# paralelo gravam de várias threads)
+_SUMMARY_CONNECTIONS = {}
+_SUMMARY_CACHE_LOCK = threading.Lock()
+
+
+def _open_summary_cache(db_path=SUMMARY_CACHE_DB):
+    """
+    Conexão com o cache de resumos do banco db_path (SUMMARY_CACHE_FILE no
+    mesmo diretório), criando o arquivo e a tabela ai_summaries se preciso.
+    
+    A conexão é aberta uma vez e reaproveitada (cache de páginas e de
+    statements aquecidos); se o arquivo for recriado, uma nova é aberta.
+    Chamar com _SUMMARY_CACHE_LOCK adquirido e não fechar a conexão.
+    
+    Retorna None se o banco de livros não existir.
+    """
+    if not os.path.exists(db_path):
+        return None
+    
+    abs_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), SUMMARY_CACHE_FILE)
+    # inode em vez de mtime: as próprias gravações do cache mudam o mtime.
+    # Arquivo ainda inexistente: será criado pela conexão abaixo
+    inode = os.stat(abs_path).st_ino if os.path.exists(abs_path) else None
+    
+    cached = _SUMMARY_CONNECTIONS.get(abs_path)
+    if cached is not None and cached[0] == inode:
+        return cached[1]
+    
+    # Arquivo recriado: a conexão antiga aponta para o inode removido
+    if cached is not None:
+        cached[1].close()
+    
+    conn = sqlite3.connect(abs_path, timeout=30, check_same_thread=False)
+    if inode is None:
+        inode = os.stat(abs_path).st_ino
+    
+    # Uma vez por conexão (banco novo pode não ter a tabela)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ai_summaries (
+            book_title TEXT,
+            sentiment TEXT,
+            reviews_hash TEXT,
+            summary TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (book_title, sentiment, reviews_hash)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_summaries_created ON ai_summaries(created_at)")
+    conn.commit()
+    
+    _SUMMARY_CONNECTIONS[abs_path] = (inode, conn)
+    return conn
+
+
+def summary_cache_key(reviews, sentiment_type, book_title=""):
+    """
+    Chave do cache: (livro, sentimento, hash dos reviews enviados no prompt).
+    
+    Se os reviews do livro mudarem, o hash muda e o resumo é gerado de novo.
+    """
+    payload = ("||".join(_select_reviews(reviews)) + sentiment_type).encode("utf-8")
+    # blake2b: mais rápido que sha256 em software e suficiente para chave de cache.
+    # O algoritmo é fixo (não depende da CPU) para que todos os workers que
+    # compartilham o banco gerem a mesma chave
+    reviews_hash = hashlib.blake2b(payload, digest_size=8).hexdigest()
+    return (book_title, sentiment_type, reviews_hash)
+
+
+def get_cached_summary(key, db_path=SUMMARY_CACHE_DB):
+    """Retorna resumo em cache (ou None)."""
+    try:
+        with _SUMMARY_CACHE_LOCK:
+            conn = _open_summary_cache(db_path)
+            if conn is None:
+                return None
+            
+            row = conn.execute(
+                "SELECT summary FROM ai_summaries WHERE book_title = ? AND sentiment = ? AND reviews_hash = ?",
+                key
+            ).fetchone()
+        
+        return row[0] if row else None
+    
+    except Exception as e:
+        print(f"Erro ao ler cache de resumos: {e}")
+        return None
+
+
+def store_cached_summary(key, summary, db_path=SUMMARY_CACHE_DB):
+    """Grava resumo no cache, removendo os mais antigos acima do limite."""
+    try:
+        with _SUMMARY_CACHE_LOCK:
+            conn = _open_summary_cache(db_path)
+            if conn is None:
+                return
+            
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ai_summaries (book_title, sentiment, reviews_hash, summary, created_at) "
+                    "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                    (*key, summary)
+                )
+                
+                total = conn.execute("SELECT COUNT(*) FROM ai_summaries").fetchone()[0]
+                if total > SUMMARY_CACHE_MAX_ENTRIES:
+                    # Remover 10% mais antigos de uma vez para não varrer a tabela a cada escrita
+                    conn.execute(
+                        "DELETE FROM ai_summaries WHERE rowid IN "
+                        "(SELECT rowid FROM ai_summaries ORDER BY created_at LIMIT ?)",
+                        (SUMMARY_CACHE_MAX_ENTRIES // 10,)
+                    )
+    
+    except Exception as e:
+        print(f"Erro ao gravar cache de resumos: {e}")
+
+
+# =================
+# SELEÇÃO DE REVIEWS (DEDUPLICAÇÃO)
+# =================
+
+# Permutações da MinHash: h(x) = (a*x + b) mod p, com parâmetros fixos
+# para que a assinatura de um review seja sempre a mesma
+_MINHASH_PRIME = (1 << 61) - 1
+_MINHASH_PERMS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MINHASH_PRIME or 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MINHASH_PRIME
+    )
+    for i in range(32)
+]
+
+
+def _minhash_signature(text):
+    """Assinatura MinHash (32 permutações) dos shingles de 3 palavras do texto."""
+    words = text.lower().split()
+    shingles = {" ".join(words[i:i + 3]) for i in range(max(len(words) - 2, 1))}
+    
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingles
+    ]
+    
+    return [min((a * h + b) % _MINHASH_PRIME for h in hashes) for a, b in _MINHASH_PERMS]
+
+
+def _dedupe_reviews(reviews, k=8, jaccard_thresh=0.8):
+    """
+    Seleciona até k reviews descartando quase-duplicatas.
+    
+    Percorre os reviews em ordem e mantém um review apenas se a similaridade
+    de Jaccard estimada (MinHash) com todos os já escolhidos for menor que
+    jaccard_thresh. Compara só os 200 primeiros caracteres, que é o trecho
+    enviado no prompt.
+    """
+    
+    picked = []
+    signatures = []
+    
+    for review in reviews:
+        if len(picked) >= k:
+            break
+        
+        signature = _minhash_signature(review[:200])
+        is_duplicate = any(
+            sum(x == y for x, y in zip(signature, other)) / len(signature) >= jaccard_thresh
+            for other in signatures
+        )
+        
+        if not is_duplicate:
+            picked.append(review)
+            signatures.append(signature)
+    
+    return picked
+
+
+def _select_reviews(reviews, k=8):
+    """
+    Amostra até k reviews distintos para o prompt.
+    
+    Embaralha antes de remover duplicatas para não favorecer sempre os
+    primeiros da lista. A semente vem do próprio conteúdo, então os mesmos
+    reviews geram sempre a mesma amostra (e a mesma chave de cache).
+    """
+    seed = hashlib.blake2b("||".join(reviews).encode("utf-8"), digest_size=8).digest()
+    shuffled = random.Random(seed).sample(reviews, len(reviews))
+    return _dedupe_reviews(shuffled, k)
+
+
 def test_openai_connection():
-    """Testa conexão com OpenAI."""
+    """
+    Testa conexão com OpenAI.
+    
+    Consulta os metadados do modelo usado nos resumos: valida chave e
+    acesso ao modelo sem gerar tokens (mais rápido que uma completion).
+    """
     client, message = setup_openai()
     
     if not client:
         return False, message
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": "Responda apenas 'OK'"}],
-            max_tokens=5,
-            temperature=0
-        )
+        model = client.models.retrieve(_BASE_PARAMS["model"])
         
-        if "OK" in response.choices[0].message.content:
+        if model.id:
             return True, "Conexão OpenAI funcionando"
         else:
             return False, "Resposta inesperada da OpenAI"
@@ -65,94 +315,294 @@ def test_openai_connection():
         return False, f"Erro na conexão: {e}"
 
 
+# Mensagem de sistema e parâmetros fixos de todas as chamadas de resumo.
+# Um prefixo idêntico entre chamadas também permite o cache de prompt da OpenAI
+_SYSTEM_MSG = {"role": "system", "content": "Você é um analista de negócios especializado em análise de reviews de livros. Seja conciso e focado em insights acionáveis."}
+_BASE_PARAMS = {"model": "gpt-4o-mini", "max_tokens": 500, "temperature": 0.3}
+
+# Modelos de prompt montados uma vez na importação; o hot path só
+# interpola o texto dos reviews (%s)
+_SUMMARY_PROMPT_BASE = """
+Analise os seguintes reviews {label} de um livro e crie um resumo executivo:
+
+%s
+
+Por favor, forneça:
+1. {item1}
+2. {item2}
+3. {item3}
+
+Mantenha o resumo conciso e focado nos pontos de negócio mais relevantes.
+"""
+
+_PROMPTS = {
+    "positivo": _SUMMARY_PROMPT_BASE.format(
+        label="POSITIVOS",
+        item1="Um resumo de 2-3 frases dos principais pontos positivos mencionados",
+        item2="Os 3 aspectos mais elogiados pelos leitores",
+        item3="Uma recomendação de 1 frase sobre o público-alvo ideal"
+    ),
+    "negativo": _SUMMARY_PROMPT_BASE.format(
+        label="NEGATIVOS",
+        item1="Um resumo de 2-3 frases dos principais problemas mencionados",
+        item2="Os 3 aspectos mais criticados pelos leitores",
+        item3="Uma recomendação de 1 frase sobre melhorias necessárias"
+    ),
+    "neutro": _SUMMARY_PROMPT_BASE.format(
+        label="NEUTROS",
+        item1="Um resumo de 2-3 frases das opiniões equilibradas mencionadas",
+        item2="Os 3 aspectos mais comentados (nem muito positivos nem negativos)",
+        item3="Uma observação de 1 frase sobre o perfil destes leitores"
+    )
+}
+
+
+def _format_reviews(reviews):
+    """
+    Lista de reviews para o prompt: 8 reviews distintos, 200 caracteres cada,
+    para não sobrecarregar a API. O corte não custa nada quando os textos já
+    vêm cortados do SQL (get_top_reviews_for_summary).
+    """
+    return "\n\n".join(f"- {review[:200]}..." for review in _select_reviews(reviews, 8))
+
+
 def create_summary_prompt(reviews, sentiment_type):
     """Cria prompt para resumir reviews."""
     
     if not reviews:
         return None
     
-    # Limitar a 8 reviews e 200 caracteres cada para não sobrecarregar a API
-    reviews_sample = reviews[:8]
-    reviews_text = "\n\n".join([f"- {review[:200]}..." for review in reviews_sample])
-    
-    if sentiment_type == "positivo":
-        prompt = f"""
-Analise os seguintes reviews POSITIVOS de um livro e crie um resumo executivo:
+    return _PROMPTS.get(sentiment_type, _PROMPTS["neutro"]) % _format_reviews(reviews)
 
-{reviews_text}
 
-Por favor, forneça:
-1. Um resumo de 2-3 frases dos principais pontos positivos mencionados
-2. Os 3 aspectos mais elogiados pelos leitores
-3. Uma recomendação de 1 frase sobre o público-alvo ideal
-
-Mantenha o resumo conciso e focado nos pontos de negócio mais relevantes.
-"""
+def generate_summary_with_openai(reviews, sentiment_type, book_title="", db_path=SUMMARY_CACHE_DB):
+    """Gera resumo usando OpenAI (consulta o cache antes de chamar a API)."""
+    
+    prompt = create_summary_prompt(reviews, sentiment_type)
+    if not prompt:
+        return None, f"Nenhum review {sentiment_type} disponível para análise"
+    
+    cache_key = summary_cache_key(reviews, sentiment_type, book_title)
+    cached = get_cached_summary(cache_key, db_path)
+    if cached:
+        return cached, "Resumo recuperado do cache"
     
-    elif sentiment_type == "negativo":
-        prompt = f"""
-Analise os seguintes reviews NEGATIVOS de um livro e crie um resumo executivo:
+    client, message = setup_openai()
+    if not client:
+        return None, message
+    
+    try:
+        response = client.chat.completions.create(
+            **_BASE_PARAMS,
+            messages=[_SYSTEM_MSG, {"role": "user", "content": prompt}]
+        )
+        
+        summary = response.choices[0].message.content.strip()
+        store_cached_summary(cache_key, summary, db_path)
+        return summary, "Resumo gerado com sucesso"
+        
+    except Exception as e:
+        return None, f"Erro ao gerar resumo: {e}"
 
-{reviews_text}
 
-Por favor, forneça:
-1. Um resumo de 2-3 frases dos principais problemas mencionados
-2. Os 3 aspectos mais criticados pelos leitores
-3. Uma recomendação de 1 frase sobre melhorias necessárias
+def generate_summary_stream(reviews, sentiment_type, book_title="", db_path=SUMMARY_CACHE_DB):
+    """
+    Gera resumo usando OpenAI em streaming.
+    
+    Produz os trechos de texto conforme chegam (para st.write_stream), o que
+    reduz o tempo até o primeiro token exibido. O texto completo é gravado
+    no cache ao final; se já estiver em cache, é produzido de uma vez.
+    Erros da API são propagados para o chamador.
+    """
+    
+    prompt = create_summary_prompt(reviews, sentiment_type)
+    if not prompt:
+        return
+    
+    cache_key = summary_cache_key(reviews, sentiment_type, book_title)
+    cached = get_cached_summary(cache_key, db_path)
+    if cached:
+        yield cached
+        return
+    
+    client, message = setup_openai()
+    if not client:
+        raise RuntimeError(message)
+    
+    response = client.chat.completions.create(
+        **_BASE_PARAMS,
+        messages=[_SYSTEM_MSG, {"role": "user", "content": prompt}],
+        stream=True
+    )
+    
+    parts = []
+    for chunk in response:
+        if not chunk.choices:
+            continue
+        
+        delta = chunk.choices[0].delta.content or ""
+        if delta:
+            parts.append(delta)
+            yield delta
+    
+    summary = "".join(parts).strip()
+    if summary:
+        store_cached_summary(cache_key, summary, db_path)
 
-Mantenha o resumo conciso e focado nos pontos de negócio mais relevantes.
-"""
+
+def create_combined_summary_prompt(reviews_data):
+    """
+    Cria um único prompt com os reviews de todos os sentimentos.
+    
+    Cada sentimento fica em uma seção rotulada e a resposta deve ser um
+    objeto JSON com uma chave por sentimento.
+    """
+    
+    sections = []
+    for sentiment_type, reviews in reviews_data.items():
+        sentiment = sentiment_type.rstrip('s')  # Remove 's' do plural
+        sections.append(f"<{sentiment}>\n{_format_reviews(reviews)}\n</{sentiment}>")
+    
+    if not sections:
+        return None
+    
+    sections_text = "\n\n".join(sections)
+    keys = ", ".join(f'"{sentiment_type.rstrip("s")}"' for sentiment_type in reviews_data)
     
-    else:  # neutro
-        prompt = f"""
-Analise os seguintes reviews NEUTROS de um livro e crie um resumo executivo:
+    return f"""
+Analise os reviews de um livro abaixo, agrupados por sentimento, e crie um resumo executivo para cada grupo:
 
-{reviews_text}
+{sections_text}
 
-Por favor, forneça:
-1. Um resumo de 2-3 frases das opiniões equilibradas mencionadas
-2. Os 3 aspectos mais comentados (nem muito positivos nem negativos)
-3. Uma observação de 1 frase sobre o perfil destes leitores
+Para cada grupo, forneça:
+1. Um resumo de 2-3 frases dos principais pontos mencionados
+2. Os 3 aspectos mais comentados pelos leitores
+3. Uma recomendação de 1 frase (público-alvo ideal para positivos, melhorias necessárias para negativos, perfil dos leitores para neutros)
 
-Mantenha o resumo conciso e focado nos pontos de negócio mais relevantes.
+Responda apenas com um objeto JSON com as chaves {keys}, cada uma contendo o resumo em texto.
+Mantenha os resumos concisos e focados nos pontos de negócio mais relevantes.
 """
-    
-    return prompt
 
 
-def generate_summary_with_openai(reviews, sentiment_type):
-    """Gera resumo usando OpenAI."""
+def generate_combined_summaries_with_openai(reviews_data, book_title="", db_path=SUMMARY_CACHE_DB):
+    """
+    Gera os resumos de todos os sentimentos em uma única chamada à OpenAI.
+    
+    Sentimentos já presentes no cache não são reenviados.
+    
+    Returns:
+        dict: {tipo_sentimento: (resumo, mensagem)} para os tipos resolvidos;
+              tipos ausentes devem ser gerados individualmente pelo chamador
+    """
+    generated = {}
+    pending = {}
+    
+    for sentiment_type, reviews in reviews_data.items():
+        if not reviews:
+            continue
+        
+        cached = get_cached_summary(summary_cache_key(reviews, sentiment_type.rstrip('s'), book_title), db_path)
+        if cached:
+            generated[sentiment_type] = (cached, "Resumo recuperado do cache")
+        else:
+            pending[sentiment_type] = reviews
+    
+    if not pending:
+        return generated
     
     client, message = setup_openai()
     if not client:
-        return None, message
-    
-    prompt = create_summary_prompt(reviews, sentiment_type)
-    if not prompt:
-        return None, f"Nenhum review {sentiment_type} disponível para análise"
+        return generated
     
     try:
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Você é um analista de negócios especializado em análise de reviews de livros. Seja conciso e focado em insights acionáveis."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.3
+            **dict(_BASE_PARAMS, max_tokens=1500),
+            messages=[_SYSTEM_MSG, {"role": "user", "content": create_combined_summary_prompt(pending)}],
+            response_format={"type": "json_object"}
         )
         
-        summary = response.choices[0].message.content.strip()
-        return summary, "Resumo gerado com sucesso"
+        content = json.loads(response.choices[0].message.content)
         
     except Exception as e:
-        return None, f"Erro ao gerar resumo: {e}"
+        print(f"Erro no resumo combinado, gerando individualmente: {e}")
+        return generated
+    
+    for sentiment_type, reviews in pending.items():
+        sentiment = sentiment_type.rstrip('s')
+        summary = content.get(sentiment)
+        
+        if isinstance(summary, str) and summary.strip():
+            summary = summary.strip()
+            store_cached_summary(summary_cache_key(reviews, sentiment, book_title), summary, db_path)
+            generated[sentiment_type] = (summary, "Resumo gerado com sucesso")
+    
+    return generated
 
 
-def run_book_summary_analysis(book_title, db_path="books_database.db"):
+def generate_all_summaries_threaded(reviews_data, book_title="", db_path=SUMMARY_CACHE_DB):
+    """
+    Gera os resumos de todos os sentimentos em paralelo usando threads.
+    
+    Funciona mesmo quando já existe um event loop rodando (ex.: Jupyter),
+    onde asyncio.run() falha. O cliente OpenAI é thread-safe e reaproveita
+    o mesmo pool de conexões.
+    
+    Returns:
+        dict: {tipo_sentimento: (resumo, mensagem)} apenas para tipos com reviews
+    """
+    pending = {sentiment_type: reviews for sentiment_type, reviews in reviews_data.items() if reviews}
+    if not pending:
+        return {}
+    
+    with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+        futures = {
+            sentiment_type: executor.submit(generate_summary_with_openai, reviews, sentiment_type.rstrip('s'), book_title, db_path)  # Remove 's' do plural
+            for sentiment_type, reviews in pending.items()
+        }
+        
+        return {sentiment_type: future.result() for sentiment_type, future in futures.items()}
+
+
+def _generate_summaries(reviews_data, book_title="", db_path=SUMMARY_CACHE_DB):
+    """
+    Gera os resumos de vários sentimentos: uma única chamada para todos;
+    os que faltarem na resposta são gerados individualmente, em paralelo.
+    """
+    generated = generate_combined_summaries_with_openai(reviews_data, book_title, db_path)
+    
+    missing = {
+        sentiment_type: reviews
+        for sentiment_type, reviews in reviews_data.items()
+        if reviews and sentiment_type not in generated
+    }
+    if missing:
+        generated.update(generate_all_summaries_threaded(missing, book_title, db_path))
+    
+    return generated
+
+
+def _await_summary(future, sentiment_type):
+    """Gerador para st.write_stream com um resumo gerado em segundo plano."""
+    summary, message = future.result()[sentiment_type]
+    if not summary:
+        raise RuntimeError(message)
+    yield summary
+
+
+def run_book_summary_analysis(book_title, db_path="books_database.db", stream=False):
     """
     Executa análise completa de um livro com resumos de IA.
     
+    Args:
+        book_title: Título do livro
+        db_path: Caminho do banco
+        stream: Se True, cada sentimento recebe um gerador em 'stream' para a
+                interface. Só o primeiro sentimento com reviews (a aba
+                visível) vem em streaming, token a token; os demais são
+                gerados em segundo plano por uma chamada combinada, enquanto
+                o primeiro é exibido (a interface consome os geradores em
+                sequência)
+    
     Returns:
         dict: Contém info do livro, reviews e resumos
     """
@@ -163,14 +613,45 @@ def run_book_summary_analysis(book_title, db_path="books_database.db"):
         return None, f"Livro '{book_title}' não encontrado"
     
     # Obter reviews organizados
-    reviews_data = get_all_reviews_for_book(book_title, db_path)
+    reviews_data = get_top_reviews_for_summary(book_title, db_path=db_path)
     
     # Gerar resumos com IA
+    generated = {}
+    streamed = None
+    background = None
+    
+    if stream:
+        streamed = next((sentiment_type for sentiment_type, reviews in reviews_data.items() if reviews), None)
+        others = {
+            sentiment_type: reviews
+            for sentiment_type, reviews in reviews_data.items()
+            if reviews and sentiment_type != streamed
+        }
+        if others:
+            executor = ThreadPoolExecutor(max_workers=1)
+            background = executor.submit(_generate_summaries, others, book_title, db_path)
+            executor.shutdown(wait=False)
+    else:
+        generated = _generate_summaries(reviews_data, book_title, db_path)
+    
     summaries = {}
     
     for sentiment_type, reviews in reviews_data.items():
-        if reviews:  # Se há reviews deste tipo
-            summary, message = generate_summary_with_openai(reviews, sentiment_type.rstrip('s'))  # Remove 's' do plural
+        if reviews and stream:
+            if sentiment_type == streamed:
+                summary_stream = generate_summary_stream(reviews, sentiment_type.rstrip('s'), book_title, db_path)  # Remove 's' do plural
+            else:
+                summary_stream = _await_summary(background, sentiment_type)
+            
+            summaries[sentiment_type] = {
+                'summary': None,
+                'status': 'streaming',
+                'message': 'Resumo em geração',
+                'total_reviews': len(reviews),
+                'stream': summary_stream
+            }
+        elif reviews:  # Se há reviews deste tipo
+            summary, message = generated[sentiment_type]
             summaries[sentiment_type] = {
                 'summary': summary,
                 'status': 'success' if summary else 'error',
@@ -202,13 +683,27 @@ def run_book_summary_analysis(book_title, db_path="books_database.db"):
 def generate_general_insights(book_info, summaries):
     """Gera insights gerais baseados nos resumos."""
     
+    # Caminho normal: taxas e recomendação já vêm calculadas do SQL (get_book_info)
+    if 'recommendation' in book_info and 'recommendation_level' in book_info:
+        return {
+            'total_reviews': book_info['total_reviews'],
+            'sentiment_score': book_info['sentimento_medio'],
+            'positive_rate': book_info['positive_rate'],
+            'negative_rate': book_info['negative_rate'],
+            'recommendation': book_info['recommendation'],
+            'business_priority': book_info['business_priority'],
+            'recommendation_level': book_info['recommendation_level']
+        }
+    
+    # Fallback para book_info sem as colunas pré-calculadas
     insights = {
         'total_reviews': book_info.get('total_reviews', 0),
         'sentiment_score': book_info.get('sentimento_medio', 0),
-        'positive_rate': (book_info.get('total_positivos', 0) / book_info.get('total_reviews', 1)) * 100,
-        'negative_rate': (book_info.get('total_negativos', 0) / book_info.get('total_reviews', 1)) * 100,
+        'positive_rate': (book_info.get('total_positivos', 0) / (book_info.get('total_reviews') or 1)) * 100,
+        'negative_rate': (book_info.get('total_negativos', 0) / (book_info.get('total_reviews') or 1)) * 100,
         'recommendation': '',
-        'business_priority': ''
+        'business_priority': '',
+        'recommendation_level': 'warning'
     }
     
     # Determinar recomendação de negócio
@@ -219,12 +714,15 @@ def generate_general_insights(book_info, summaries):
     if sentiment_score > 0.3 and positive_rate > 70:
         insights['recommendation'] = "✅ PROMOVER - Livro com excelente recepção"
         insights['business_priority'] = "Alta"
+        insights['recommendation_level'] = "success"
     elif sentiment_score > 0.1 and positive_rate > 60:
         insights['recommendation'] = "🔄 MANTER - Desempenho satisfatório"
         insights['business_priority'] = "Média"
+        insights['recommendation_level'] = "info"
     elif sentiment_score < -0.1 or positive_rate < 40:
         insights['recommendation'] = "⚠️ REVISAR - Problemas de qualidade identificados"
         insights['business_priority'] = "Alta"
+        insights['recommendation_level'] = "error"
     else:
         insights['recommendation'] = "📊 MONITORAR - Desempenho neutro"
         insights['business_priority'] = "Baixa"
@@ -259,8 +757,9 @@ def format_summary_for_display(summary_result):
     # Formatar cada tipo de resumo
     for sentiment_type, data in result['summaries'].items():
         formatted['summaries'][sentiment_type] = {
-            'has_data': data['status'] == 'success',
+            'has_data': data['status'] in ('success', 'streaming'),
             'summary': data['summary'],
+            'stream': data.get('stream'),
             'total_reviews': data['total_reviews'],
             'message': data['message']
         }
@@ -278,37 +777,265 @@ def get_available_books_for_analysis(query="", limit=20, db_path="books_database
         db_path: Caminho do banco
     
     Returns:
-        Lista de livros disponíveis
+        Lista de livros disponíveis (um dict por livro)
     """
     
     if query.strip():
         # Busca específica
         books = search_books_for_summary(query, limit, db_path)
     else:
-        # Busca geral - livros com mais reviews
-        from poc_queries import execute_query
+        # Busca geral - livros com mais reviews (tabela agregada)
+        books = get_top_books_for_summary(limit, db_path)
+    
+    return books
+
+
+# =================
+# PRÉ-CÁLCULO EM LOTE (OPENAI BATCH API)
+# =================
+
+def _build_precompute_requests(db_path="books_database.db", limit=1000):
+    """Lista (chave do cache, prompt) dos resumos ainda não calculados dos livros mais avaliados."""
+    
+    books = get_available_books_for_analysis("", limit, db_path)
+    
+    requests = []
+    for title in (book['titulo'] for book in books):
+        reviews_data = get_top_reviews_for_summary(title, db_path=db_path)
         
-        query_sql = """
-        SELECT DISTINCT
-            b.Title_padrao as titulo,
-            b.authors_padrao as autor,
-            b.categories_padrao as categoria,
-            COUNT(r.sentimento) as total_reviews,
-            SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) as positivos,
-            SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) as negativos,
-            ROUND(AVG(r.compound), 3) as sentimento_medio
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE r.sentimento IS NOT NULL
-        GROUP BY b.Title_padrao, b.authors_padrao, b.categories_padrao
-        HAVING total_reviews >= 10  -- Mínimo para análise de IA
-        ORDER BY total_reviews DESC
-        LIMIT ?
-        """
+        for sentiment_type, reviews in reviews_data.items():
+            sentiment = sentiment_type.rstrip('s')  # Remove 's' do plural
+            prompt = create_summary_prompt(reviews, sentiment)
+            
+            if not prompt:
+                continue
+            
+            cache_key = summary_cache_key(reviews, sentiment, title)
+            if get_cached_summary(cache_key, db_path):
+                continue
+            
+            requests.append((cache_key, prompt))
+    
+    return requests
+
+
+def precompute_all_summaries(db_path="books_database.db", limit=1000,
+                             batch_input_path="batch_input.jsonl",
+                             wait=True, poll_interval=60, use_batch_api=True):
+    """
+    Pré-calcula resumos dos livros mais avaliados usando a Batch API da OpenAI.
+    
+    A Batch API processa as requisições de forma assíncrona (até 24h) com
+    metade do custo, adequada para rodar fora do horário de uso. Os resumos
+    retornados vão para o cache de resumos, então a interface os encontra
+    sem chamar a API.
+    
+    Args:
+        db_path: Caminho do banco
+        limit: Número máximo de livros (ordenados por total de reviews)
+        batch_input_path: Arquivo JSONL de entrada do lote
+        wait: Se True, aguarda o lote terminar e grava os resumos no cache
+        poll_interval: Intervalo (segundos) entre consultas de status
+        use_batch_api: Se False, chama a API diretamente em paralelo,
+                       respeitando os limites de RPM/TPM (resultado em
+                       minutos, com custo normal)
+    
+    Returns:
+        tuple: (id do lote ou None, mensagem)
+    """
+    
+    client, message = setup_openai()
+    if not client:
+        return None, message
+    
+    requests = _build_precompute_requests(db_path, limit)
+    
+    if not requests:
+        return None, "Todos os resumos já estão em cache"
+    
+    if not use_batch_api:
+        stored, failed = asyncio.run(aprocess_requests_rate_limited(requests, db_path=db_path))
+        return None, f"{stored} resumos gravados no cache ({failed} falharam)"
+    
+    with open(batch_input_path, "w", encoding="utf-8") as f:
+        for cache_key, prompt in requests:
+            # custom_id é a própria chave do cache (resultado volta direto para ele)
+            request = {
+                "custom_id": json.dumps(cache_key, ensure_ascii=False),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    **_BASE_PARAMS,
+                    "messages": [_SYSTEM_MSG, {"role": "user", "content": prompt}]
+                }
+            }
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+    
+    total_requests = len(requests)
+    
+    try:
+        with open(batch_input_path, "rb") as f:
+            batch_file = client.files.create(file=f, purpose="batch")
         
-        books = execute_query(query_sql, db_path, (limit,))
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+    except Exception as e:
+        return None, f"Erro ao criar lote: {e}"
     
-    return books
+    print(f"Lote {batch.id} criado com {total_requests} requisições")
+    
+    if not wait:
+        return batch.id, "Lote enviado; use collect_batch_summaries() para gravar os resultados"
+    
+    return collect_batch_summaries(batch.id, poll_interval, db_path)
+
+
+def collect_batch_summaries(batch_id, poll_interval=60, db_path=SUMMARY_CACHE_DB):
+    """
+    Aguarda um lote da Batch API terminar e grava os resumos no cache.
+    
+    Returns:
+        tuple: (id do lote, mensagem)
+    """
+    
+    client, message = setup_openai()
+    if not client:
+        return None, message
+    
+    try:
+        batch = client.batches.retrieve(batch_id)
+        while batch.status in ("validating", "in_progress", "finalizing"):
+            time.sleep(poll_interval)
+            batch = client.batches.retrieve(batch_id)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            return batch_id, f"Lote terminou com status '{batch.status}'"
+        
+        output = client.files.content(batch.output_file_id).text
+    except Exception as e:
+        return batch_id, f"Erro ao acompanhar lote: {e}"
+    
+    stored = 0
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        
+        item = json.loads(line)
+        response = item.get("response") or {}
+        
+        if response.get("status_code") != 200:
+            continue
+        
+        summary = response["body"]["choices"][0]["message"]["content"].strip()
+        store_cached_summary(tuple(json.loads(item["custom_id"])), summary, db_path)
+        stored += 1
+    
+    return batch_id, f"{stored} resumos gravados no cache"
+
+
+async def _arequest_summary(client, cache_key, prompt, attempt):
+    """Uma requisição de resumo; devolve o erro em vez de lançá-lo."""
+    try:
+        response = await client.chat.completions.create(
+            **_BASE_PARAMS,
+            messages=[_SYSTEM_MSG, {"role": "user", "content": prompt}]
+        )
+        return cache_key, prompt, attempt, response.choices[0].message.content.strip(), None
+    
+    except Exception as e:
+        return cache_key, prompt, attempt, None, e
+
+
+async def aprocess_requests_rate_limited(requests, max_requests_per_minute=3500,
+                                         max_tokens_per_minute=200_000, max_attempts=5,
+                                         max_in_flight=100, db_path=SUMMARY_CACHE_DB):
+    """
+    Processa muitas requisições de resumo em paralelo respeitando RPM/TPM da conta.
+    
+    Segue o processador paralelo do OpenAI Cookbook: capacidades de
+    requisições e de tokens são reabastecidas continuamente (token bucket)
+    e cada requisição só é disparada quando há capacidade para ela
+    (tokens estimados = tamanho do prompt / 4 + max_tokens da resposta).
+    Em erro 429 o envio pausa com backoff exponencial e a requisição volta
+    para a fila, até max_attempts tentativas.
+    
+    Args:
+        requests: Lista de (chave do cache, prompt)
+        max_requests_per_minute: Limite de requisições por minuto
+        max_tokens_per_minute: Limite de tokens por minuto
+        max_attempts: Tentativas por requisição
+        max_in_flight: Máximo de requisições simultâneas
+        db_path: Banco onde os resumos são gravados
+    
+    Returns:
+        tuple: (resumos gravados no cache, requisições que falharam)
+    """
+    
+    client, message = setup_async_openai()
+    if not client:
+        print(message)
+        return 0, len(requests)
+    
+    queue = deque((cache_key, prompt, 1) for cache_key, prompt in requests)
+    in_flight = set()
+    
+    available_requests = max_requests_per_minute
+    available_tokens = max_tokens_per_minute
+    last_update = time.monotonic()
+    paused_until = 0.0
+    
+    stored = 0
+    failed = 0
+    
+    async with client:
+        # Novas tentativas são controladas aqui, não pelo cliente
+        api = client.with_options(max_retries=0)
+        
+        while queue or in_flight:
+            # Reabastecer capacidades proporcionalmente ao tempo decorrido
+            now = time.monotonic()
+            elapsed = now - last_update
+            available_requests = min(max_requests_per_minute, available_requests + elapsed * max_requests_per_minute / 60)
+            available_tokens = min(max_tokens_per_minute, available_tokens + elapsed * max_tokens_per_minute / 60)
+            last_update = now
+            
+            # Disparar requisições enquanto houver capacidade
+            while queue and len(in_flight) < max_in_flight and now >= paused_until:
+                cache_key, prompt, attempt = queue[0]
+                tokens = min(len(prompt) // 4 + _BASE_PARAMS["max_tokens"], max_tokens_per_minute)
+                
+                if available_requests < 1 or available_tokens < tokens:
+                    break
+                
+                queue.popleft()
+                available_requests -= 1
+                available_tokens -= tokens
+                in_flight.add(asyncio.create_task(_arequest_summary(api, cache_key, prompt, attempt)))
+            
+            if not in_flight:
+                await asyncio.sleep(0.05)
+                continue
+            
+            done, in_flight = await asyncio.wait(in_flight, timeout=0.05, return_when=asyncio.FIRST_COMPLETED)
+            
+            for task in done:
+                cache_key, prompt, attempt, summary, error = task.result()
+                
+                if error is None:
+                    store_cached_summary(cache_key, summary, db_path)
+                    stored += 1
+                elif attempt >= max_attempts:
+                    print(f"Falha definitiva em {cache_key}: {error}")
+                    failed += 1
+                else:
+                    if isinstance(error, RateLimitError):
+                        paused_until = max(paused_until, time.monotonic() + min(60, 2 ** attempt))
+                    queue.append((cache_key, prompt, attempt + 1))
+    
+    return stored, failed
 
 
 # Função de teste para verificar se tudo está funcionando
@@ -332,8 +1059,8 @@ def test_ai_functions():
         books = get_available_books_for_analysis("Harry Potter", 3)
         print(f"   Encontrados: {len(books)} livros")
         
-        if not books.empty:
-            first_book = books.iloc[0]['titulo']
+        if books:
+            first_book = books[0]['titulo']
             print(f"   Primeiro livro: {first_book}")
             
             # Teste 3: Análise completa
@@ -362,5 +1089,13 @@ def test_ai_functions():
 
 
 if __name__ == "__main__":
-    # Executar teste das funções
-    test_ai_functions()
+    import sys
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "precompute":
+        # Pré-cálculo noturno: python ai_summary_functions.py precompute
+        # (acrescente "online" para chamar a API diretamente, sem Batch API)
+        batch_id, msg = precompute_all_summaries(use_batch_api="online" not in sys.argv[2:])
+        print(msg)
+    else:
+        # Executar teste das funções
+        test_ai_functions()
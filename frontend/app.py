@@ -4,35 +4,77 @@ Interface simples para análises de negócio
 """
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import io
 import os
 import sys
-import gdown
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 
 #Fazer download da base a partir do GDrive
+DB_FILE_ID = "1kSwCxOZ9se4O3Jmz1UJVxRXj_iZ1ylpi"  # Id do arquivo no GDrive
+DB_DOWNLOAD_URL = "https://drive.usercontent.google.com/download"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB por leitura
+
+
 def download_database():
-    """Faz download do banco de dados do Google Drive se não existir localmente."""
+    """
+    Faz download do banco de dados do Google Drive se não existir localmente.
+    
+    Baixa em streaming, em blocos de 1 MiB, direto para um arquivo
+    temporário; confirm=t pula a página de aviso de antivírus do Drive
+    para arquivos grandes.
+    """
     db_path = "books_database.db"
-    if not os.path.exists(db_path):
-        st.info("Baixando banco de dados do Google Drive...")
-        file_id = "1kSwCxOZ9se4O3Jmz1UJVxRXj_iZ1ylpi"  # Id do arquivo no GDrive
-        gdown.download(id=file_id, output=db_path, quiet=False)
+    if os.path.exists(db_path):
+        return
+    
+    import requests  # importado só quando o download é necessário
+    
+    st.info("Baixando banco de dados do Google Drive...")
+    tmp_path = db_path + ".part"
+    params = {"id": DB_FILE_ID, "export": "download", "confirm": "t"}
+    
+    try:
+        with requests.get(DB_DOWNLOAD_URL, params=params, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            total = int(response.headers.get("Content-Length", 0))
+            progress = st.progress(0.0) if total else None
+            
+            downloaded = 0
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    if progress:
+                        progress.progress(min(downloaded / total, 1.0))
+        
+        os.replace(tmp_path, db_path)
         st.success("Banco de dados baixado com sucesso!")
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        st.error(f"Erro ao baixar banco de dados: {e}")
 
 # Importar funções de consulta
 try:
     from poc_queries import (
         get_problematic_books,
+        get_problem_risk_buckets,
         get_users_for_interview,
         get_roi_by_category,
         get_roi_by_author,
         get_sentiment_discrepancies,
         get_summary_stats,
         get_sentiment_distribution,
+        ensure_indexes,
+        ensure_materialized_tables,
+        get_connection,
+        open_connection,
         # Novas análises
         get_best_worst_books,
         get_best_worst_publishers,
@@ -42,8 +84,7 @@ try:
         get_trending_analysis,
         # Funções para IA
         search_books_for_summary,
-        get_book_info,
-        get_all_reviews_for_book
+        get_book_info
     )
     QUERIES_AVAILABLE = True
 except ImportError as e:
@@ -51,16 +92,11 @@ except ImportError as e:
     st.info("Verifique se poc_queries.py está na mesma pasta")
     QUERIES_AVAILABLE = False
 
-# Importar funções de resumo IA
-try:
-    from ai_summary_functions import (
-        test_openai_connection,
-        search_books_for_summary,
-        run_book_summary_analysis
-    )
-    SUMMARY_AVAILABLE = True
-except ImportError:
-    SUMMARY_AVAILABLE = False
+# Funções de resumo IA: o módulo só é importado na página de IA; aqui
+# apenas se verifica se as dependências estão instaladas
+SUMMARY_AVAILABLE = all(
+    importlib.util.find_spec(module) is not None for module in ("openai", "dotenv")
+)
 
 # Configuração da página
 st.set_page_config(
@@ -73,16 +109,10 @@ st.set_page_config(
 # CSS customizado para melhor visual
 st.markdown("""
 <style>
-.metric-card {
-    background-color: #f0f2f6;
-    padding: 1rem;
-    border-radius: 0.5rem;
-    border-left: 5px solid #1f77b4;
-    margin-bottom: 1rem;
-}
-.alert-high { border-left-color: #d62728; }
-.alert-medium { border-left-color: #ff7f0e; }
-.alert-low { border-left-color: #2ca02c; }
+/* Cores das métricas de nível (alto, médio, baixo) nas linhas "risk-metrics" */
+[class*="st-key-risk-metrics"] [data-testid="stColumn"]:nth-child(1) [data-testid="stMetric"] { border-left: 5px solid #d62728; }
+[class*="st-key-risk-metrics"] [data-testid="stColumn"]:nth-child(2) [data-testid="stMetric"] { border-left: 5px solid #ff7f0e; }
+[class*="st-key-risk-metrics"] [data-testid="stColumn"]:nth-child(3) [data-testid="stMetric"] { border-left: 5px solid #2ca02c; }
 
 .stApp > header {
     background-color: transparent;
@@ -128,6 +158,390 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+# =================
+# CACHE DE CONSULTAS
+# =================
+
+def get_db_mtime(db_path="books_database.db"):
+    """Data de modificação do banco (muda quando o banco é recriado)."""
+    return os.path.getmtime(db_path) if os.path.exists(db_path) else 0
+
+
+# persist="disk": os resultados sobrevivem a reinícios do app (os gravados
+# para um banco recriado deixam de ser usados, pois o mtime faz parte da chave).
+# max_entries limita as entradas mantidas em memória (cada mtime e cada
+# combinação de filtros gera uma nova); as menos usadas são descartadas
+@st.cache_data(persist="disk", show_spinner=False, max_entries=256)
+def _run_cached_query(_query_func, query_name, db_path, db_mtime, _shared_conn=True, **kwargs):
+    """Executa a consulta; o resultado fica em cache por (nome, banco, mtime, parâmetros)."""
+    if _shared_conn:
+        return _query_func(db_path=db_path, conn=get_connection(db_path), **kwargs)
+    
+    # Conexão dedicada, fechada ao final (consultas em paralelo não disputam a compartilhada)
+    conn = open_connection(db_path)
+    try:
+        return _query_func(db_path=db_path, conn=conn, **kwargs)
+    finally:
+        conn.close()
+
+
+def cached_query(query_func, db_path="books_database.db", shared_conn=True, **kwargs):
+    """
+    Executa uma função de poc_queries com cache em memória.
+    
+    O Streamlit reexecuta o script inteiro a cada interação; com o cache,
+    consultas idênticas não voltam ao SQLite, nem depois de reiniciar o app
+    (cache gravado em disco). O mtime do banco entra na chave, então
+    recriar o banco invalida os resultados antigos.
+    
+    shared_conn=False abre uma conexão própria para a consulta (open_connection),
+    fechada ao final; usado nas consultas em paralelo, que na conexão
+    compartilhada seriam serializadas.
+    """
+    return _run_cached_query(query_func, query_func.__name__, db_path, get_db_mtime(db_path),
+                             _shared_conn=shared_conn, **kwargs)
+
+
+def submit_cached_queries(*calls, db_path="books_database.db"):
+    """
+    Dispara consultas independentes em paralelo, cada uma em sua thread.
+    
+    O tempo de carga fica próximo ao da consulta mais lenta, em vez da soma.
+    
+    Args:
+        calls: Tuplas (função de consulta, dict de parâmetros)
+        db_path: Caminho do banco
+    
+    Returns:
+        list: Futures na mesma ordem das consultas (.result() devolve o
+              resultado ou relança o erro da consulta)
+    """
+    ctx = get_script_run_ctx()
+    
+    def run(query_func, kwargs):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return cached_query(query_func, db_path, shared_conn=False, **kwargs)
+    
+    executor = ThreadPoolExecutor(max_workers=len(calls))
+    futures = [executor.submit(run, query_func, kwargs) for query_func, kwargs in calls]
+    executor.shutdown(wait=False)
+    
+    return futures
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _run_cached_available_books(query, limit, db_path, db_mtime):
+    """Livros para a página de IA, em cache por (busca, limite, banco, mtime)."""
+    from ai_summary_functions import get_available_books_for_analysis
+    return get_available_books_for_analysis(query=query, limit=limit, db_path=db_path)
+
+
+def cached_available_books(query="", limit=20, db_path="books_database.db"):
+    """Versão em cache de get_available_books_for_analysis (módulo de IA)."""
+    return _run_cached_available_books(query, limit, db_path, get_db_mtime(db_path))
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def cached_openai_connection():
+    """
+    Teste de conexão com a OpenAI reaproveitado por 5 minutos: as
+    reexecuções da página de IA não voltam a chamar a API.
+    """
+    from ai_summary_functions import test_openai_connection
+    return test_openai_connection()
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def to_csv_bytes(df):
+    """CSV (UTF-8) de um DataFrame, em cache pela hash do conteúdo."""
+    # Escrito direto em bytes, sem montar antes a string inteira do CSV
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, encoding='utf-8')
+    return buffer.getvalue()
+
+
+# Cores fixas por sentimento nos gráficos
+SENTIMENT_COLORS = {
+    'positivo': '#2ca02c',
+    'neutro': '#ff7f0e',
+    'negativo': '#d62728'
+}
+
+# Tipo de alerta para cada nível de recomendação de negócio (recommendation_level)
+RECOMMENDATION_ALERTS = {
+    'success': st.success,
+    'info': st.info,
+    'error': st.error,
+    'warning': st.warning
+}
+
+# Cores fixas por nível de discrepância
+DISCREPANCY_COLORS = {
+    'Alto': '#d62728',
+    'Médio': '#ff7f0e',
+    'Baixo': '#2ca02c'
+}
+
+# Caixa estilizada do resumo da IA (classes .summary-box definidas no CSS)
+_SUMMARY_TPL = '<div class="summary-box {cls}"><h4>{emoji} Resumo da IA:</h4><p>{text}</p></div>'
+
+
+# =================
+# GRÁFICOS
+# =================
+# As figuras ficam em cache (st.cache_resource) pela hash dos dados de
+# entrada: reexecuções por widgets não relacionados reaproveitam a figura.
+# As funções que as usam não devem alterá-las depois de criadas.
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def sentiment_pie_figure(sentiment_dist):
+    """Pizza da distribuição de sentimentos."""
+    import plotly.graph_objects as go
+    
+    fig = go.Figure(go.Pie(
+        values=sentiment_dist['quantidade'].to_numpy(),
+        labels=sentiment_dist['sentimento'].to_numpy(),
+        marker_colors=[SENTIMENT_COLORS.get(s) for s in sentiment_dist['sentimento']],
+        textposition='inside',
+        textinfo='percent+label'
+    ))
+    fig.update_layout(title="Proporção de Sentimentos")
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def problem_score_bar_figure(top_books):
+    """Barras horizontais do score de problema por livro."""
+    import plotly.graph_objects as go
+    
+    scores = top_books['problema_score'].to_numpy()
+    fig = go.Figure(go.Bar(
+        x=scores,
+        y=top_books['titulo'].to_numpy(),
+        orientation='h',
+        marker=dict(color=scores, colorscale='Reds', showscale=True, colorbar=dict(title='Score Problema')),
+        texttemplate='%{x:.1f}',
+        textposition='outside',
+        hovertemplate='Livro=%{y}<br>Score Problema=%{x}<extra></extra>'
+    ))
+    fig.update_layout(
+        title="Score de Problema por Livro",
+        height=500,
+        xaxis_title='Score Problema',
+        yaxis_title='Livro',
+        yaxis={'categoryorder':'total ascending'}
+    )
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def histogram_figure(values, nbins=10, title="", xaxis_title="", height=None):
+    """
+    Histograma com as contagens por faixa calculadas no servidor.
+    Só os nbins totais vão para o navegador, não os valores brutos.
+    """
+    import plotly.graph_objects as go
+    
+    counts, edges = np.histogram(values, bins=nbins)
+    
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        customdata=np.column_stack([edges[:-1], edges[1:]]),
+        hovertemplate='%{customdata[0]:.1f} - %{customdata[1]:.1f}<br>Frequência=%{y}<extra></extra>'
+    ))
+    fig.update_layout(title=title, height=height, xaxis_title=xaxis_title, yaxis_title='Frequência')
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def roi_scatter_figure(df, label_column, title):
+    """Scatter ROI vs volume de livros (tamanho do ponto = total de reviews)."""
+    import plotly.graph_objects as go
+    
+    sizes = df['total_reviews'].to_numpy()
+    
+    fig = go.Figure(go.Scattergl(
+        x=df['total_livros'].to_numpy(),
+        y=df['roi_estimado'].to_numpy(),
+        mode='markers',
+        # Mesma escala de área do plotly express (maior ponto com 20px)
+        marker=dict(size=sizes, sizemode='area', sizeref=2.0 * max(sizes.max(), 1) / 20 ** 2),
+        customdata=df[[label_column, 'sentimento_medio', 'total_reviews']].to_numpy(),
+        hovertemplate=(
+            'Total de Livros=%{x}<br>ROI Estimado=%{y}<br>total_reviews=%{customdata[2]}'
+            f'<br>{label_column}=%{{customdata[0]}}<br>sentimento_medio=%{{customdata[1]}}<extra></extra>'
+        )
+    ))
+    fig.update_layout(title=title, xaxis_title='Total de Livros', yaxis_title='ROI Estimado')
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def roi_bar_figure(df, label_column, title):
+    """Barras horizontais de ROI estimado por categoria/autor."""
+    import plotly.graph_objects as go
+    
+    fig = go.Figure(go.Bar(
+        x=df['roi_estimado'].to_numpy(),
+        y=df[label_column].to_numpy(),
+        orientation='h'
+    ))
+    fig.update_layout(
+        title=title,
+        height=400,
+        xaxis_title='roi_estimado',
+        yaxis_title=label_column,
+        yaxis={'categoryorder':'total ascending'}
+    )
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def discrepancy_pie_figure(level_counts):
+    """Pizza das discrepâncias por nível (level_counts: value_counts do nível)."""
+    import plotly.express as px
+    
+    return px.pie(
+        values=level_counts.values,
+        names=level_counts.index,
+        color_discrete_map=DISCREPANCY_COLORS,
+        title="Discrepâncias por Nível"
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def discrepancy_scatter_figure(plot_df):
+    """Scatter do score de discrepância vs compound, colorido por nível."""
+    import plotly.express as px
+    
+    fig = px.scatter(
+        plot_df,
+        render_mode='webgl',
+        x='compound_score',
+        y='score_discrepancia',
+        color='nivel_discrepancia',
+        hover_data=['sentimento_classificado', 'sentimento_esperado'],
+        title="Discrepância vs Compound Score",
+        color_discrete_map=DISCREPANCY_COLORS
+    )
+    # Scores em float32: exibir com as 3 casas do banco
+    fig.update_layout(xaxis_hoverformat='.3f', yaxis_hoverformat='.3f')
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def score_bar_figure(df, score_column, color_scale, title):
+    """Barras horizontais de score por livro (melhores/piores)."""
+    import plotly.express as px
+    
+    fig = px.bar(
+        df,
+        x=score_column,
+        y='titulo',
+        orientation='h',
+        color=score_column,
+        color_continuous_scale=color_scale,
+        title=title
+    )
+    fig.update_layout(height=400, yaxis={'categoryorder':'total ascending'})
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def volume_scatter_figure(df, score_column, color_scale, title):
+    """Scatter score vs volume de livros das editoras (tamanho = total de reviews)."""
+    import plotly.express as px
+    
+    return px.scatter(
+        df,
+        render_mode='webgl',
+        x='total_livros',
+        y=score_column,
+        size='total_reviews',
+        hover_data=['editora', 'sentimento_medio'],
+        title=title,
+        color='sentimento_medio',
+        color_continuous_scale=color_scale
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def theme_comparison_figure(combined):
+    """Barras comparando os melhores e os piores temas."""
+    import plotly.express as px
+    
+    fig = px.bar(
+        combined,
+        x='score',
+        y='tema',
+        color='categoria',
+        orientation='h',
+        title="Comparação: Melhores vs Piores Temas",
+        color_discrete_map={'Melhores': '#2ca02c', 'Piores': '#d62728'}
+    )
+    fig.update_layout(height=600)
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def period_bar_figure(periods_data, y_column, color_column, color_scale, title):
+    """Barras por período (sentimento ou volume)."""
+    import plotly.express as px
+    
+    fig = px.bar(
+        periods_data,
+        x='periodo',
+        y=y_column,
+        color=color_column,
+        color_continuous_scale=color_scale,
+        title=title
+    )
+    fig.update_layout(xaxis_tickangle=-45)
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def period_evolution_figure(periods_data):
+    """Linhas de % positivos e % negativos por período."""
+    import plotly.express as px
+    
+    fig = px.line(
+        periods_data,
+        x='periodo',
+        y=['pct_positivo', 'pct_negativo'],
+        title="Evolução: % Positivos vs % Negativos",
+        labels={'value': 'Percentual', 'variable': 'Tipo'}
+    )
+    fig.update_layout(xaxis_tickangle=-45)
+    return fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def yearly_sentiment_figure(yearly_data, start_year):
+    """Linha do sentimento médio ano a ano."""
+    import plotly.express as px
+    
+    fig = px.line(
+        yearly_data,
+        x='ano',
+        y='sentimento_medio',
+        title=f"Evolução do Sentimento ({start_year}-2024)",
+        markers=True
+    )
+    fig.add_hline(y=0, line_dash="dash", line_color="gray", annotation_text="Neutro")
+    return fig
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _probe_database(db_path, db_mtime):
+    """Teste de conexão barato; roda no máximo uma vez a cada 30s por banco/mtime."""
+    get_connection(db_path).execute("SELECT 1").fetchone()
+    return True
+
+
 def check_database_status():
     """Verifica se o banco de dados existe e está acessível."""
     db_path = "books_database.db"
@@ -136,15 +550,20 @@ def check_database_status():
         return False, f"Banco de dados não encontrado: {db_path}"
     
     try:
-        # Teste simples de conexão
-        stats = get_summary_stats(db_path)
+        # Bancos baixados prontos podem não trazer os índices nem as tabelas
+        # agregadas (criados uma vez por processo), antes das consultas em paralelo
+        ensure_indexes(db_path)
+        ensure_materialized_tables(db_path)
+        
+        # Teste simples de conexão (erros não ficam em cache)
+        _probe_database(db_path, get_db_mtime(db_path))
         return True, "Banco de dados conectado com sucesso"
     except Exception as e:
         return False, f"Erro ao conectar: {str(e)}"
 
-def show_status_bar():
-    """Mostra barra de status do sistema."""
-    is_ok, message = check_database_status()
+def show_status_bar(db_status):
+    """Mostra barra de status do sistema (db_status: retorno de check_database_status)."""
+    is_ok, message = db_status
     
     col1, col2, col3 = st.columns([2, 1, 1])
     
@@ -156,6 +575,7 @@ def show_status_bar():
     
     with col2:
         if st.button("🔄 Atualizar Status"):
+            _probe_database.clear()
             st.rerun()
     
     with col3:
@@ -169,15 +589,18 @@ def main():
         st.error("Módulo de consultas não disponível!")
         st.stop()
     
+    # Status do banco: verificado uma vez por execução e usado no cabeçalho e abaixo
+    db_status = check_database_status()
+    
     # Header principal
     st.markdown('<div class="main-header">', unsafe_allow_html=True)
     st.title("📚 POC - Análise de Livros e Reviews")
     st.markdown("**Dashboard para tomada de decisões baseada em dados**")
-    show_status_bar()
+    show_status_bar(db_status)
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Verificar se banco existe antes de continuar
-    is_ok, message = check_database_status()
+    is_ok, message = db_status
     if not is_ok:
         st.error("🚨 Sistema não pode inicializar!")
         st.error(message)
@@ -198,31 +621,26 @@ def main():
                     st.error(f"Erro ao criar banco: {e}")
         return
     
-    # Sidebar com navegação
-    st.sidebar.title("🧭 Navegação")
-    st.sidebar.markdown("---")
-    
-    # Lista de páginas dinâmica baseada na disponibilidade
+    # Navegação nativa: só a função da página selecionada é executada
     pages = [
-        "🏠 Dashboard Geral",
-        "⚠️ Livros Problemáticos", 
-        "👥 Usuários para Entrevista",
-        "💰 ROI por Categoria/Autor",
-        "🔍 Discrepâncias de Sentimento",
-        "📈 Análise de Desempenho",
-        "📅 Análise Temporal"
+        st.Page(show_dashboard, title="Dashboard Geral", icon="🏠", url_path="dashboard", default=True),
+        st.Page(show_problematic_books, title="Livros Problemáticos", icon="⚠️", url_path="livros-problematicos"),
+        st.Page(show_users_interview, title="Usuários para Entrevista", icon="👥", url_path="usuarios-entrevista"),
+        st.Page(show_roi_analysis, title="ROI por Categoria/Autor", icon="💰", url_path="roi"),
+        st.Page(show_sentiment_discrepancies, title="Discrepâncias de Sentimento", icon="🔍", url_path="discrepancias"),
+        st.Page(show_performance_analysis, title="Análise de Desempenho", icon="📈", url_path="desempenho"),
+        st.Page(show_temporal_analysis, title="Análise Temporal", icon="📅", url_path="temporal")
     ]
     
     # Adicionar página de IA se disponível
     if SUMMARY_AVAILABLE:
-        pages.append("📝 Resumo de Reviews IA")
+        pages.append(st.Page(show_reviews_summary, title="Resumo de Reviews IA", icon="📝", url_path="resumo-ia"))
     else:
-        pages.append("📝 Resumo IA (Indisponível)")
+        pages.append(st.Page(show_summary_unavailable, title="Resumo IA (Indisponível)", icon="📝", url_path="resumo-ia"))
     
-    page = st.sidebar.selectbox("Escolha a análise:", pages)
+    page = st.navigation(pages)
     
     # Status dos módulos na sidebar
-    st.sidebar.markdown("---")
     st.sidebar.markdown("### 🔧 Status dos Módulos")
     
     if QUERIES_AVAILABLE:
@@ -243,25 +661,7 @@ def main():
         "identificar oportunidades de negócio e problemas de qualidade."
     )
     
-    # Roteamento das páginas
-    if page == "🏠 Dashboard Geral":
-        show_dashboard()
-    elif page == "⚠️ Livros Problemáticos":
-        show_problematic_books()
-    elif page == "👥 Usuários para Entrevista":
-        show_users_interview()
-    elif page == "💰 ROI por Categoria/Autor":
-        show_roi_analysis()
-    elif page == "🔍 Discrepâncias de Sentimento":
-        show_sentiment_discrepancies()
-    elif page == "📈 Análise de Desempenho":
-        show_performance_analysis()
-    elif page == "📅 Análise Temporal":
-        show_temporal_analysis()
-    elif page == "📝 Resumo de Reviews IA" and SUMMARY_AVAILABLE:
-        show_reviews_summary()
-    elif "Resumo IA" in page:
-        show_summary_unavailable()
+    page.run()
 
 def show_summary_unavailable():
     """Página quando o módulo de IA não está disponível."""
@@ -296,11 +696,17 @@ def show_dashboard():
     
     st.header("📊 Dashboard Geral")
     
-    # Carregar estatísticas
+    # Carregar estatísticas (consultas independentes, em paralelo)
+    stats_future, dist_future, problematic_future = submit_cached_queries(
+        (get_summary_stats, {}),
+        (get_sentiment_distribution, {}),
+        (get_problematic_books, {'limit': 3})
+    )
+    
     with st.spinner("Carregando dados..."):
         try:
-            stats = get_summary_stats("books_database.db")
-            sentiment_dist = get_sentiment_distribution("books_database.db")
+            stats = stats_future.result()
+            sentiment_dist = dist_future.result()
         except Exception as e:
             st.error(f"Erro ao carregar dados: {e}")
             return
@@ -310,42 +716,38 @@ def show_dashboard():
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
         st.metric(
             label="📚 Total de Livros",
             value=f"{stats.get('total_books', 0):,}",
-            help="Número total de livros na base"
+            help="Número total de livros na base",
+            border=True
         )
-        st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
         st.metric(
             label="💬 Total de Reviews",
             value=f"{stats.get('total_reviews', 0):,}",
-            help="Número total de reviews analisados"
+            help="Número total de reviews analisados",
+            border=True
         )
-        st.markdown('</div>', unsafe_allow_html=True)
     
     with col3:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
         st.metric(
             label="👥 Usuários Únicos",
             value=f"{stats.get('total_users', 0):,}",
-            help="Número de usuários que fizeram reviews"
+            help="Número de usuários que fizeram reviews",
+            border=True
         )
-        st.markdown('</div>', unsafe_allow_html=True)
     
     with col4:
         sentiment_val = stats.get('avg_sentiment', 0)
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
         st.metric(
             label="😊 Sentimento Médio",
             value=f"{sentiment_val:.3f}",
             delta="Positivo" if sentiment_val > 0 else "Negativo",
-            help="Score médio de sentimento (-1 a 1)"
+            help="Score médio de sentimento (-1 a 1)",
+            border=True
         )
-        st.markdown('</div>', unsafe_allow_html=True)
     
     # Gráficos lado a lado
     col1, col2 = st.columns(2)
@@ -353,19 +755,7 @@ def show_dashboard():
     with col1:
         st.subheader("🎯 Distribuição de Sentimentos")
         if not sentiment_dist.empty:
-            fig = px.pie(
-                sentiment_dist, 
-                values='quantidade', 
-                names='sentimento',
-                color_discrete_map={
-                    'positivo': '#2ca02c',
-                    'neutro': '#ff7f0e', 
-                    'negativo': '#d62728'
-                },
-                title="Proporção de Sentimentos"
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(sentiment_pie_figure(sentiment_dist), use_container_width=True)
         else:
             st.warning("Dados de sentimento não disponíveis")
     
@@ -390,11 +780,14 @@ def show_dashboard():
         # Quick insights
         st.subheader("🔍 Insights Rápidos")
         try:
-            problematic = get_problematic_books(limit=3, db_path="books_database.db")
+            problematic = problematic_future.result()
             if not problematic.empty:
                 st.write("**Top 3 Livros Problemáticos:**")
-                for idx, row in problematic.iterrows():
-                    st.write(f"• {row['titulo'][:40]}... (Score: {row['problema_score']:.1f})")
+                st.write("\n".join(
+                    f"- {titulo[:40]}... (Score: {score:.1f})"
+                    for titulo, score in zip(problematic['titulo'].to_numpy(),
+                                             problematic['problema_score'].to_numpy())
+                ))
             else:
                 st.info("✅ Nenhum livro altamente problemático identificado")
         except Exception as e:
@@ -413,10 +806,15 @@ def show_problematic_books():
     with col2:
         show_details = st.checkbox("Mostrar detalhes", value=True)
     
-    # Carregar dados
+    # Carregar dados (livros e contagem por nível de risco, em paralelo)
     with st.spinner("Analisando livros problemáticos..."):
         try:
-            df = get_problematic_books(limit=limit, db_path="books_database.db")
+            df_future, buckets_future = submit_cached_queries(
+                (get_problematic_books, {'limit': limit}),
+                (get_problem_risk_buckets, {'limit': limit})
+            )
+            df = df_future.result()
+            risk_buckets = buckets_future.result()
         except Exception as e:
             st.error(f"Erro ao carregar dados: {e}")
             return
@@ -429,111 +827,101 @@ def show_problematic_books():
     # Métricas de alerta em cards visuais
     st.subheader("🚨 Níveis de Risco")
     
-    high_problem = len(df[df['problema_score'] > 50])
-    medium_problem = len(df[(df['problema_score'] > 25) & (df['problema_score'] <= 50)])
-    low_problem = len(df[df['problema_score'] <= 25])
+    high_problem = risk_buckets['alto']
+    medium_problem = risk_buckets['medio']
+    low_problem = risk_buckets['baixo']
     
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3 = st.container(key="risk-metrics-livros").columns(3)
     
     with col1:
-        st.markdown('<div class="metric-card alert-high">', unsafe_allow_html=True)
-        st.metric("🚨 Alto Risco", high_problem, help="Score > 50")
-        st.markdown('</div>', unsafe_allow_html=True)
+        st.metric("🚨 Alto Risco", high_problem, help="Score > 50", border=True)
     
     with col2:
-        st.markdown('<div class="metric-card alert-medium">', unsafe_allow_html=True)
-        st.metric("⚠️ Médio Risco", medium_problem, help="Score 25-50")
-        st.markdown('</div>', unsafe_allow_html=True)
+        st.metric("⚠️ Médio Risco", medium_problem, help="Score 25-50", border=True)
     
     with col3:
-        st.markdown('<div class="metric-card alert-low">', unsafe_allow_html=True)
-        st.metric("⚡ Baixo Risco", low_problem, help="Score < 25")
-        st.markdown('</div>', unsafe_allow_html=True)
+        st.metric("⚡ Baixo Risco", low_problem, help="Score < 25", border=True)
     
     # Visualizações
     col1, col2 = st.columns(2)
     
     with col1:
         # Gráfico de barras horizontal
-        fig = px.bar(
-            df.head(15), 
-            x='problema_score', 
-            y='titulo',
-            orientation='h',
-            color='problema_score',
-            color_continuous_scale='Reds',
-            title="Score de Problema por Livro",
-            labels={'problema_score': 'Score Problema', 'titulo': 'Livro'}
-        )
-        fig.update_layout(height=500, yaxis={'categoryorder':'total ascending'})
-        fig.update_traces(texttemplate='%{x:.1f}', textposition='outside')
+        fig = problem_score_bar_figure(df.head(15))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         # Distribuição dos scores
-        fig = px.histogram(
-            df,
-            x='problema_score',
+        fig = histogram_figure(
+            df['problema_score'].to_numpy(),
             nbins=10,
             title="Distribuição dos Scores de Problema",
-            labels={'problema_score': 'Score Problema', 'count': 'Frequência'}
+            xaxis_title='Score Problema',
+            height=500
         )
-        fig.update_layout(height=500)
         st.plotly_chart(fig, use_container_width=True)
     
-    # Tabela detalhada
+    # Tabela detalhada (fragmento: o filtro de score não recarrega a página)
     if show_details:
-        st.subheader("📋 Detalhes dos Livros Problemáticos")
-        
-        # Adicionar filtro por score
-        min_score = st.slider("Score mínimo", 0, 100, 0)
-        df_filtered = df[df['problema_score'] >= min_score]
-        
-        # Formatação da tabela
-        df_display = df_filtered.copy()
-        df_display['titulo'] = df_display['titulo'].str[:60] + '...'
-        df_display['autor'] = df_display['autor'].str[:30] + '...'
-        
-        st.dataframe(
-            df_display,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "titulo": "Título",
-                "autor": "Autor", 
-                "categoria": "Categoria",
-                "total_reviews": st.column_config.NumberColumn("Total Reviews", format="%d"),
-                "reviews_negativos": st.column_config.NumberColumn("Reviews Negativos", format="%d"),
-                "pct_negativo": st.column_config.NumberColumn(
-                    "% Negativo",
-                    help="Percentual de reviews negativos",
-                    format="%.1f%%"
-                ),
-                "compound_medio": st.column_config.NumberColumn(
-                    "Sentimento Médio",
-                    help="Score médio de sentimento",
-                    format="%.3f"
-                ),
-                "problema_score": st.column_config.NumberColumn(
-                    "Score Problema",
-                    help="Quanto maior, mais problemático",
-                    format="%.1f"
-                )
-            }
-        )
-        
-        # Opção de download
-        if st.button("📥 Download CSV"):
-            csv = df_filtered.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Baixar dados",
-                data=csv,
-                file_name="livros_problematicos.csv",
-                mime="text/csv"
+        show_problematic_details(df)
+
+
+@st.fragment
+def show_problematic_details(df):
+    """Tabela detalhada dos livros problemáticos com filtro por score."""
+    st.subheader("📋 Detalhes dos Livros Problemáticos")
+    
+    # Adicionar filtro por score
+    min_score = st.slider("Score mínimo", 0, 100, 0)
+    df_filtered = df[df['problema_score'] >= min_score]
+    
+    # Formatação da tabela
+    df_display = df_filtered.assign(
+        titulo=truncate_text(df_filtered['titulo'], 60),
+        autor=truncate_text(df_filtered['autor'], 30)
+    )
+    
+    st.dataframe(
+        df_display,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "titulo": "Título",
+            "autor": "Autor", 
+            "categoria": "Categoria",
+            "total_reviews": st.column_config.NumberColumn("Total Reviews", format="%d"),
+            "reviews_negativos": st.column_config.NumberColumn("Reviews Negativos", format="%d"),
+            "pct_negativo": st.column_config.NumberColumn(
+                "% Negativo",
+                help="Percentual de reviews negativos",
+                format="%.1f%%"
+            ),
+            "compound_medio": st.column_config.NumberColumn(
+                "Sentimento Médio",
+                help="Score médio de sentimento",
+                format="%.3f"
+            ),
+            "problema_score": st.column_config.NumberColumn(
+                "Score Problema",
+                help="Quanto maior, mais problemático",
+                format="%.1f"
             )
+        }
+    )
+    
+    # Opção de download
+    st.download_button(
+        label="📥 Download CSV",
+        data=to_csv_bytes(df_filtered),
+        file_name="livros_problematicos.csv",
+        mime="text/csv",
+        on_click="ignore"
+    )
+
 
 def show_users_interview():
     """Página de seleção de usuários para entrevista."""
+    import plotly.express as px
     
     st.header("👥 Usuários para Entrevista")
     st.markdown("Seleção estratégica de usuários segmentados para pesquisa qualitativa.")
@@ -553,7 +941,7 @@ def show_users_interview():
     # Carregar dados
     with st.spinner("Selecionando usuários..."):
         try:
-            df = get_users_for_interview(limit=limit, db_path="books_database.db")
+            df = cached_query(get_users_for_interview, "books_database.db", limit=limit)
         except Exception as e:
             st.error(f"Erro ao carregar dados: {e}")
             return
@@ -599,6 +987,7 @@ def show_users_interview():
         st.subheader("📊 Score vs Reviews")
         fig = px.scatter(
             df,
+            render_mode='webgl',
             x='total_reviews',
             y='diversidade_score',
             color='segmento',
@@ -616,14 +1005,13 @@ def show_users_interview():
     with col1:
         show_all_columns = st.checkbox("Mostrar todas as colunas")
     with col2:
-        if st.button("📥 Preparar Download"):
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Download CSV",
-                data=csv,
-                file_name="usuarios_entrevista.csv",
-                mime="text/csv"
-            )
+        st.download_button(
+            label="📥 Download CSV",
+            data=to_csv_bytes(df),
+            file_name="usuarios_entrevista.csv",
+            mime="text/csv",
+            on_click="ignore"
+        )
     
     # Configurar colunas a exibir
     if show_all_columns:
@@ -661,6 +1049,12 @@ def show_roi_analysis():
     st.header("💰 Análise de ROI")
     st.markdown("Retorno sobre investimento estimado por categoria e autor.")
     
+    # As duas abas são renderizadas na mesma execução: consultar em paralelo
+    roi_cat_future, roi_author_future = submit_cached_queries(
+        (get_roi_by_category, {}),
+        (get_roi_by_author, {})
+    )
+    
     # Tabs para categoria e autor
     tab1, tab2 = st.tabs(["📚 Por Categoria", "✍️ Por Autor"])
     
@@ -669,7 +1063,7 @@ def show_roi_analysis():
         
         with st.spinner("Calculando ROI por categoria..."):
             try:
-                df_cat = get_roi_by_category(db_path="books_database.db")
+                df_cat = roi_cat_future.result()
             except Exception as e:
                 st.error(f"Erro ao carregar dados de categoria: {e}")
                 return
@@ -678,9 +1072,9 @@ def show_roi_analysis():
             # Métricas resumo
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("🏆 Melhor Categoria", df_cat.iloc[0]['categoria'])
+                st.metric("🏆 Melhor Categoria", df_cat.at[0, 'categoria'])
             with col2:
-                st.metric("💰 Melhor ROI", f"{df_cat.iloc[0]['roi_estimado']:.2f}")
+                st.metric("💰 Melhor ROI", f"{df_cat.at[0, 'roi_estimado']:.2f}")
             with col3:
                 st.metric("📚 Total Categorias", len(df_cat))
             
@@ -689,33 +1083,17 @@ def show_roi_analysis():
             
             with col1:
                 # Gráfico scatter ROI vs Volume para categorias
-                fig = px.scatter(
-                    df_cat,
-                    x='total_livros',
-                    y='roi_estimado',
-                    size='total_reviews',
-                    hover_data=['categoria', 'sentimento_medio'],
-                    title="ROI vs Volume de Livros (Categorias)",
-                    labels={'total_livros': 'Total de Livros', 'roi_estimado': 'ROI Estimado'}
-                )
+                fig = roi_scatter_figure(df_cat, 'categoria', "ROI vs Volume de Livros (Categorias)")
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
                 # Top 10 categorias
-                fig = px.bar(
-                    df_cat.head(10),
-                    x='roi_estimado',
-                    y='categoria',
-                    orientation='h',
-                    title="Top 10 Categorias por ROI"
-                )
-                fig.update_layout(height=400, yaxis={'categoryorder':'total ascending'})
+                fig = roi_bar_figure(df_cat.head(10), 'categoria', "Top 10 Categorias por ROI")
                 st.plotly_chart(fig, use_container_width=True)
             
             # Tabela detalhada categorias
             st.subheader("📊 Dados Detalhados - Categorias")
-            df_cat_display = df_cat.copy()
-            df_cat_display['categoria'] = df_cat_display['categoria'].str[:50] + '...'
+            df_cat_display = df_cat.assign(categoria=truncate_text(df_cat['categoria'], 50))
             
             st.dataframe(
                 df_cat_display,
@@ -743,7 +1121,7 @@ def show_roi_analysis():
         
         with st.spinner("Calculando ROI por autor..."):
             try:
-                df_author = get_roi_by_author(db_path="books_database.db")
+                df_author = roi_author_future.result()
             except Exception as e:
                 st.error(f"Erro ao carregar dados de autor: {e}")
                 return
@@ -752,9 +1130,9 @@ def show_roi_analysis():
             # Métricas resumo
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("🏆 Melhor Autor", df_author.iloc[0]['autor'][:30] + "...")
+                st.metric("🏆 Melhor Autor", df_author.at[0, 'autor'][:30] + "...")
             with col2:
-                st.metric("💰 Melhor ROI", f"{df_author.iloc[0]['roi_estimado']:.2f}")
+                st.metric("💰 Melhor ROI", f"{df_author.at[0, 'roi_estimado']:.2f}")
             with col3:
                 st.metric("✍️ Total Autores", len(df_author))
             
@@ -763,33 +1141,17 @@ def show_roi_analysis():
             
             with col1:
                 # Gráfico scatter ROI vs Volume para autores
-                fig = px.scatter(
-                    df_author,
-                    x='total_livros',
-                    y='roi_estimado',
-                    size='total_reviews',
-                    hover_data=['autor', 'sentimento_medio'],
-                    title="ROI vs Volume de Livros (Autores)",
-                    labels={'total_livros': 'Total de Livros', 'roi_estimado': 'ROI Estimado'}
-                )
+                fig = roi_scatter_figure(df_author, 'autor', "ROI vs Volume de Livros (Autores)")
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
                 # Top 10 autores
-                fig = px.bar(
-                    df_author.head(10),
-                    x='roi_estimado',
-                    y='autor',
-                    orientation='h',
-                    title="Top 10 Autores por ROI"
-                )
-                fig.update_layout(height=400, yaxis={'categoryorder':'total ascending'})
+                fig = roi_bar_figure(df_author.head(10), 'autor', "Top 10 Autores por ROI")
                 st.plotly_chart(fig, use_container_width=True)
             
             # Tabela detalhada autores
             st.subheader("📊 Dados Detalhados - Autores")
-            df_author_display = df_author.copy()
-            df_author_display['autor'] = df_author_display['autor'].str[:50] + '...'
+            df_author_display = df_author.assign(autor=truncate_text(df_author['autor'], 50))
             
             st.dataframe(
                 df_author_display,
@@ -834,7 +1196,7 @@ def show_sentiment_discrepancies():
     # Carregar dados
     with st.spinner("Analisando discrepâncias..."):
         try:
-            df = get_sentiment_discrepancies(limit=limit, db_path="books_database.db")
+            df = cached_query(get_sentiment_discrepancies, "books_database.db", limit=limit)
         except Exception as e:
             st.error(f"Erro ao carregar dados: {e}")
             return
@@ -855,97 +1217,46 @@ def show_sentiment_discrepancies():
     # Métricas de discrepância
     st.subheader("🚨 Análise de Discrepâncias")
     
-    high_disc = len(df[df['nivel_discrepancia'] == 'Alto'])
-    medium_disc = len(df[df['nivel_discrepancia'] == 'Médio'])
-    low_disc = len(df[df['nivel_discrepancia'] == 'Baixo'])
+    # Contagem por nível em uma única passada (usada nas métricas e na pizza)
+    level_counts = df['nivel_discrepancia'].value_counts()
+    high_disc = int(level_counts.get('Alto', 0))
+    medium_disc = int(level_counts.get('Médio', 0))
+    low_disc = int(level_counts.get('Baixo', 0))
     
-    col1, col2, col3, col4 = st.columns(4)
+    col1, col2, col3, col4 = st.container(key="risk-metrics-discrepancias").columns(4)
     
     with col1:
-        st.markdown('<div class="metric-card alert-high">', unsafe_allow_html=True)
-        st.metric("🚨 Discrepância Alta", high_disc)
-        st.markdown('</div>', unsafe_allow_html=True)
+        st.metric("🚨 Discrepância Alta", high_disc, border=True)
     
     with col2:
-        st.markdown('<div class="metric-card alert-medium">', unsafe_allow_html=True)
-        st.metric("⚠️ Discrepância Média", medium_disc)
-        st.markdown('</div>', unsafe_allow_html=True)
+        st.metric("⚠️ Discrepância Média", medium_disc, border=True)
     
     with col3:
-        st.markdown('<div class="metric-card alert-low">', unsafe_allow_html=True)
-        st.metric("⚡ Discrepância Baixa", low_disc)
-        st.markdown('</div>', unsafe_allow_html=True)
+        st.metric("⚡ Discrepância Baixa", low_disc, border=True)
     
     with col4:
-        st.metric("🎯 Total Analisados", len(df))
+        st.metric("🎯 Total Analisados", len(df), border=True)
     
     # Visualizações
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📊 Distribuição por Nível")
-        level_counts = df['nivel_discrepancia'].value_counts()
-        fig = px.pie(
-            values=level_counts.values,
-            names=level_counts.index,
-            color_discrete_map={
-                'Alto': '#d62728',
-                'Médio': '#ff7f0e',
-                'Baixo': '#2ca02c'
-            },
-            title="Discrepâncias por Nível"
-        )
+        fig = discrepancy_pie_figure(level_counts)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("📈 Score vs Compound")
-        fig = px.scatter(
-            df,
-            x='compound_score',
-            y='score_discrepancia',
-            color='nivel_discrepancia',
-            hover_data=['sentimento_classificado', 'sentimento_esperado'],
-            title="Discrepância vs Compound Score",
-            color_discrete_map={
-                'Alto': '#d62728',
-                'Médio': '#ff7f0e',
-                'Baixo': '#2ca02c'
-            }
-        )
+        fig = discrepancy_scatter_figure(df)
         st.plotly_chart(fig, use_container_width=True)
     
     # Análise detalhada de casos
     if show_reviews:
         st.subheader("🔍 Análise Detalhada de Casos")
         
-        # Mostrar casos mais críticos
-        critical_cases = df[df['nivel_discrepancia'] == 'Alto'].head(5)
-        
-        if not critical_cases.empty:
-            st.write("**🚨 Casos mais críticos:**")
-            
-            for idx, row in critical_cases.iterrows():
-                with st.expander(f"📖 {row['titulo'][:50]}... | Score: {row['score_discrepancia']:.3f}"):
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.write("**📝 Texto do Review:**")
-                        st.write(f"_{row['review_preview']}_")
-                        
-                    with col2:
-                        st.write("**🧠 Análise Automática:**")
-                        st.write(f"**Classificado como:** `{row['sentimento_classificado']}`")
-                        st.write(f"**Deveria ser:** `{row['sentimento_esperado']}`")
-                        st.write(f"**Compound Score:** `{row['compound_score']}`")
-                        st.write(f"**Nível de Discrepância:** `{row['nivel_discrepancia']}`")
-                        
-                        # Sugestão de ação
-                        if row['nivel_discrepancia'] == 'Alto':
-                            st.error("🔴 **Ação:** Revisar classificação manualmente")
-                        elif row['nivel_discrepancia'] == 'Médio':
-                            st.warning("🟡 **Ação:** Validar com mais dados")
-                        else:
-                            st.info("🟢 **Ação:** Monitorar tendência")
+        # Mostrar casos mais críticos (máscara numpy direto, sem Series intermediária)
+        critical_cases = df.loc[df['nivel_discrepancia'].to_numpy() == 'Alto'].nlargest(5, 'score_discrepancia')
+        show_critical_cases(critical_cases)
     
     # Tabela resumo
     st.subheader("📋 Resumo das Discrepâncias")
@@ -955,19 +1266,20 @@ def show_sentiment_discrepancies():
     with col1:
         show_full_text = st.checkbox("Mostrar texto completo do review")
     with col2:
-        if st.button("📥 Download Discrepâncias"):
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Baixar CSV",
-                data=csv,
-                file_name="discrepancias_sentimento.csv",
-                mime="text/csv"
-            )
+        st.download_button(
+            label="📥 Download Discrepâncias",
+            data=to_csv_bytes(df),
+            file_name="discrepancias_sentimento.csv",
+            mime="text/csv",
+            on_click="ignore"
+        )
     
     # Preparar dados para exibição
-    df_display = df.copy()
-    if not show_full_text:
-        df_display['review_preview'] = df_display['review_preview'].str[:100] + '...'
+    # Só a coluna de texto é trocada (sem copiar o DataFrame inteiro)
+    if show_full_text:
+        df_display = df
+    else:
+        df_display = df.assign(review_preview=truncate_text(df['review_preview'], 100))
     
     st.dataframe(
         df_display,
@@ -1016,6 +1328,36 @@ def show_sentiment_discrepancies():
         """)
 
 
+@st.fragment
+def show_critical_cases(critical_cases):
+    """Expanders dos casos mais críticos (fragmento: reexecuta sozinho)."""
+    if not critical_cases.empty:
+        st.write("**🚨 Casos mais críticos:**")
+        
+        for row in critical_cases.itertuples(index=False):
+            with st.expander(f"📖 {row.titulo[:50]}... | Score: {row.score_discrepancia:.3f}"):
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    st.write("**📝 Texto do Review:**")
+                    st.write(f"_{row.review_preview}_")
+                    
+                with col2:
+                    st.write("**🧠 Análise Automática:**")
+                    st.write(f"**Classificado como:** `{row.sentimento_classificado}`")
+                    st.write(f"**Deveria ser:** `{row.sentimento_esperado}`")
+                    st.write(f"**Compound Score:** `{row.compound_score:.3f}`")
+                    st.write(f"**Nível de Discrepância:** `{row.nivel_discrepancia}`")
+                    
+                    # Sugestão de ação
+                    if row.nivel_discrepancia == 'Alto':
+                        st.error("🔴 **Ação:** Revisar classificação manualmente")
+                    elif row.nivel_discrepancia == 'Médio':
+                        st.warning("🟡 **Ação:** Validar com mais dados")
+                    else:
+                        st.info("🟢 **Ação:** Monitorar tendência")
+
+
 def show_performance_analysis():
     """Página de análise de desempenho (melhores e piores)."""
     
@@ -1037,71 +1379,58 @@ def show_performance_analysis():
         
         with st.spinner("Analisando desempenho dos livros..."):
             try:
-                books_data = get_best_worst_books(limit=limit_books, db_path="books_database.db")
+                books_data = cached_query(get_best_worst_books, "books_database.db", limit=limit_books)
             except Exception as e:
                 st.error(f"Erro ao carregar dados: {e}")
                 return
         
-        if show_comparison and not books_data['melhores'].empty and not books_data['piores'].empty:
+        best_books, worst_books = books_data['melhores'], books_data['piores']
+        n_best, n_worst = len(best_books), len(worst_books)
+        
+        if show_comparison and n_best and n_worst:
             col1, col2 = st.columns(2)
             
             with col1:
                 st.markdown("### 🏆 Melhores Livros")
-                st.success(f"Top {len(books_data['melhores'])} livros com melhor desempenho")
+                st.success(f"Top {n_best} livros com melhor desempenho")
                 
                 # Gráfico dos melhores
-                fig = px.bar(
-                    books_data['melhores'].head(10),
-                    x='performance_score',
-                    y='titulo',
-                    orientation='h',
-                    color='performance_score',
-                    color_continuous_scale='Greens',
-                    title="Score de Performance"
-                )
-                fig.update_layout(height=400, yaxis={'categoryorder':'total ascending'})
+                top_best = best_books.head(10)
+                fig = score_bar_figure(top_best, 'performance_score', 'Greens', "Score de Performance")
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Top 5 em tabela
                 st.dataframe(
-                    books_data['melhores'].head(5)[['titulo', 'autor', 'performance_score', 'sentimento_medio']],
+                    top_best.head(5)[['titulo', 'autor', 'performance_score', 'sentimento_medio']],
                     use_container_width=True,
                     hide_index=True
                 )
             
             with col2:
                 st.markdown("### ⚠️ Piores Livros")
-                st.error(f"Top {len(books_data['piores'])} livros com pior desempenho")
+                st.error(f"Top {n_worst} livros com pior desempenho")
                 
                 # Gráfico dos piores
-                fig = px.bar(
-                    books_data['piores'].head(10),
-                    x='problema_score',
-                    y='titulo',
-                    orientation='h',
-                    color='problema_score',
-                    color_continuous_scale='Reds',
-                    title="Score de Problema"
-                )
-                fig.update_layout(height=400, yaxis={'categoryorder':'total ascending'})
+                top_worst = worst_books.head(10)
+                fig = score_bar_figure(top_worst, 'problema_score', 'Reds', "Score de Problema")
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Top 5 em tabela
                 st.dataframe(
-                    books_data['piores'].head(5)[['titulo', 'autor', 'problema_score', 'sentimento_medio']],
+                    top_worst.head(5)[['titulo', 'autor', 'problema_score', 'sentimento_medio']],
                     use_container_width=True,
                     hide_index=True
                 )
         
         else:
             # Mostrar sequencial
-            if not books_data['melhores'].empty:
+            if n_best:
                 st.markdown("### 🏆 Melhores Livros")
-                st.dataframe(books_data['melhores'], use_container_width=True, hide_index=True)
+                st.dataframe(best_books, use_container_width=True, hide_index=True)
             
-            if not books_data['piores'].empty:
+            if n_worst:
                 st.markdown("### ⚠️ Piores Livros")
-                st.dataframe(books_data['piores'], use_container_width=True, hide_index=True)
+                st.dataframe(worst_books, use_container_width=True, hide_index=True)
     
     with tab2:
         st.subheader("🏢 Desempenho de Editoras")
@@ -1110,55 +1439,40 @@ def show_performance_analysis():
         
         with st.spinner("Analisando desempenho das editoras..."):
             try:
-                publishers_data = get_best_worst_publishers(limit=limit_publishers, db_path="books_database.db")
+                publishers_data = cached_query(get_best_worst_publishers, "books_database.db", limit=limit_publishers)
             except Exception as e:
                 st.error(f"Erro ao carregar dados: {e}")
                 return
         
+        best_publishers, worst_publishers = publishers_data['melhores'], publishers_data['piores']
+        n_best, n_worst = len(best_publishers), len(worst_publishers)
+        
         col1, col2 = st.columns(2)
         
         with col1:
             st.markdown("### 🏆 Melhores Editoras")
-            if not publishers_data['melhores'].empty:
+            if n_best:
                 # Gráfico
-                fig = px.scatter(
-                    publishers_data['melhores'],
-                    x='total_livros',
-                    y='performance_score',
-                    size='total_reviews',
-                    hover_data=['editora', 'sentimento_medio'],
-                    title="Performance vs Volume",
-                    color='sentimento_medio',
-                    color_continuous_scale='Greens'
-                )
+                fig = volume_scatter_figure(best_publishers, 'performance_score', 'Greens', "Performance vs Volume")
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Tabela
                 st.dataframe(
-                    publishers_data['melhores'][['editora', 'total_livros', 'performance_score', 'sentimento_medio']],
+                    best_publishers[['editora', 'total_livros', 'performance_score', 'sentimento_medio']],
                     use_container_width=True,
                     hide_index=True
                 )
         
         with col2:
             st.markdown("### ⚠️ Piores Editoras")
-            if not publishers_data['piores'].empty:
+            if n_worst:
                 # Gráfico
-                fig = px.scatter(
-                    publishers_data['piores'],
-                    x='total_livros',
-                    y='problema_score',
-                    size='total_reviews',
-                    hover_data=['editora', 'sentimento_medio'],
-                    title="Problemas vs Volume",
-                    color='sentimento_medio',
-                    color_continuous_scale='Reds'
-                )
+                fig = volume_scatter_figure(worst_publishers, 'problema_score', 'Reds', "Problemas vs Volume")
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Tabela
                 st.dataframe(
-                    publishers_data['piores'][['editora', 'total_livros', 'problema_score', 'sentimento_medio']],
+                    worst_publishers[['editora', 'total_livros', 'problema_score', 'sentimento_medio']],
                     use_container_width=True,
                     hide_index=True
                 )
@@ -1170,40 +1484,31 @@ def show_performance_analysis():
         
         with st.spinner("Analisando desempenho dos temas..."):
             try:
-                themes_data = get_best_worst_themes(limit=limit_themes, db_path="books_database.db")
+                themes_data = cached_query(get_best_worst_themes, "books_database.db", limit=limit_themes)
             except Exception as e:
                 st.error(f"Erro ao carregar dados: {e}")
                 return
         
+        best_themes, worst_themes = themes_data['melhores'], themes_data['piores']
+        n_best, n_worst = len(best_themes), len(worst_themes)
+        
         # Comparação visual
-        if not themes_data['melhores'].empty and not themes_data['piores'].empty:
+        if n_best and n_worst:
             # Gráfico comparativo
             st.subheader("📊 Comparação de Performance por Tema")
             
-            # Combinar dados para comparação
-            best_themes = themes_data['melhores'].head(8).copy()
-            best_themes['categoria'] = 'Melhores'
-            best_themes['score'] = best_themes['performance_score']
+            # Combinar dados para comparação (uma alocação por coluna)
+            best = best_themes.head(8)
+            worst = worst_themes.head(8)
             
-            worst_themes = themes_data['piores'].head(8).copy()
-            worst_themes['categoria'] = 'Piores'
-            worst_themes['score'] = worst_themes['problema_score']
+            combined = pd.DataFrame({
+                'tema': np.concatenate([best['tema'].to_numpy(), worst['tema'].to_numpy()]),
+                'categoria': np.repeat(['Melhores', 'Piores'], [len(best), len(worst)]),
+                'score': np.concatenate([best['performance_score'].to_numpy(), worst['problema_score'].to_numpy()]),
+                'sentimento_medio': np.concatenate([best['sentimento_medio'].to_numpy(), worst['sentimento_medio'].to_numpy()])
+            })
             
-            combined = pd.concat([
-                best_themes[['tema', 'categoria', 'score', 'sentimento_medio']],
-                worst_themes[['tema', 'categoria', 'score', 'sentimento_medio']]
-            ])
-            
-            fig = px.bar(
-                combined,
-                x='score',
-                y='tema',
-                color='categoria',
-                orientation='h',
-                title="Comparação: Melhores vs Piores Temas",
-                color_discrete_map={'Melhores': '#2ca02c', 'Piores': '#d62728'}
-            )
-            fig.update_layout(height=600)
+            fig = theme_comparison_figure(combined)
             st.plotly_chart(fig, use_container_width=True)
         
         # Tabelas detalhadas
@@ -1211,18 +1516,18 @@ def show_performance_analysis():
         
         with col1:
             st.markdown("### 🏆 Melhores Temas")
-            if not themes_data['melhores'].empty:
+            if n_best:
                 st.dataframe(
-                    themes_data['melhores'][['tema', 'total_livros', 'performance_score', 'pct_positivo']],
+                    best_themes[['tema', 'total_livros', 'performance_score', 'pct_positivo']],
                     use_container_width=True,
                     hide_index=True
                 )
         
         with col2:
             st.markdown("### ⚠️ Piores Temas")
-            if not themes_data['piores'].empty:
+            if n_worst:
                 st.dataframe(
-                    themes_data['piores'][['tema', 'total_livros', 'problema_score', 'pct_negativo']],
+                    worst_themes[['tema', 'total_livros', 'problema_score', 'pct_negativo']],
                     use_container_width=True,
                     hide_index=True
                 )
@@ -1239,8 +1544,8 @@ def show_temporal_analysis():
     
     with st.spinner("Carregando análise temporal..."):
         try:
-            periods_data = get_reviews_by_period(db_path="books_database.db")
-            trending_data = get_trending_analysis(db_path="books_database.db")
+            periods_data = cached_query(get_reviews_by_period, "books_database.db")
+            trending_data = cached_query(get_trending_analysis, "books_database.db")
         except Exception as e:
             st.error(f"Erro ao carregar dados: {e}")
             return
@@ -1283,41 +1588,18 @@ def show_temporal_analysis():
         
         with col1:
             # Gráfico de sentimento por período
-            fig = px.bar(
-                periods_data,
-                x='periodo',
-                y='sentimento_medio',
-                color='sentimento_medio',
-                color_continuous_scale='RdYlGn',
-                title="Sentimento Médio por Período"
-            )
-            fig.update_layout(xaxis_tickangle=-45)
+            fig = period_bar_figure(periods_data, 'sentimento_medio', 'sentimento_medio', 'RdYlGn', "Sentimento Médio por Período")
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Gráfico de volume por período
-            fig = px.bar(
-                periods_data,
-                x='periodo',
-                y='total_reviews',
-                color='reviews_por_livro',
-                color_continuous_scale='Blues',
-                title="Volume de Reviews por Período"
-            )
-            fig.update_layout(xaxis_tickangle=-45)
+            fig = period_bar_figure(periods_data, 'total_reviews', 'reviews_por_livro', 'Blues', "Volume de Reviews por Período")
             st.plotly_chart(fig, use_container_width=True)
         
         # Gráfico de evolução
         st.subheader("📈 Evolução Detalhada")
         
-        fig = px.line(
-            periods_data,
-            x='periodo',
-            y=['pct_positivo', 'pct_negativo'],
-            title="Evolução: % Positivos vs % Negativos",
-            labels={'value': 'Percentual', 'variable': 'Tipo'}
-        )
-        fig.update_layout(xaxis_tickangle=-45)
+        fig = period_evolution_figure(periods_data)
         st.plotly_chart(fig, use_container_width=True)
         
         # Tabela detalhada
@@ -1338,7 +1620,13 @@ def show_temporal_analysis():
             }
         )
     
-    # Análise por ano específico
+    # Análise por ano específico (fragmento: o botão não recarrega os gráficos acima)
+    show_yearly_analysis()
+
+
+@st.fragment
+def show_yearly_analysis():
+    """Análise anual detalhada a partir do ano escolhido."""
     st.subheader("📅 Análise Anual Detalhada")
     
     col1, col2 = st.columns([1, 3])
@@ -1356,18 +1644,11 @@ def show_temporal_analysis():
         if st.button("🔍 Analisar por Anos"):
             with st.spinner("Carregando dados anuais..."):
                 try:
-                    yearly_data = get_reviews_by_year(start_year=start_year, db_path="books_database.db")
+                    yearly_data = cached_query(get_reviews_by_year, "books_database.db", start_year=start_year)
                     
                     if not yearly_data.empty:
                         # Gráfico temporal anual
-                        fig = px.line(
-                            yearly_data,
-                            x='ano',
-                            y='sentimento_medio',
-                            title=f"Evolução do Sentimento ({start_year}-2024)",
-                            markers=True
-                        )
-                        fig.add_hline(y=0, line_dash="dash", line_color="gray", annotation_text="Neutro")
+                        fig = yearly_sentiment_figure(yearly_data, start_year)
                         st.plotly_chart(fig, use_container_width=True)
                         
                         # Tabela anual
@@ -1390,13 +1671,13 @@ def show_reviews_summary():
     st.markdown("Análise automática de reviews usando Inteligência Artificial.")
     
     # Verificar conexão OpenAI
-    from ai_summary_functions import test_openai_connection, get_available_books_for_analysis, run_book_summary_analysis, format_summary_for_display
+    from ai_summary_functions import run_book_summary_analysis, format_summary_for_display
     
     # Status da conexão
     st.subheader("🔌 Status da Conexão")
     
     with st.spinner("Verificando conexão OpenAI..."):
-        is_connected, connection_message = test_openai_connection()
+        is_connected, connection_message = cached_openai_connection()
     
     if is_connected:
         st.success(f"✅ {connection_message}")
@@ -1418,21 +1699,28 @@ def show_reviews_summary():
     with col2:
         search_limit = st.number_input("Máximo de resultados", min_value=5, max_value=20, value=10)
     
-    # Buscar livros disponíveis
-    if st.button("🔍 Buscar Livros") or not search_query:
+    # Buscar livros disponíveis. A sessão guarda só a última busca feita, para
+    # a lista continuar na tela nos reruns (ex.: botão de análise); o
+    # resultado vem do st.cache_data, que acompanha o mtime do banco
+    search_key = (search_query, search_limit)
+    
+    if st.button("🔍 Buscar Livros"):
+        st.session_state['books_search'] = search_key
+    
+    if not search_query or st.session_state.get('books_search') == search_key:
         with st.spinner("Buscando livros disponíveis..."):
             try:
-                available_books = get_available_books_for_analysis(
+                available_books = cached_available_books(
                     query=search_query, 
                     limit=search_limit, 
                     db_path="books_database.db"
                 )
                 
-                if not available_books.empty:
+                if available_books:
                     st.subheader("📚 Livros Disponíveis")
                     
-                    # Exibir livros em formato selecionável
-                    for idx, book in available_books.iterrows():
+                    # Exibir detalhes dos livros encontrados
+                    for book in available_books:
                         with st.expander(
                             f"📖 {book['titulo']} - {book['autor']} "
                             f"({book['total_reviews']} reviews, sentimento: {book['sentimento_medio']:.3f})"
@@ -1451,10 +1739,15 @@ def show_reviews_summary():
                             with col3:
                                 st.metric("Reviews Negativos", book['negativos'])
                                 st.metric("Sentimento Médio", f"{book['sentimento_medio']:.3f}")
-                            
-                            # Botão para analisar este livro
-                            if st.button(f"🤖 Analisar com IA", key=f"analyze_{idx}"):
-                                analyze_book_with_ai(book['titulo'])
+                    
+                    # Seleção única do livro a analisar (um só botão em vez de um por livro)
+                    selected_title = st.selectbox(
+                        "Analisar qual livro?",
+                        [book['titulo'] for book in available_books]
+                    )
+                    
+                    if st.button("🤖 Analisar com IA"):
+                        analyze_book_with_ai(selected_title)
                 else:
                     st.warning("Nenhum livro encontrado com os critérios especificados.")
                     st.info("💡 **Dica:** Tente termos mais genéricos ou deixe em branco para ver os livros mais populares.")
@@ -1468,38 +1761,39 @@ def analyze_book_with_ai(book_title):
     
     st.subheader(f"🤖 Análise IA: {book_title}")
     
-    with st.spinner("Analisando reviews com IA... (pode levar 30-60 segundos)"):
-        try:
-            from ai_summary_functions import run_book_summary_analysis, format_summary_for_display
-            
-            # Executar análise
-            analysis_result = run_book_summary_analysis(book_title, "books_database.db")
-            
-            if not analysis_result:
-                st.error("Erro na análise - resultado vazio")
-                return
-            
-            result, message = analysis_result
-            
-            if not result:
-                st.error(f"Erro na análise: {message}")
-                return
-            
-            # Formatar para exibição
-            formatted = format_summary_for_display(analysis_result)
+    try:
+        from ai_summary_functions import run_book_summary_analysis, format_summary_for_display
+        
+        # Executar análise (os resumos chegam em streaming nas abas abaixo)
+        with st.spinner("Carregando reviews do livro..."):
+            analysis_result = run_book_summary_analysis(book_title, "books_database.db", stream=True)
+        
+        if not analysis_result:
+            st.error("Erro na análise - resultado vazio")
+            return
+        
+        result, message = analysis_result
+        
+        if not result:
+            st.error(f"Erro na análise: {message}")
+            return
+        
+        # Formatar para exibição
+        formatted = format_summary_for_display(analysis_result)
+        
+        if formatted.get('status') == 'success':
+            display_analysis_results(formatted)
+        else:
+            st.error(f"Erro na formatação: {formatted.get('error', 'Erro desconhecido')}")
             
-            if formatted.get('status') == 'success':
-                display_analysis_results(formatted)
-            else:
-                st.error(f"Erro na formatação: {formatted.get('error', 'Erro desconhecido')}")
-                
-        except Exception as e:
-            st.error(f"Erro durante a análise: {e}")
-            st.info("💡 Verifique se sua chave OpenAI tem créditos suficientes.")
+    except Exception as e:
+        st.error(f"Erro durante a análise: {e}")
+        st.info("💡 Verifique se sua chave OpenAI tem créditos suficientes.")
 
 
 def display_analysis_results(analysis_data):
     """Exibe os resultados da análise de IA."""
+    import plotly.express as px
     
     book_info = analysis_data['book_info']
     insights = analysis_data['general_insights']
@@ -1525,14 +1819,8 @@ def display_analysis_results(analysis_data):
     recommendation = insights.get('recommendation', '')
     priority = insights.get('business_priority', 'Média')
     
-    if '✅' in recommendation:
-        st.success(recommendation)
-    elif '⚠️' in recommendation:
-        st.error(recommendation)
-    elif '🔄' in recommendation:
-        st.info(recommendation)
-    else:
-        st.warning(recommendation)
+    level = insights.get('recommendation_level', 'warning')
+    RECOMMENDATION_ALERTS.get(level, st.warning)(recommendation)
     
     st.write(f"**Prioridade de Negócio:** {priority}")
     
@@ -1586,15 +1874,26 @@ def display_sentiment_summary(summary_data, emoji, sentiment_class):
     
     st.success(f"{emoji} **{total_reviews} reviews analisados**")
     
+    # Resumo em streaming: os tokens aparecem conforme chegam e, ao final,
+    # o texto completo substitui o rascunho na mesma caixa estilizada
+    placeholder = st.empty()
+    
+    if summary_data.get('stream') is not None:
+        with placeholder.container():
+            st.markdown(f"#### {emoji} Resumo da IA:")
+            try:
+                summary_text = st.write_stream(summary_data['stream'])
+            except Exception as e:
+                placeholder.error(f"Erro ao gerar resumo: {e}")
+                return
+    
     # Exibir resumo em caixa estilizada
     css_class = f"{sentiment_class}-summary"
     
-    st.markdown(f"""
-    <div class="summary-box {css_class}">
-        <h4>{emoji} Resumo da IA:</h4>
-        <p>{summary_text}</p>
-    </div>
-    """, unsafe_allow_html=True)
+    placeholder.markdown(
+        _SUMMARY_TPL.format(cls=css_class, emoji=emoji, text=summary_text),
+        unsafe_allow_html=True
+    )
     
     # Botão para ver reviews originais
     if st.button(f"📖 Ver Reviews Originais {emoji}", key=f"show_{sentiment_class}"):
@@ -1607,6 +1906,12 @@ def display_sentiment_summary(summary_data, emoji, sentiment_class):
 
 
 # Funções auxiliares
+def truncate_text(series, max_chars):
+    """Truncar textos de uma Series de forma vetorizada (reticências só quando corta)."""
+    values = series.fillna('')
+    return values.where(values.str.len() <= max_chars, values.str.slice(0, max_chars) + '...')
+
+
 def format_number(num):
     """Formatar números para exibição."""
     if num >= 1000000:
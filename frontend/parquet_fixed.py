@@ -3,25 +3,124 @@ Script para carregar dados Parquet diretamente no SQLite
 Versão otimizada para frontend
 """
 
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import sqlite3
+import hashlib
+import importlib.util
 import os
+import queue
+import threading
 from pathlib import Path
 import sys
 
+from poc_queries import INDEXES, create_materialized_tables
+
+
+# DuckDB é opcional: se instalado, carrega o Parquet direto no SQLite (C++)
+DUCKDB_AVAILABLE = importlib.util.find_spec("duckdb") is not None
+
+
+# Linhas por lote lidas do Parquet e inseridas no SQLite
+BATCH_SIZE = 50_000
+
+# Colunas usadas pelas consultas do app (poc_queries.py / ai_summary_functions.py);
+# só elas são lidas do Parquet. Tabelas fora daqui carregam todas as colunas
+# com pelo menos 10% de dados válidos.
+REQUIRED_COLS = {
+    "books_data_processed": [
+        "Title_padrao", "authors_padrao", "categories_padrao",
+        "publisher_padrao", "publishedDate_padrao"
+    ],
+    "books_rating_modified": [
+        "Title", "User_id", "text", "compound", "sentimento"
+    ]
+}
+
+# Lotes lidos à frente (em outra thread) enquanto o lote atual é inserido
+PREFETCH_BATCHES = 2
+
+# Textos tratados como nulos na limpeza das colunas de string
+NULL_TOKENS = pa.array(['nan', 'None', 'null', ''])
+
+# Opções dos Parquet gerados a partir de CSV: zstd nível 3, grupos de 100 mil
+# linhas com estatísticas por coluna (leitores pulam grupos pelos min/max e a
+# carga em lotes não precisa do arquivo inteiro em memória) e páginas de 1MB
+PARQUET_WRITE_OPTIONS = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "use_dictionary": True,
+    "row_group_size": 100_000,
+    "write_statistics": True,
+    "data_page_size": 1 << 20
+}
+
+# Bytes do início de cada Parquet usados na assinatura da fonte (tabela _meta)
+SIGNATURE_HEADER_BYTES = 4096
+
+# PRAGMAs da carga em massa: páginas de 8KB (definidas antes da primeira
+# escrita; bancos existentes passam a usá-las no VACUUM final), acesso
+# exclusivo, sem fsync por lote e temporários em memória (o banco é recriado
+# do zero se a carga falhar)
+LOAD_PRAGMAS = """
+PRAGMA page_size=8192;
+PRAGMA locking_mode=EXCLUSIVE;
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=OFF;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-200000;
+"""
+
+
+def sqlite_type(arrow_type):
+    """
+    Converte um tipo Arrow no tipo de coluna SQLite (mesmo mapeamento do pandas.to_sql).
+    
+    Args:
+        arrow_type: Tipo pyarrow da coluna
+    
+    Returns:
+        str: Tipo SQLite
+    """
+    
+    if pa.types.is_integer(arrow_type) or pa.types.is_boolean(arrow_type):
+        return "INTEGER"
+    if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return "REAL"
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMP"
+    if pa.types.is_date(arrow_type):
+        return "DATE"
+    return "TEXT"
+
 
 def create_database_from_parquet(
     parquet_files,
     db_path="books_database.db",
-    if_exists="replace"
+    if_exists="replace",
+    pre_buffer=True,
+    clean=False,
+    use_duckdb=True
 ):
     """
     Carrega arquivos Parquet diretamente no SQLite.
     
+    Cada arquivo é lido em lotes (ParquetFile.iter_batches) e inserido com
+    executemany, sem passar por um DataFrame pandas do arquivo inteiro.
+    
     Args:
         parquet_files (dict): {'table_name': 'path/to/file.parquet'}
         db_path (str): Caminho para o banco SQLite
         if_exists (str): 'replace', 'append', ou 'fail'
+        pre_buffer (bool): Agrupar a leitura dos column chunks de cada row group
+            numa única requisição em background (útil em disco de rede)
+        clean (bool): Limpar strings e remover duplicatas na carga; desligado por
+            padrão porque os Parquet do pipeline já chegam limpos
+        use_duckdb (bool): Com o DuckDB instalado (e clean=False), carregar as
+            tabelas pelo DuckDB (read_parquet → SQLite); tabelas que falharem
+            são carregadas pelo caminho pyarrow
     
     Returns:
         str: Caminho do banco criado
@@ -30,65 +129,103 @@ def create_database_from_parquet(
     # Criar diretório se não existir
     os.makedirs(os.path.dirname(db_path) if os.path.dirname(db_path) else ".", exist_ok=True)
     
-    # Conectar ao SQLite
-    conn = sqlite3.connect(db_path)
-    
     print(f"Criando banco de dados: {db_path}")
     print("=" * 60)
     
+    # Carga nativa pelo DuckDB (antes de abrir a conexão exclusiva do SQLite)
+    duckdb_counts = {}
+    if use_duckdb and DUCKDB_AVAILABLE and not clean:
+        duckdb_counts = load_tables_with_duckdb(parquet_files, db_path, if_exists)
+    
+    # Conectar ao SQLite
+    conn = sqlite3.connect(db_path)
+    conn.executescript(LOAD_PRAGMAS)
+    
     try:
-        total_records = 0
+        total_records = sum(duckdb_counts.values())
+        loaded_sources = {table_name: parquet_files[table_name] for table_name in duckdb_counts}
+        
+        # Uma única transação para todas as tabelas (savepoint por tabela)
+        conn.execute("BEGIN")
         
         for table_name, parquet_path in parquet_files.items():
             
+            if table_name in duckdb_counts:
+                continue
+            
             if not os.path.exists(parquet_path):
                 print(f"Arquivo não encontrado: {parquet_path}")
                 continue
             
             print(f"📊 Carregando {table_name}...")
             
-            # Carregar Parquet
+            # Abrir Parquet (apenas metadados; os dados são lidos por lote)
             try:
-                df = pd.read_parquet(parquet_path)
+                parquet_file = pq.ParquetFile(parquet_path, pre_buffer=pre_buffer)
             except Exception as e:
                 print(f"Erro ao ler {parquet_path}: {e}")
                 continue
             
-            # Verificar se DataFrame não está vazio
-            if df.empty:
-                print(f"{table_name}: DataFrame vazio!")
+            # Verificar se arquivo não está vazio
+            if parquet_file.metadata.num_rows == 0:
+                print(f"{table_name}: arquivo vazio!")
                 continue
             
-            # Limpar dados básico
-            df = clean_dataframe(df, table_name)
-            
             # Salvar no SQLite
+            conn.execute("SAVEPOINT carga_tabela")
             try:
-                df.to_sql(
-                    name=table_name,
-                    con=conn,
-                    if_exists=if_exists,
-                    index=False,
-                    method='multi',  # Inserção otimizada
-                    chunksize=1000   # Processar em lotes
+                loaded_count, columns, size_bytes = load_parquet_table(
+                    conn, parquet_file, table_name, if_exists, clean
                 )
                 
-                print(f"   {table_name}: {len(df):,} registros carregados")
-                print(f"   Colunas: {list(df.columns)[:5]}{'...' if len(df.columns) > 5 else ''}")
-                print(f"   Tamanho: {df.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+                # Remover duplicatas se existirem
+                if clean:
+                    removed_count = remove_duplicates(conn, table_name, columns)
+                    if removed_count:
+                        print(f"   Limpeza: {loaded_count:,} → {loaded_count - removed_count:,} registros")
+                    loaded_count -= removed_count
+                
+                print(f"   {table_name}: {loaded_count:,} registros carregados")
+                print(f"   Colunas: {columns[:5]}{'...' if len(columns) > 5 else ''}")
+                print(f"   Tamanho: {size_bytes / 1024**2:.1f} MB")
                 
-                total_records += len(df)
+                total_records += loaded_count
+                loaded_sources[table_name] = parquet_path
+                conn.execute("RELEASE carga_tabela")
                 
             except Exception as e:
+                conn.execute("ROLLBACK TO carga_tabela")
+                conn.execute("RELEASE carga_tabela")
                 print(f"Erro ao salvar {table_name}: {e}")
                 continue
             
             print()
         
+        # Registrar as fontes carregadas (usado por is_database_fresh)
+        write_source_meta(conn, loaded_sources)
+        conn.commit()
+        
         # Criar índices para performance
         print("Criando índices...")
         create_indexes(conn)
         
+        # Recriar tabelas agregadas a partir dos dados recém-carregados
+        print("Criando tabelas agregadas...")
+        try:
+            created_count = create_materialized_tables(conn, rebuild=True)
+            print(f"   {created_count} tabelas agregadas criadas")
+        except sqlite3.OperationalError as e:
+            print(f"   Aviso ao criar tabelas agregadas: {e}")
+        
+        # Estatísticas para o planejador de consultas e compactação do arquivo
+        print("Otimizando banco...")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+        # Voltar ao journal padrão para o banco final ser um arquivo único
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("VACUUM")
+        
         # Estatísticas do banco
         print_database_stats(conn)
         
@@ -105,73 +242,409 @@ def create_database_from_parquet(
     return db_path
 
 
-def clean_dataframe(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+def load_parquet_table(conn, parquet_file, table_name, if_exists="replace", clean=False):
     """
-    Limpeza básica do DataFrame antes de salvar.
+    Cria a tabela a partir do schema Arrow e insere o arquivo lote a lote.
     
     Args:
-        df: DataFrame para limpar
-        table_name: Nome da tabela (para logs)
+        conn: Conexão SQLite
+        parquet_file: pyarrow.parquet.ParquetFile aberto
+        table_name: Nome da tabela
+        if_exists (str): 'replace', 'append', ou 'fail'
+        clean (bool): Limpar as colunas de string (ver clean_batch)
     
     Returns:
-        DataFrame limpo
+        tuple: (registros inseridos, colunas carregadas, tamanho em bytes dos lotes)
     """
     
-    original_size = len(df)
+    schema = parquet_file.schema_arrow
+    columns = select_columns(parquet_file, table_name)
+    
+    # Criar tabela (mesma semântica de if_exists do pandas.to_sql)
+    table_exists = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+        (table_name,)
+    ).fetchone()
+    
+    if table_exists and if_exists == "fail":
+        raise ValueError(f"Tabela '{table_name}' já existe.")
+    if table_exists and if_exists == "replace":
+        conn.execute(f'DROP TABLE "{table_name}"')
+    
+    quoted_columns = [f'"{col}"' for col in columns]
+    column_defs = ", ".join(
+        f"{quoted} {sqlite_type(schema.field(col).type)}"
+        for quoted, col in zip(quoted_columns, columns)
+    )
+    conn.execute(f'CREATE TABLE IF NOT EXISTS "{table_name}" ({column_defs})')
+    
+    insert_sql = (
+        f'INSERT INTO "{table_name}" ({", ".join(quoted_columns)}) '
+        f'VALUES ({", ".join("?" * len(columns))})'
+    )
+    
+    # Inserir lotes (dentro da transação aberta por create_database_from_parquet).
+    # Leitura + limpeza rodam numa thread de prefetch (pyarrow libera o GIL),
+    # em paralelo com a inserção do lote anterior.
+    batches = (
+        clean_batch(batch, clean)
+        for batch in parquet_file.iter_batches(
+            batch_size=BATCH_SIZE, columns=columns, use_threads=True
+        )
+    )
+    
+    totals = {'rows': 0, 'bytes': 0}
+    
+    def rows():
+        for batch in prefetch_batches(batches):
+            totals['rows'] += batch.num_rows
+            totals['bytes'] += batch.nbytes
+            yield from zip(*[col.to_pylist() for col in batch.columns])
     
-    # Remover duplicatas se existirem
-    df = df.drop_duplicates()
+    # Um único executemany por tabela: o INSERT é preparado uma vez e
+    # reaproveitado para todas as linhas
+    conn.executemany(insert_sql, rows())
     
-    # Limpar valores nulos excessivos
-    # (manter apenas colunas com pelo menos 10% de dados válidos)
-    threshold = len(df) * 0.1
-    df = df.dropna(axis=1, thresh=int(threshold))
+    return totals['rows'], columns, totals['bytes']
+
+
+def prefetch_batches(batches, depth=PREFETCH_BATCHES):
+    """
+    Consome um iterador de lotes numa thread separada, até `depth` lotes à frente.
     
-    # Converter tipos de dados problemáticos
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            # Limpar strings
-            df[col] = df[col].astype(str).str.strip()
-            # Converter 'nan' string para None
-            df[col] = df[col].replace(['nan', 'None', 'null', ''], None)
+    Erros da leitura são repassados ao consumidor; se o consumidor parar
+    antes do fim (ex.: erro no INSERT), a thread é encerrada.
     
-    cleaned_size = len(df)
+    Args:
+        batches: Iterador de lotes (ex.: ParquetFile.iter_batches)
+        depth (int): Máximo de lotes em espera
+    
+    Yields:
+        Lotes na ordem original
+    """
     
-    if cleaned_size != original_size:
-        print(f"   Limpeza: {original_size:,} → {cleaned_size:,} registros")
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
     
-    return df
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def producer():
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+            put(done)
+        except Exception as e:
+            put(e)
+    
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
 
 
-def create_indexes(conn):
+def load_tables_with_duckdb(parquet_files, db_path, if_exists="replace"):
     """
-    Cria índices úteis para consultas comuns.
+    Carrega os arquivos Parquet no SQLite pelo DuckDB (extensão sqlite).
+    
+    Cada tabela vira um único CREATE TABLE ... AS SELECT ... FROM read_parquet,
+    executado pelo DuckDB com leitura paralela e sem passar pelo Python.
+    As colunas são as mesmas do caminho pyarrow (select_columns).
     
     Args:
-        conn: Conexão SQLite
+        parquet_files (dict): {'table_name': 'path/to/file.parquet'}
+        db_path (str): Caminho para o banco SQLite
+        if_exists (str): 'replace', 'append', ou 'fail'
+    
+    Returns:
+        dict: {'table_name': registros carregados} das tabelas carregadas
     """
     
-    indexes = [
-        # Índices para books_data
-        ("idx_books_title", "books_data_processed", "Title_padrao"),
-        ("idx_books_authors", "books_data_processed", "authors_padrao"),
-        ("idx_books_categories", "books_data_processed", "categories_padrao"),
-        ("idx_books_year", "books_data_processed", "publishedDate_padrao"),
-        
-        # Índices para books_rating
-        ("idx_rating_title", "books_rating_modified", "Title"),
-        ("idx_rating_user", "books_rating_modified", "User_id"),
-        ("idx_rating_sentiment", "books_rating_modified", "sentimento"),
-        ("idx_rating_compound", "books_rating_modified", "compound"),
-        
-        # Índices compostos úteis
-        ("idx_rating_title_sentiment", "books_rating_modified", "Title, sentimento"),
-        ("idx_rating_user_sentiment", "books_rating_modified", "User_id, sentimento")
+    import duckdb
+    
+    loaded_counts = {}
+    
+    try:
+        con = duckdb.connect()
+        con.execute("INSTALL sqlite")
+        con.execute("LOAD sqlite")
+        con.execute(f"ATTACH '{db_path.replace(chr(39), chr(39) * 2)}' AS sqlitedb (TYPE sqlite)")
+    except Exception as e:
+        print(f"   Aviso: DuckDB indisponível para a carga ({e}); usando pyarrow")
+        return loaded_counts
+    
+    try:
+        for table_name, parquet_path in parquet_files.items():
+            if not os.path.exists(parquet_path):
+                continue
+            
+            print(f"📊 Carregando {table_name} (DuckDB)...")
+            
+            try:
+                parquet_file = pq.ParquetFile(parquet_path)
+                num_rows = parquet_file.metadata.num_rows
+                if num_rows == 0:
+                    continue
+                
+                columns = ", ".join(f'"{col}"' for col in select_columns(parquet_file, table_name))
+                source = f"read_parquet('{parquet_path.replace(chr(39), chr(39) * 2)}')"
+                
+                table_exists = con.execute(
+                    "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = 'sqlitedb' AND table_name = ?",
+                    [table_name]
+                ).fetchone()[0]
+                
+                if table_exists and if_exists == "fail":
+                    raise ValueError(f"Tabela '{table_name}' já existe.")
+                if table_exists and if_exists == "replace":
+                    con.execute(f'DROP TABLE sqlitedb."{table_name}"')
+                
+                if table_exists and if_exists == "append":
+                    con.execute(f'INSERT INTO sqlitedb."{table_name}" ({columns}) SELECT {columns} FROM {source}')
+                else:
+                    con.execute(f'CREATE TABLE sqlitedb."{table_name}" AS SELECT {columns} FROM {source}')
+                
+                loaded_counts[table_name] = num_rows
+                print(f"   {table_name}: {num_rows:,} registros carregados")
+                
+            except Exception as e:
+                print(f"   Erro ao carregar {table_name} com DuckDB (usando pyarrow): {e}")
+            
+            print()
+    finally:
+        con.close()
+    
+    return loaded_counts
+
+
+def select_columns(parquet_file, table_name):
+    """
+    Escolhe as colunas a carregar a partir dos metadados do Parquet.
+    
+    Para tabelas em REQUIRED_COLS lê apenas as colunas usadas pelo app.
+    Nas demais, ignora colunas de índice do pandas e mantém apenas colunas
+    com pelo menos 10% de dados válidos (contagem de nulos das estatísticas
+    dos row groups, sem ler os dados).
+    
+    Args:
+        parquet_file: pyarrow.parquet.ParquetFile aberto
+        table_name: Nome da tabela
+    
+    Returns:
+        list: Nomes das colunas
+    """
+    
+    schema = parquet_file.schema_arrow
+    metadata = parquet_file.metadata
+    
+    if table_name in REQUIRED_COLS:
+        missing = [col for col in REQUIRED_COLS[table_name] if col not in schema.names]
+        if missing:
+            print(f"   Aviso: colunas ausentes em {table_name}: {missing}")
+        return [col for col in REQUIRED_COLS[table_name] if col in schema.names]
+    
+    pandas_metadata = schema.pandas_metadata or {}
+    index_columns = [col for col in pandas_metadata.get('index_columns', []) if isinstance(col, str)]
+    
+    # Nulos por coluna somados entre os row groups (None se sem estatísticas)
+    null_counts = {}
+    for rg in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg)
+        for i in range(row_group.num_columns):
+            column = row_group.column(i)
+            name = column.path_in_schema
+            stats = column.statistics
+            if stats is None or not stats.has_null_count or null_counts.get(name, 0) is None:
+                null_counts[name] = None
+            else:
+                null_counts[name] = null_counts.get(name, 0) + stats.null_count
+    
+    threshold = int(metadata.num_rows * 0.1)
+    
+    return [
+        name for name in schema.names
+        if name not in index_columns
+        and (null_counts.get(name) is None or metadata.num_rows - null_counts[name] >= threshold)
     ]
+
+
+def clean_batch(batch: pa.RecordBatch, clean: bool = True) -> pa.RecordBatch:
+    """
+    Limpeza básica de um lote antes de salvar.
+    
+    Com clean=True, remove espaços das strings e converte 'nan', 'None',
+    'null' e '' em nulo com kernels do pyarrow.compute. Tipos sem
+    equivalente no sqlite3 (datas, decimais, listas) são sempre convertidos
+    para texto ou float.
+    
+    Args:
+        batch: Lote Arrow para limpar
+        clean: Limpar as colunas de string
+    
+    Returns:
+        Lote limpo
+    """
+    
+    arrays = []
+    
+    for col in batch.columns:
+        if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+            if not clean:
+                arrays.append(col)
+                continue
+            # Limpar strings e converter 'nan' string para None
+            col = pc.utf8_trim_whitespace(col)
+            col = pc.if_else(
+                pc.is_in(col, value_set=NULL_TOKENS.cast(col.type)),
+                pa.scalar(None, type=col.type),
+                col
+            )
+        elif pa.types.is_timestamp(col.type):
+            col = pc.strftime(
+                pc.cast(col, pa.timestamp("s", col.type.tz), safe=False),
+                format="%Y-%m-%d %H:%M:%S"
+            )
+        elif pa.types.is_date(col.type):
+            col = pc.cast(col, pa.string())
+        elif pa.types.is_decimal(col.type):
+            col = pc.cast(col, pa.float64())
+        elif pa.types.is_nested(col.type):
+            col = pa.array([None if v is None else str(v) for v in col.to_pylist()], pa.string())
+        arrays.append(col)
+    
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+def remove_duplicates(conn, table_name, columns):
+    """
+    Remove linhas duplicadas da tabela carregada (mantém a primeira).
+    
+    Args:
+        conn: Conexão SQLite
+        table_name: Nome da tabela
+        columns: Colunas comparadas
+    
+    Returns:
+        int: Número de linhas removidas
+    """
+    
+    group_by = ", ".join(f'"{col}"' for col in columns)
+    cursor = conn.execute(
+        f'DELETE FROM "{table_name}" WHERE rowid NOT IN '
+        f'(SELECT MIN(rowid) FROM "{table_name}" GROUP BY {group_by})'
+    )
+    return cursor.rowcount
+
+
+def source_signature(path):
+    """
+    Assinatura de um arquivo de dados: tamanho + hash do cabeçalho.
+    
+    Args:
+        path (str): Caminho do arquivo
+    
+    Returns:
+        str: Assinatura no formato 'tamanho:hash'
+    """
+    
+    with open(path, 'rb') as f:
+        header = f.read(SIGNATURE_HEADER_BYTES)
+    
+    return f"{os.path.getsize(path)}:{hashlib.md5(header).hexdigest()}"
+
+
+def write_source_meta(conn, parquet_files):
+    """
+    Grava na tabela _meta a assinatura de cada Parquet carregado.
+    
+    Args:
+        conn: Conexão SQLite
+        parquet_files (dict): {'table_name': 'path/to/file.parquet'}
+    """
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _meta (
+            table_name TEXT PRIMARY KEY,
+            source_path TEXT,
+            signature TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT OR REPLACE INTO _meta (table_name, source_path, signature) VALUES (?, ?, ?)",
+        [(table_name, path, source_signature(path)) for table_name, path in parquet_files.items()]
+    )
+
+
+def is_database_fresh(db_path, parquet_files):
+    """
+    Verifica se o banco já reflete os arquivos Parquet atuais.
+    
+    O banco é considerado atualizado quando é mais recente que todos os
+    arquivos e a tabela _meta tem a mesma assinatura para cada um deles.
+    
+    Args:
+        db_path (str): Caminho do banco SQLite
+        parquet_files (dict): {'table_name': 'path/to/file.parquet'}
+    
+    Returns:
+        bool: True se não é preciso recriar o banco
+    """
+    
+    if not os.path.exists(db_path):
+        return False
+    
+    newest_source = max(os.path.getmtime(path) for path in parquet_files.values())
+    if os.path.getmtime(db_path) <= newest_source:
+        return False
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            stored = dict(conn.execute("SELECT table_name, signature FROM _meta"))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        # Banco sem _meta (criado por versão anterior) ou inválido
+        return False
+    
+    return all(
+        stored.get(table_name) == source_signature(path)
+        for table_name, path in parquet_files.items()
+    )
+
+
+def create_indexes(conn):
+    """
+    Cria índices úteis para consultas comuns (lista em poc_queries.INDEXES).
+    
+    Args:
+        conn: Conexão SQLite
+    """
     
     created_count = 0
     
-    for idx_name, table, columns in indexes:
+    # Índices criados depois da carga, numa transação própria
+    conn.execute("BEGIN")
+    
+    for idx_name, table, columns in INDEXES:
         try:
             # Verificar se tabela existe
             cursor = conn.execute(
@@ -287,7 +760,7 @@ def test_database_queries(db_path):
             "name": " Livros por década",
             "sql": """
                 SELECT 
-                    (publishedDate_padrao / 10) * 10 as decada,
+                    decada,
                     COUNT(*) as num_livros
                 FROM books_data_processed 
                 WHERE publishedDate_padrao IS NOT NULL
@@ -304,10 +777,12 @@ def test_database_queries(db_path):
     for query in test_queries:
         try:
             print(f"{query['name']}:")
-            df = pd.read_sql_query(query['sql'], conn)
+            cursor = conn.execute(query['sql'])
+            columns = [col[0] for col in cursor.description]
+            rows = cursor.fetchmany(5)
             
-            if not df.empty:
-                print(df.to_string(index=False, max_rows=5))
+            if rows:
+                print_rows(columns, rows)
                 success_count += 1
             else:
                 print("   Consulta retornou vazio")
@@ -322,6 +797,46 @@ def test_database_queries(db_path):
     print(f" {success_count}/{len(test_queries)} consultas executadas com sucesso")
 
 
+def print_rows(columns, rows):
+    """
+    Imprime linhas de uma consulta como tabela alinhada à direita.
+    
+    Args:
+        columns (list): Nomes das colunas
+        rows (list): Tuplas retornadas pelo cursor
+    """
+    
+    cells = [[str(value) for value in row] for row in rows]
+    widths = [
+        max(len(column), *(len(row[i]) for row in cells))
+        for i, column in enumerate(columns)
+    ]
+    
+    print(" ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in cells:
+        print(" ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def convert_csv_to_parquet(csv_path, parquet_path):
+    """
+    Converte CSV em Parquet com o leitor multithread do pyarrow (sem pandas).
+    
+    Args:
+        csv_path (str): Arquivo CSV de origem
+        parquet_path (str): Arquivo Parquet de destino
+    """
+    
+    table = pa_csv.read_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=64 << 20)
+    )
+    
+    # Gravar em arquivo temporário para não deixar Parquet incompleto
+    tmp_path = f"{parquet_path}.part"
+    pq.write_table(table, tmp_path, **PARQUET_WRITE_OPTIONS)
+    os.replace(tmp_path, parquet_path)
+
+
 def find_data_files():
     """
     Busca arquivos de dados em locais comuns.
@@ -362,11 +877,12 @@ def find_data_files():
                     # Se for CSV, converter para Parquet
                     if filename.endswith('.csv'):
                         parquet_path = file_path.replace('.csv', '.parquet')
-                        if not os.path.exists(parquet_path):
+                        # Reconverter apenas se o CSV for mais novo que o Parquet
+                        if (not os.path.exists(parquet_path)
+                                or os.path.getmtime(parquet_path) < os.path.getmtime(file_path)):
                             print(f"   🔄 Convertendo {filename} para Parquet...")
                             try:
-                                df = pd.read_csv(file_path)
-                                df.to_parquet(parquet_path, index=False)
+                                convert_csv_to_parquet(file_path, parquet_path)
                                 found_files[table_name] = parquet_path
                                 print(f"   {filename} → {os.path.basename(parquet_path)}")
                             except Exception as e:
@@ -386,9 +902,13 @@ def find_data_files():
     return found_files
 
 
-def main():
+def main(force=False):
     """
     Função principal - configura e executa a criação do banco.
+    
+    Args:
+        force (bool): Recriar o banco mesmo que ele já esteja atualizado
+            (linha de comando: python parquet_fixed.py --force)
     """
     
     print("🚀 CRIADOR DE BANCO DE DADOS - POC LIVROS")
@@ -423,6 +943,11 @@ def main():
     # Criar banco
     db_path = "books_database.db"
     
+    # Reaproveitar o banco se os Parquet não mudaram desde a última carga
+    if not force and is_database_fresh(db_path, found_files):
+        print(f" Banco já atualizado: {db_path} (use --force para recriar)")
+        return True
+    
     try:
         create_database_from_parquet(
             parquet_files=found_files,
@@ -445,7 +970,7 @@ def main():
 
 
 if __name__ == "__main__":
-    success = main()
+    success = main(force="--force" in sys.argv[1:])
     
     if not success:
         print("\n  Processo falhou. Verifique os erros acima.")
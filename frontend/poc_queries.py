@@ -5,12 +5,29 @@ Adicionado: Funções para busca de livros e reviews para resumo IA
 """
 
 import os
+import math
+import threading
+from collections import OrderedDict
 from pathlib import Path
 import sqlite3
 import pandas as pd
+import pyarrow as pa
 
 
-def execute_query(query: str, db_path: str = "books_database.db", params: tuple = ()) -> pd.DataFrame:
+# Tipos das colunas dos DataFrames retornados pelas consultas
+DTYPE_BACKEND = "pyarrow"
+
+# Resultados recentes de execute_query: {(sql, params, caminho, mtime): pa.Table}.
+# Guardados como tabelas Arrow (mais compactas que DataFrames e sem risco de
+# o chamador alterar a cópia em cache); o mtime na chave descarta resultados
+# de um banco recriado
+QUERY_CACHE_MAX_ENTRIES = 128
+_QUERY_CACHE = OrderedDict()
+_QUERY_CACHE_LOCK = threading.Lock()
+
+
+def execute_query(query: str, db_path: str = "books_database.db", params: tuple = (),
+                  conn: sqlite3.Connection = None) -> pd.DataFrame:
     """
     Executa consulta e retorna DataFrame.
     
@@ -18,23 +35,174 @@ def execute_query(query: str, db_path: str = "books_database.db", params: tuple
         query (str): Consulta SQL
         db_path (str): Caminho para o banco de dados
         params (tuple): Parâmetros da consulta
+        conn: Conexão já aberta (ex.: open_connection) para reutilizar;
+              se None, usa a conexão compartilhada do processo (get_connection)
+    
+    Returns:
+        pd.DataFrame: Resultado da consulta (colunas com tipos PyArrow:
+                      texto em buffers Arrow, operações .str vetorizadas)
+    
+    Resultados repetidos (mesmo SQL, parâmetros e banco) vêm do cache em
+    memória do processo, sem voltar ao SQLite.
+    """
+    try:
+        cache_key = (query, tuple(params), os.path.abspath(db_path),
+                     os.path.getmtime(db_path) if os.path.exists(db_path) else 0)
+        
+        with _QUERY_CACHE_LOCK:
+            table = _QUERY_CACHE.get(cache_key)
+            if table is not None:
+                _QUERY_CACHE.move_to_end(cache_key)
+        
+        if table is not None:
+            # DataFrame novo a cada chamada (os buffers Arrow são compartilhados)
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        
+        if conn is None:
+            conn = get_connection(db_path)
+        
+        df = pd.read_sql_query(query, conn, params=params, dtype_backend=DTYPE_BACKEND)
+        
+        with _QUERY_CACHE_LOCK:
+            _QUERY_CACHE[cache_key] = pa.Table.from_pandas(df, preserve_index=False)
+            if len(_QUERY_CACHE) > QUERY_CACHE_MAX_ENTRIES:
+                _QUERY_CACHE.popitem(last=False)
+        
+        return df
+    except Exception as e:
+        print(f"Erro na consulta: {e}")
+        print(f"Query: {query[:200]}...")
+        raise
+
+
+def compact_dtypes(df: pd.DataFrame, category_columns: tuple = (), float32_columns: tuple = ()) -> pd.DataFrame:
+    """
+    Tipos compactos para DataFrames grandes exibidos no app: rótulos com
+    poucos valores distintos viram category e scores exibidos com 3 casas
+    decimais viram float32.
+    
+    Args:
+        df (pd.DataFrame): Resultado de execute_query (alterado no lugar)
+        category_columns (tuple): Colunas de rótulo
+        float32_columns (tuple): Colunas numéricas de score
     
     Returns:
-        pd.DataFrame: Resultado da consulta
+        pd.DataFrame: O próprio df
+    """
+    for column in category_columns:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    
+    for column in float32_columns:
+        if column in df.columns:
+            df[column] = df[column].astype('float32[pyarrow]')
+    
+    return df
+
+
+def register_sql_functions(conn: sqlite3.Connection) -> None:
+    """Registra funções matemáticas usadas nas consultas (LOG, LOG10, SQRT)."""
+    conn.create_function("LOG", 1, math.log)
+    conn.create_function("LOG10", 1, math.log10)
+    conn.create_function("SQRT", 1, math.sqrt)
+
+
+def open_connection(db_path: str = "books_database.db") -> sqlite3.Connection:
+    """
+    Abre uma conexão de leitura para ser reutilizada entre consultas.
+    
+    Usa WAL (leituras não bloqueiam nem são bloqueadas por escritas), cache
+    de páginas de 256MB e leitura via mmap de até 2GB, evitando reabrir o
+    arquivo e reaquecer o cache a cada consulta.
+    
+    Args:
+        db_path (str): Caminho para o banco de dados
+    
+    Returns:
+        sqlite3.Connection: Conexão configurada (pode ser usada por várias threads)
     """
-    # Verificar se banco existe
     if not os.path.exists(db_path):
         raise FileNotFoundError(f"Banco de dados não encontrado: {db_path}")
-
+    
+    # Cache de statements preparados da conexão: as consultas usam texto SQL
+    # fixo + parâmetros (?), então chamadas repetidas não reparseiam nem
+    # replanejam o SQL. 256 cobre todas as consultas do app.
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
+    
     try:
-        with sqlite3.connect(db_path) as conn:
-            # REGISTRA A FUNÇÃO LOG AO CONECTAR
-            import math
-            conn.create_function("LOG", 1, math.log)
-            conn.create_function("LOG10", 1, math.log10)
-            conn.create_function("SQRT", 1, math.sqrt)
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError as e:
+        # Banco em local somente leitura: segue no modo de journal atual
+        print(f"Aviso: não foi possível ativar WAL: {e}")
+    
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-262144")  # 256MB
+    conn.execute("PRAGMA mmap_size=2147483648")  # 2GB: arquivo inteiro mapeado, sem read() por página
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA query_only=ON")  # conexão compartilhada só lê
+    
+    register_sql_functions(conn)
+    return conn
+
+
+# Conexões compartilhadas do processo: {caminho absoluto: (mtime, conexão)}
+_CONNECTIONS = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
 
-            return pd.read_sql_query(query, conn, params=params)
+def get_connection(db_path: str = "books_database.db") -> sqlite3.Connection:
+    """
+    Conexão de leitura compartilhada (open_connection) para o banco, usada
+    por todas as sessões do app.
+    
+    Abre uma vez por processo e reaproveita entre consultas, mantendo o cache
+    de páginas do SQLite aquecido. Se o arquivo for recriado (mtime diferente),
+    a conexão antiga é fechada (libera cache e mmap) e uma nova é aberta.
+    
+    Args:
+        db_path (str): Caminho para o banco de dados
+    
+    Returns:
+        sqlite3.Connection: Conexão compartilhada (check_same_thread=False)
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Banco de dados não encontrado: {db_path}")
+    
+    key = os.path.abspath(db_path)
+    db_mtime = os.path.getmtime(db_path)
+    
+    with _CONNECTIONS_LOCK:
+        cached = _CONNECTIONS.get(key)
+        if cached is not None and cached[0] == db_mtime:
+            return cached[1]
+        
+        if cached is not None:
+            cached[1].close()
+        
+        conn = open_connection(db_path)
+        _CONNECTIONS[key] = (db_mtime, conn)
+        return conn
+
+
+def execute_query_dicts(query: str, db_path: str = "books_database.db", params: tuple = ()) -> list:
+    """
+    Executa consulta e retorna lista de dicts (uma por linha).
+    
+    Para consultas pequenas (listas de livros, buscas) em que montar um
+    DataFrame custa mais que a própria consulta.
+    
+    Args:
+        query (str): Consulta SQL
+        db_path (str): Caminho para o banco de dados
+        params (tuple): Parâmetros da consulta
+    
+    Returns:
+        list: Linhas como dicts {coluna: valor}
+    """
+    try:
+        cursor = get_connection(db_path).execute(query, params)
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
     except Exception as e:
         print(f"Erro na consulta: {e}")
         print(f"Query: {query[:200]}...")
@@ -42,45 +210,686 @@ def execute_query(query: str, db_path: str = "books_database.db", params: tuple
 
 
 # =================
-# 1. LIVROS MAIS PROBLEMÁTICOS
+# ÍNDICES
 # =================
 
-def get_problematic_books(limit: int = 20, db_path: str = "books_database.db") -> pd.DataFrame:
+# (nome, tabela, colunas): criados na carga dos dados (parquet_fixed.py) e
+# conferidos no primeiro acesso do app, pois bancos baixados prontos podem
+# não trazer todos
+INDEXES = [
+    # Índices para books_data
+    # Cobre o JOIN por título e as colunas lidas junto (reviews_fact), sem
+    # acessar a linha da tabela
+    ("idx_books_title_padrao", "books_data_processed",
+     "Title_padrao, authors_padrao, categories_padrao, publisher_padrao, publishedDate_padrao"),
+    ("idx_books_authors", "books_data_processed", "authors_padrao"),
+    ("idx_books_categories", "books_data_processed", "categories_padrao"),
+    ("idx_books_year", "books_data_processed", "publishedDate_padrao"),
+    
+    # Índices para books_rating
+    ("idx_rating_title", "books_rating_modified", "Title"),
+    ("idx_rating_user", "books_rating_modified", "User_id"),
+    ("idx_rating_sentiment", "books_rating_modified", "sentimento"),
+    ("idx_rating_compound", "books_rating_modified", "compound"),
+    
+    # Índices compostos úteis; (Title, sentimento, compound) cobre os
+    # agregados por título sem ler o texto dos reviews
+    ("idx_rating_title_sent", "books_rating_modified", "Title, sentimento, compound"),
+    ("idx_rating_user_sentiment", "books_rating_modified", "User_id, sentimento")
+]
+
+# Bancos já verificados neste processo
+_INDEXES_READY = set()
+
+# Serializa a criação de índices/tabelas agregadas entre as threads do
+# processo (as consultas do dashboard rodam em paralelo no primeiro acesso)
+_SCHEMA_LOCK = threading.Lock()
+
+
+def get_missing_indexes(conn) -> list:
     """
-    Identifica livros mais problemáticos baseado em:
-    - Alto percentual de reviews negativos
-    - Discrepância entre rating e sentimento
-    - Baixo compound score médio
+    Lista os índices de INDEXES que ainda não existem no banco.
+    Índices de tabelas inexistentes são ignorados.
     """
-    query = """
-    WITH book_metrics AS (
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    
+    return [index for index in INDEXES if index[1] in tables and index[0] not in indexes]
+
+
+def ensure_indexes(db_path: str = "books_database.db") -> int:
+    """
+    Cria os índices faltantes e atualiza as estatísticas do planejador
+    (ANALYZE). Executa uma vez por processo.
+    
+    Returns:
+        int: Número de índices criados
+    """
+    key = os.path.abspath(db_path)
+    if key in _INDEXES_READY:
+        return 0
+    
+    with _SCHEMA_LOCK:
+        # Outra thread pode ter concluído enquanto esta esperava o lock
+        if key in _INDEXES_READY:
+            return 0
+        
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Banco de dados não encontrado: {db_path}")
+        
+        with sqlite3.connect(db_path) as conn:
+            missing = get_missing_indexes(conn)
+            
+            for idx_name, table, columns in missing:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {table} ({columns})")
+            
+            if missing:
+                conn.execute("ANALYZE")
+                print(f"{len(missing)} índice(s) criado(s) em {db_path}")
+        
+        _INDEXES_READY.add(key)
+    
+    return len(missing)
+
+
+# =================
+# TABELAS AGREGADAS (MATERIALIZADAS)
+# =================
+
+# Recomendação de negócio por livro, calculada no SQL a partir de
+# sentimento_medio, positive_rate e total_reviews (usada pela análise de IA).
+# recommendation_level indica o tipo de alerta no app (success/info/error/warning)
+_BOOK_INSIGHTS_SQL = """
+            CASE
+                WHEN sentimento_medio > 0.3 AND positive_rate > 70 THEN '✅ PROMOVER - Livro com excelente recepção'
+                WHEN sentimento_medio > 0.1 AND positive_rate > 60 THEN '🔄 MANTER - Desempenho satisfatório'
+                WHEN sentimento_medio < -0.1 OR positive_rate < 40 THEN '⚠️ REVISAR - Problemas de qualidade identificados'
+                ELSE '📊 MONITORAR - Desempenho neutro'
+            END ||
+            CASE
+                WHEN total_reviews < 10 THEN ' (Poucos reviews - dados limitados)'
+                WHEN total_reviews > 100 THEN ' (Alto volume - dados confiáveis)'
+                ELSE ''
+            END as recommendation,
+            CASE
+                WHEN sentimento_medio > 0.3 AND positive_rate > 70 THEN 'Alta'
+                WHEN sentimento_medio > 0.1 AND positive_rate > 60 THEN 'Média'
+                WHEN sentimento_medio < -0.1 OR positive_rate < 40 THEN 'Alta'
+                ELSE 'Baixa'
+            END as business_priority,
+            CASE
+                WHEN sentimento_medio > 0.3 AND positive_rate > 70 THEN 'success'
+                WHEN sentimento_medio > 0.1 AND positive_rate > 60 THEN 'info'
+                WHEN sentimento_medio < -0.1 OR positive_rate < 40 THEN 'error'
+                ELSE 'warning'
+            END as recommendation_level"""
+
+# Agregados (por livro, usuário, categoria e autor) mudam apenas quando o banco
+# é recarregado (ETL em lote), então são calculados uma vez e consultados como
+# tabelas pequenas e indexadas.
+MATERIALIZED_TABLES = {
+    # Reviews já unidos aos dados do livro (Title = Title_padrao): as análises
+    # por livro/autor/categoria/editora/ano leem uma tabela só, sem refazer o
+    # JOIN por texto a cada consulta. Criada primeiro: as demais leem dela.
+    # sentimento_code (1 = positivo, -1 = negativo, 0 = neutro) troca as
+    # comparações de texto dos agregados por comparações de inteiros.
+    'reviews_fact': {
+        'sql': """
+        SELECT 
+            r.Title,
+            r.sentimento,
+            CASE r.sentimento
+                WHEN 'positivo' THEN 1
+                WHEN 'negativo' THEN -1
+                WHEN 'neutro' THEN 0
+            END as sentimento_code,
+            r.compound,
+            b.authors_padrao,
+            b.categories_padrao,
+            b.publisher_padrao,
+            b.publishedDate_padrao,
+            b.author_id,
+            b.category_id
+        FROM books_data_processed b
+        JOIN books_rating_modified r ON b.Title_padrao = r.Title
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_fact_title ON reviews_fact (Title)",
+            "CREATE INDEX IF NOT EXISTS idx_fact_year ON reviews_fact (publishedDate_padrao)",
+            "CREATE INDEX IF NOT EXISTS idx_fact_category ON reviews_fact (category_id)",
+            "CREATE INDEX IF NOT EXISTS idx_fact_publisher ON reviews_fact (publisher_padrao)"
+        ]
+    },
+    # Contagens e média de sentimento por livro, calculadas uma vez sobre
+    # reviews_fact; as tabelas e consultas por livro partem daqui
+    'book_sentiment_stats': {
+        'sql': """
         SELECT 
-            b.Title_padrao as titulo,
-            b.authors_padrao as autor,
-            b.categories_padrao as categoria,
-            COUNT(r.sentimento) as total_reviews,
+            f.Title as titulo,
+            f.authors_padrao as autor,
+            f.categories_padrao as categoria,
+            COUNT(f.sentimento) as total_reviews,
+            SUM(CASE WHEN f.sentimento_code = 1 THEN 1 ELSE 0 END) as n_pos,
+            SUM(CASE WHEN f.sentimento_code = -1 THEN 1 ELSE 0 END) as n_neg,
+            SUM(CASE WHEN f.sentimento_code = 0 THEN 1 ELSE 0 END) as n_neu,
+            AVG(f.compound) as sentimento_medio
+        FROM reviews_fact f
+        WHERE f.sentimento IS NOT NULL
+        GROUP BY f.Title, f.authors_padrao, f.categories_padrao
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_bsent_title ON book_sentiment_stats (titulo)"
+        ]
+    },
+    'book_summary_stats': {
+        'sql': f"""
+        SELECT 
+            *,
+            {_BOOK_INSIGHTS_SQL}
+        FROM (
+            SELECT 
+                *,
+                COALESCE(100.0 * positivos / NULLIF(total_reviews, 0), 0) as positive_rate,
+                COALESCE(100.0 * negativos / NULLIF(total_reviews, 0), 0) as negative_rate
+            FROM (
+                SELECT 
+                    titulo,
+                    autor,
+                    categoria,
+                    total_reviews,
+                    n_pos as positivos,
+                    n_neg as negativos,
+                    ROUND(sentimento_medio, 3) as sentimento_medio
+                FROM book_sentiment_stats
+                WHERE total_reviews >= 10  -- Mínimo para análise de IA
+            )
+        )
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_bss_total ON book_summary_stats (total_reviews DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_bss_title ON book_summary_stats (titulo)"
+        ]
+    },
+    'book_problem_stats': {
+        'sql': """
+        -- Agregados por livro (book_sentiment_stats); percentuais e score vêm deles
+        WITH base AS (
+            SELECT 
+                titulo,
+                autor,
+                categoria,
+                total_reviews,
+            
+                -- Métricas de sentimento
+                n_neg as reviews_negativos,
+                n_pos as reviews_positivos,
+                sentimento_medio as compound_medio
             
-            -- Métricas de sentimento
-            SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) as reviews_negativos,
-            SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) as reviews_positivos,
-            AVG(r.compound) as compound_medio,
+            FROM book_sentiment_stats
+            WHERE total_reviews >= 5  -- Mínimo 5 reviews para ser considerado
+        )
+        
+        SELECT 
+            titulo,
+            autor,
+            categoria,
+            total_reviews,
+            reviews_negativos,
+            reviews_positivos,
+            compound_medio,
             
             -- Percentuais
-            ROUND((SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento)), 1) as pct_negativo,
+            ROUND((reviews_negativos * 100.0 / total_reviews), 1) as pct_negativo,
             
             -- Score de problema (quanto maior, mais problemático)
             (
-                (SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento)) * 0.6 +  
-                (CASE WHEN AVG(r.compound) < 0 THEN ABS(AVG(r.compound)) * 100 ELSE 0 END) * 0.4  
+                (reviews_negativos * 100.0 / total_reviews) * 0.6 +  
+                (CASE WHEN compound_medio < 0 THEN ABS(compound_medio) * 100 ELSE 0 END) * 0.4  
             ) as problema_score
+        FROM base
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_bps_score ON book_problem_stats (problema_score DESC)"
+        ]
+    },
+    'user_diversity_stats': {
+        'sql': """
+        -- Contagens distintas calculadas uma única vez (base); score e
+        -- segmento reaproveitam as colunas em vez de repetir os agregados
+        WITH base AS (
+            SELECT 
+                User_id,
+                COUNT(*) as total_reviews,
+                COUNT(DISTINCT sentimento) as sentimentos_diversos,
+                COUNT(DISTINCT b.categoria_principal) as categorias_diversas,
             
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE r.sentimento IS NOT NULL
-        GROUP BY b.Title_padrao, b.authors_padrao, b.categories_padrao
-        HAVING total_reviews >= 5  -- Mínimo 5 reviews para ser considerado
-    )
+                -- Distribuição de sentimentos
+                SUM(CASE WHEN sentimento = 'positivo' THEN 1 ELSE 0 END) as reviews_positivos,
+                SUM(CASE WHEN sentimento = 'negativo' THEN 1 ELSE 0 END) as reviews_negativos,
+                SUM(CASE WHEN sentimento = 'neutro' THEN 1 ELSE 0 END) as reviews_neutros,
+            
+                AVG(compound) as compound_medio
+            
+            FROM books_rating_modified r
+            LEFT JOIN books_data_processed b ON r.Title = b.Title_padrao
+            WHERE User_id IS NOT NULL AND sentimento IS NOT NULL
+            GROUP BY User_id
+            HAVING total_reviews >= 3  -- Mínimo 3 reviews
+        ),
+        
+        user_metrics AS (
+            SELECT 
+                *,
+            
+                -- Score de diversidade (usuário interessante para entrevista)
+                (
+                    (total_reviews * 0.3) +  -- Volume de reviews
+                    (sentimentos_diversos * 10) +  -- Diversidade de sentimentos
+                    (categorias_diversas * 5)  -- Diversidade de categorias
+                ) as diversidade_score,
+            
+                -- Segmento do usuário
+                CASE 
+                    WHEN compound_medio > 0.3 THEN 'Otimista'
+                    WHEN compound_medio < -0.1 THEN 'Crítico'
+                    WHEN sentimentos_diversos >= 3 THEN 'Equilibrado'
+                    WHEN total_reviews > 20 THEN 'Ativo'
+                    ELSE 'Regular'
+                END as segmento
+            FROM base
+        )
+    
+        SELECT 
+            User_id,
+            segmento,
+            total_reviews,
+            sentimentos_diversos,
+            categorias_diversas,
+            reviews_positivos,
+            reviews_negativos,
+            reviews_neutros,
+            ROUND(compound_medio, 3) as compound_medio,
+            ROUND(diversidade_score, 1) as diversidade_score
+        FROM user_metrics
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_uds_score ON user_diversity_stats (diversidade_score DESC, total_reviews DESC)"
+        ]
+    },
+    # Categorias de cada livro já separadas: uma linha por (livro, categoria),
+    # com a posição na lista original ("Fiction, Drama" -> Fiction/1, Drama/2).
+    # Filtros por categoria viram buscas por igualdade no índice, sem
+    # substr/instr na consulta; posicao = 1 é a categoria principal
+    'books_category_map': {
+        'sql': """
+        WITH RECURSIVE split(Title_padrao, categoria, resto, posicao) AS (
+            SELECT Title_padrao, NULL, categories_padrao || ',', 0
+            FROM books_data_processed
+            WHERE categories_padrao IS NOT NULL AND categories_padrao != ''
+            
+            UNION ALL
+            
+            SELECT 
+                Title_padrao,
+                TRIM(substr(resto, 1, instr(resto, ',') - 1)),
+                substr(resto, instr(resto, ',') + 1),
+                posicao + 1
+            FROM split
+            WHERE resto != ''
+        )
+        
+        SELECT Title_padrao, categoria, posicao
+        FROM split
+        WHERE posicao > 0 AND categoria != ''
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_bcm_cat ON books_category_map (categoria, posicao)",
+            "CREATE INDEX IF NOT EXISTS idx_bcm_title ON books_category_map (Title_padrao)"
+        ]
+    },
+    'category_roi_stats': {
+        'sql': """
+        WITH category_metrics AS (
+            SELECT 
+                m.categoria,
+                COUNT(DISTINCT m.Title_padrao) as total_livros,
+                COUNT(r.sentimento) as total_reviews,
+                AVG(r.compound) as sentimento_medio,
+            
+                -- Engajamento médio por livro
+                ROUND(COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT m.Title_padrao), 2) as reviews_por_livro,
+            
+                -- Score de qualidade (sentimento positivo)
+                SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_positivo,
+            
+                -- ROI estimado (fórmula hipotética)
+                -- ROI = (Engajamento * Qualidade * Volume) / 100
+                ROUND(
+                    (COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT m.Title_padrao)) *  -- Engajamento
+                    (AVG(r.compound) + 1) *  -- Qualidade normalizada (0-2)
+                    LOG(COUNT(DISTINCT m.Title_padrao) + 1) /  -- Volume (log para suavizar)
+                    10, 2
+                ) as roi_estimado
+            
+            FROM books_category_map m
+            JOIN books_rating_modified r ON r.Title = m.Title_padrao
+            WHERE m.posicao = 1  -- Categoria principal do livro
+            AND r.sentimento IS NOT NULL
+            GROUP BY m.categoria
+            HAVING total_livros >= 5  -- Mínimo 5 livros na categoria
+        )
+    
+        SELECT 
+            categoria,
+            total_livros,
+            total_reviews,
+            reviews_por_livro,
+            ROUND(sentimento_medio, 3) as sentimento_medio,
+            ROUND(pct_positivo, 1) as pct_positivo,
+            roi_estimado
+        FROM category_metrics
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_crs_roi ON category_roi_stats (roi_estimado DESC)"
+        ]
+    },
+    'author_roi_stats': {
+        'sql': """
+        WITH author_metrics AS (
+            SELECT 
+                f.author_id,
+                COUNT(DISTINCT f.Title) as total_livros,
+                COUNT(f.sentimento) as total_reviews,
+                AVG(f.compound) as sentimento_medio,
+            
+                -- Engajamento médio por livro
+                ROUND(COUNT(f.sentimento) * 1.0 / COUNT(DISTINCT f.Title), 2) as reviews_por_livro,
+            
+                -- Score de qualidade
+                SUM(CASE WHEN f.sentimento_code = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(f.sentimento) as pct_positivo,
+            
+                -- ROI estimado
+                ROUND(
+                    (COUNT(f.sentimento) * 1.0 / COUNT(DISTINCT f.Title)) *  
+                    (AVG(f.compound) + 1) *  
+                    LOG(COUNT(DISTINCT f.Title) + 1) /  
+                    10, 2
+                ) as roi_estimado
+            
+            FROM reviews_fact f
+            WHERE f.author_id IS NOT NULL 
+            AND f.sentimento IS NOT NULL
+            GROUP BY f.author_id
+            HAVING total_livros >= 2  -- Mínimo 2 livros do autor
+        )
+    
+        SELECT 
+            a.name as autor,
+            total_livros,
+            total_reviews,
+            reviews_por_livro,
+            ROUND(sentimento_medio, 3) as sentimento_medio,
+            ROUND(pct_positivo, 1) as pct_positivo,
+            roi_estimado
+        FROM author_metrics m
+        JOIN authors a ON a.id = m.author_id
+        """,
+        'indexes': [
+            "CREATE INDEX IF NOT EXISTS idx_ars_roi ON author_roi_stats (roi_estimado DESC)"
+        ]
+    },
+    'sentiment_counts': {
+        'sql': """
+        SELECT 
+            sentimento,
+            COUNT(*) as quantidade,
+            ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM books_rating_modified WHERE sentimento IS NOT NULL), 1) as percentual
+        FROM books_rating_modified 
+        WHERE sentimento IS NOT NULL
+        GROUP BY sentimento
+        """,
+        'indexes': []
+    },
+    # Totais do dashboard (uma linha): só mudam quando o banco é recarregado.
+    # Os três totais de reviews saem de uma única varredura (COUNT/AVG de uma
+    # coluna já ignoram os nulos, o mesmo que os filtros IS NOT NULL)
+    'summary_stats': {
+        'sql': """
+        SELECT 
+            (SELECT COUNT(*) FROM books_data_processed) as total_books,
+            COUNT(sentimento) as total_reviews,
+            COUNT(DISTINCT User_id) as total_users,
+            ROUND(AVG(compound), 3) as avg_sentiment
+        FROM books_rating_modified
+        """,
+        'indexes': []
+    }
+}
+
+# Colunas derivadas calculadas uma vez no banco (tabela, coluna, tipo, expressão SQL, índice).
+# categoria_principal = primeira categoria de categories_padrao (antes da vírgula),
+# usada nos agrupamentos por categoria/tema sem substr/instr por linha;
+# decada = década de publicação (ex.: 1987 -> 1980).
+DERIVED_COLUMNS = [
+    ("books_data_processed", "categoria_principal", "TEXT", """
+        CASE WHEN categories_padrao IS NOT NULL AND categories_padrao != ''
+        THEN TRIM(substr(categories_padrao, 1, 
+            CASE WHEN instr(categories_padrao, ',') > 0 
+            THEN instr(categories_padrao, ',') - 1
+            ELSE length(categories_padrao)
+            END))
+        END
+    """, "idx_books_cat_principal"),
+    ("books_data_processed", "decada", "INTEGER",
+     "(publishedDate_padrao / 10) * 10", "idx_books_decada")
+]
+
+
+def create_derived_columns(conn, refresh: bool = False) -> int:
+    """
+    Adiciona e preenche as colunas de DERIVED_COLUMNS que ainda não existem.
+    
+    Args:
+        conn: Conexão SQLite
+        refresh (bool): Recalcula também as colunas já existentes (usar após recarregar os dados)
+    
+    Returns:
+        int: Número de colunas criadas
+    """
+    created_count = 0
+    
+    for table, column, column_type, expression, idx_name in DERIVED_COLUMNS:
+        existing_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if not existing_columns or (column in existing_columns and not refresh):
+            continue
+        
+        if column not in existing_columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        conn.execute(f"UPDATE {table} SET {column} = {expression}")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {table} ({column})")
+        created_count += 1
+    
+    return created_count
+
+
+# Dicionários de valores (tabela, id, coluna de origem): cada valor distinto de
+# books_data_processed.<origem> vira uma linha (id, name) e os livros guardam só
+# o id inteiro. Os agrupamentos por autor/categoria usam o id e buscam o nome
+# apenas no resultado final. Ids seguem a ordem alfabética dos nomes.
+DIMENSION_TABLES = [
+    ("authors", "author_id", "authors_padrao"),
+    ("categories", "category_id", "categoria_principal")
+]
+
+
+def create_dimension_tables(conn, refresh: bool = False) -> int:
+    """
+    Cria as tabelas de DIMENSION_TABLES e a coluna de id em books_data_processed.
+    
+    Args:
+        conn: Conexão SQLite
+        refresh (bool): Recria também as já existentes (usar após recarregar os dados)
+    
+    Returns:
+        int: Número de dicionários criados
+    """
+    book_columns = [row[1] for row in conn.execute("PRAGMA table_info(books_data_processed)")]
+    if not book_columns:
+        return 0
+    
+    created_count = 0
+    
+    for table, id_column, source_column in DIMENSION_TABLES:
+        table_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        if table_exists and id_column in book_columns and not refresh:
+            continue
+        
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"""
+            CREATE TABLE {table} AS
+            SELECT ROW_NUMBER() OVER (ORDER BY {source_column}) as id, {source_column} as name
+            FROM (
+                SELECT DISTINCT {source_column}
+                FROM books_data_processed
+                WHERE {source_column} IS NOT NULL AND {source_column} != ''
+            )
+        """)
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_name ON {table} (name)")
+        
+        if id_column not in book_columns:
+            conn.execute(f"ALTER TABLE books_data_processed ADD COLUMN {id_column} INTEGER")
+        conn.execute(f"""
+            UPDATE books_data_processed
+            SET {id_column} = (SELECT id FROM {table} WHERE name = books_data_processed.{source_column})
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_books_{id_column} ON books_data_processed ({id_column})")
+        created_count += 1
+    
+    return created_count
+
+
+def create_search_index(conn, refresh: bool = False) -> bool:
+    """
+    Cria o índice de busca textual books_fts (FTS5, tokenizador trigram) sobre
+    título e autores de books_data_processed. O trigram aceita busca por
+    trecho no meio da palavra, a mesma semântica do LIKE '%termo%'.
+    
+    Args:
+        conn: Conexão SQLite
+        refresh (bool): Reindexa também se já existir (usar após recarregar os dados)
+    
+    Returns:
+        bool: True se o índice foi criado/reindexado
+    """
+    index_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+    ).fetchone()
+    if index_exists and not refresh:
+        return False
+    
+    try:
+        # Conteúdo externo: o índice guarda só os trigramas, o texto fica na tabela
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+                Title_padrao, authors_padrao,
+                content='books_data_processed', tokenize='trigram'
+            )
+        """)
+        conn.execute("INSERT INTO books_fts(books_fts) VALUES('rebuild')")
+    except sqlite3.OperationalError as e:
+        # SQLite sem FTS5/trigram (< 3.34): a busca segue com LIKE
+        print(f"Aviso: índice de busca não criado: {e}")
+        return False
+    
+    return True
+
+
+# Bancos já verificados neste processo
+_MATERIALIZED_READY = set()
+
+
+def create_materialized_tables(conn, rebuild: bool = False) -> int:
+    """
+    Cria as tabelas agregadas que ainda não existem no banco.
+    
+    Args:
+        conn: Conexão SQLite
+        rebuild (bool): Recria todas as tabelas (usar após recarregar os dados)
+    
+    Returns:
+        int: Número de tabelas criadas
+    """
+    created_count = 0
+    
+    # LOG usado nas fórmulas de ROI (logaritmo natural, não o LOG base 10 do SQLite)
+    register_sql_functions(conn)
+    
+    # As agregações por categoria/autor dependem de categoria_principal e dos ids
+    create_derived_columns(conn, refresh=rebuild)
+    create_dimension_tables(conn, refresh=rebuild)
+    create_search_index(conn, refresh=rebuild)
+    
+    for table_name, spec in MATERIALIZED_TABLES.items():
+        if rebuild:
+            conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+        
+        existing_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+        if existing_columns:
+            # Tabela criada por uma versão anterior da consulta: recriar
+            expected_columns = [col[0] for col in conn.execute(f"SELECT * FROM ({spec['sql']}) LIMIT 0").description]
+            if existing_columns != expected_columns:
+                conn.execute(f"DROP TABLE {table_name}")
+                existing_columns = []
+        
+        if not existing_columns:
+            conn.execute(f"CREATE TABLE {table_name} AS {spec['sql']}")
+            created_count += 1
+        
+        # IF NOT EXISTS: tabelas já existentes recebem índices adicionados depois
+        for index_sql in spec['indexes']:
+            conn.execute(index_sql)
     
+    conn.commit()
+    return created_count
+
+
+def ensure_materialized_tables(db_path: str = "books_database.db") -> None:
+    """
+    Garante que as tabelas agregadas existem (executa uma vez por processo).
+    
+    Bancos baixados prontos (ex.: Google Drive) não trazem estas tabelas,
+    então elas são criadas no primeiro uso.
+    """
+    key = os.path.abspath(db_path)
+    if key in _MATERIALIZED_READY:
+        return
+    
+    with _SCHEMA_LOCK:
+        # Outra thread pode ter criado as tabelas enquanto esta esperava o lock
+        if key in _MATERIALIZED_READY:
+            return
+        
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Banco de dados não encontrado: {db_path}")
+        
+        with sqlite3.connect(db_path) as conn:
+            created_count = create_materialized_tables(conn)
+        
+        if created_count:
+            print(f"{created_count} tabela(s) agregada(s) criada(s) em {db_path}")
+        
+        _MATERIALIZED_READY.add(key)
+
+
+# =================
+# 1. LIVROS MAIS PROBLEMÁTICOS
+# =================
+
+# Livros ordenados pelo score de problema (limitado por ?), lidos da
+# tabela agregada book_problem_stats pelo índice do score
+_PROBLEMATIC_BOOKS_SQL = """
     SELECT 
         titulo,
         autor,
@@ -90,78 +899,61 @@ def get_problematic_books(limit: int = 20, db_path: str = "books_database.db") -
         pct_negativo,
         ROUND(compound_medio, 3) as compound_medio,
         ROUND(problema_score, 1) as problema_score
-    FROM book_metrics
+    FROM book_problem_stats
     ORDER BY problema_score DESC
     LIMIT ?
+"""
+
+
+# Contagem por nível de risco sobre o mesmo conjunto de _PROBLEMATIC_BOOKS_SQL
+_PROBLEM_RISK_BUCKETS_SQL = f"""
+    SELECT 
+        COALESCE(SUM(CASE WHEN problema_score > 50 THEN 1 ELSE 0 END), 0) as alto,
+        COALESCE(SUM(CASE WHEN problema_score > 25 AND problema_score <= 50 THEN 1 ELSE 0 END), 0) as medio,
+        COALESCE(SUM(CASE WHEN problema_score <= 25 THEN 1 ELSE 0 END), 0) as baixo
+    FROM ({_PROBLEMATIC_BOOKS_SQL})
+"""
+
+
+def get_problematic_books(limit: int = 20, db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> pd.DataFrame:
+    """
+    Identifica livros mais problemáticos baseado em:
+    - Alto percentual de reviews negativos
+    - Discrepância entre rating e sentimento
+    - Baixo compound score médio
+    """
+    ensure_materialized_tables(db_path)
+    return execute_query(_PROBLEMATIC_BOOKS_SQL, db_path, (limit,), conn=conn)
+
+
+def get_problem_risk_buckets(limit: int = 20, db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> dict:
+    """
+    Contagem dos livros por nível de risco entre os `limit` mais problemáticos
+    (mesmo conjunto de get_problematic_books), calculada no próprio SQL.
+    
+    Returns:
+        Dict com 'alto' (score > 50), 'medio' (25 < score <= 50) e 'baixo' (score <= 25)
     """
+    ensure_materialized_tables(db_path)
     
-    return execute_query(query, db_path, (limit,))
+    result = execute_query(_PROBLEM_RISK_BUCKETS_SQL, db_path, (limit,), conn=conn)
+    return {key: int(value) for key, value in result.iloc[0].items()}
 
 
 # =================
 # 2. USUÁRIOS PARA ENTREVISTA
 # =================
 
-def get_users_for_interview(limit: int = 50, db_path: str = "books_database.db") -> pd.DataFrame:
+def get_users_for_interview(limit: int = 50, db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> pd.DataFrame:
     """
     Lista usuários segmentados para entrevista baseado em:
     - Volume de reviews
     - Diversidade de sentimentos
     - Atividade em categorias diferentes
     """
-    query = """
-    WITH user_metrics AS (
-        SELECT 
-            User_id,
-            COUNT(*) as total_reviews,
-            COUNT(DISTINCT sentimento) as sentimentos_diversos,
-            COUNT(DISTINCT 
-                CASE WHEN b.categories_padrao IS NOT NULL AND b.categories_padrao != ''
-                THEN substr(b.categories_padrao, 1, 
-                    CASE WHEN instr(b.categories_padrao, ',') > 0 
-                    THEN instr(b.categories_padrao, ',') - 1
-                    ELSE length(b.categories_padrao)
-                    END)
-                END
-            ) as categorias_diversas,
-            
-            -- Distribuição de sentimentos
-            SUM(CASE WHEN sentimento = 'positivo' THEN 1 ELSE 0 END) as reviews_positivos,
-            SUM(CASE WHEN sentimento = 'negativo' THEN 1 ELSE 0 END) as reviews_negativos,
-            SUM(CASE WHEN sentimento = 'neutro' THEN 1 ELSE 0 END) as reviews_neutros,
-            
-            AVG(compound) as compound_medio,
-            
-            -- Score de diversidade (usuário interessante para entrevista)
-            (
-                (COUNT(*) * 0.3) +  -- Volume de reviews
-                (COUNT(DISTINCT sentimento) * 10) +  -- Diversidade de sentimentos
-                (COUNT(DISTINCT 
-                    CASE WHEN b.categories_padrao IS NOT NULL AND b.categories_padrao != ''
-                    THEN substr(b.categories_padrao, 1, 
-                        CASE WHEN instr(b.categories_padrao, ',') > 0 
-                        THEN instr(b.categories_padrao, ',') - 1
-                        ELSE length(b.categories_padrao)
-                        END)
-                    END) * 5)  -- Diversidade de categorias
-            ) as diversidade_score,
-            
-            -- Segmento do usuário
-            CASE 
-                WHEN AVG(compound) > 0.3 THEN 'Otimista'
-                WHEN AVG(compound) < -0.1 THEN 'Crítico'
-                WHEN COUNT(DISTINCT sentimento) >= 3 THEN 'Equilibrado'
-                WHEN COUNT(*) > 20 THEN 'Ativo'
-                ELSE 'Regular'
-            END as segmento
-            
-        FROM books_rating_modified r
-        LEFT JOIN books_data_processed b ON r.Title = b.Title_padrao
-        WHERE User_id IS NOT NULL AND sentimento IS NOT NULL
-        GROUP BY User_id
-        HAVING total_reviews >= 3  -- Mínimo 3 reviews
-    )
+    ensure_materialized_tables(db_path)
     
+    query = """
     SELECT 
         User_id,
         segmento,
@@ -171,137 +963,74 @@ def get_users_for_interview(limit: int = 50, db_path: str = "books_database.db")
         reviews_positivos,
         reviews_negativos,
         reviews_neutros,
-        ROUND(compound_medio, 3) as compound_medio,
-        ROUND(diversidade_score, 1) as diversidade_score
-    FROM user_metrics
+        compound_medio,
+        diversidade_score
+    FROM user_diversity_stats
     ORDER BY diversidade_score DESC, total_reviews DESC
     LIMIT ?
     """
     
-    return execute_query(query, db_path, (limit,))
+    return execute_query(query, db_path, (limit,), conn=conn)
 
 
 # =================
 # 3. ROI POR CATEGORIA/AUTOR
 # =================
 
-def get_roi_by_category(db_path: str = "books_database.db") -> pd.DataFrame:
+def get_roi_by_category(limit: int = 20, db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> pd.DataFrame:
     """
     Calcula ROI estimado por categoria baseado em:
     - Volume de livros
     - Sentimento médio dos reviews
     - Engajamento (número de reviews)
     """
-    query = """
-    WITH category_metrics AS (
-        SELECT 
-            TRIM(substr(b.categories_padrao, 1, 
-                CASE WHEN instr(b.categories_padrao, ',') > 0 
-                THEN instr(b.categories_padrao, ',') - 1
-                ELSE length(b.categories_padrao)
-                END)) as categoria_principal,
-            COUNT(DISTINCT b.Title_padrao) as total_livros,
-            COUNT(r.sentimento) as total_reviews,
-            AVG(r.compound) as sentimento_medio,
-            
-            -- Engajamento médio por livro
-            ROUND(COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao), 2) as reviews_por_livro,
-            
-            -- Score de qualidade (sentimento positivo)
-            SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_positivo,
-            
-            -- ROI estimado (fórmula hipotética)
-            -- ROI = (Engajamento * Qualidade * Volume) / 100
-            ROUND(
-                (COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao)) *  -- Engajamento
-                (AVG(r.compound) + 1) *  -- Qualidade normalizada (0-2)
-                LOG(COUNT(DISTINCT b.Title_padrao) + 1) /  -- Volume (log para suavizar)
-                10, 2
-            ) as roi_estimado
-            
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE b.categories_padrao IS NOT NULL 
-        AND b.categories_padrao != ''
-        AND r.sentimento IS NOT NULL
-        GROUP BY categoria_principal
-        HAVING total_livros >= 5  -- Mínimo 5 livros na categoria
-        AND categoria_principal IS NOT NULL
-        AND categoria_principal != ''
-    )
+    ensure_materialized_tables(db_path)
     
+    query = """
     SELECT 
-        categoria_principal as categoria,
+        categoria,
         total_livros,
         total_reviews,
         reviews_por_livro,
-        ROUND(sentimento_medio, 3) as sentimento_medio,
-        ROUND(pct_positivo, 1) as pct_positivo,
+        sentimento_medio,
+        pct_positivo,
         roi_estimado
-    FROM category_metrics
+    FROM category_roi_stats
     ORDER BY roi_estimado DESC
-    LIMIT 20
+    LIMIT ?
     """
     
-    return execute_query(query, db_path)
+    return execute_query(query, db_path, (limit,), conn=conn)
 
 
-def get_roi_by_author(limit: int = 20, db_path: str = "books_database.db") -> pd.DataFrame:
+def get_roi_by_author(limit: int = 20, db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> pd.DataFrame:
     """
     Calcula ROI estimado por autor baseado em métricas similares.
     """
-    query = """
-    WITH author_metrics AS (
-        SELECT 
-            b.authors_padrao as autor,
-            COUNT(DISTINCT b.Title_padrao) as total_livros,
-            COUNT(r.sentimento) as total_reviews,
-            AVG(r.compound) as sentimento_medio,
-            
-            -- Engajamento médio por livro
-            ROUND(COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao), 2) as reviews_por_livro,
-            
-            -- Score de qualidade
-            SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_positivo,
-            
-            -- ROI estimado
-            ROUND(
-                (COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao)) *  
-                (AVG(r.compound) + 1) *  
-                LOG(COUNT(DISTINCT b.Title_padrao) + 1) /  
-                10, 2
-            ) as roi_estimado
-            
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE b.authors_padrao IS NOT NULL 
-        AND b.authors_padrao != ''
-        AND r.sentimento IS NOT NULL
-        GROUP BY b.authors_padrao
-        HAVING total_livros >= 2  -- Mínimo 2 livros do autor
-    )
+    ensure_materialized_tables(db_path)
     
+    query = """
     SELECT 
         autor,
         total_livros,
         total_reviews,
         reviews_por_livro,
-        ROUND(sentimento_medio, 3) as sentimento_medio,
-        ROUND(pct_positivo, 1) as pct_positivo,
+        sentimento_medio,
+        pct_positivo,
         roi_estimado
-    FROM author_metrics
+    FROM author_roi_stats
     ORDER BY roi_estimado DESC
     LIMIT ?
     """
     
-    return execute_query(query, db_path, (limit,))
+    return execute_query(query, db_path, (limit,), conn=conn)
 
 
 # =================
 # 4. DISCREPÂNCIAS SCORE VS SENTIMENTO
 # =================
 
-def get_sentiment_discrepancies(limit: int = 50, db_path: str = "books_database.db") -> pd.DataFrame:
+def get_sentiment_discrepancies(limit: int = 50, db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> pd.DataFrame:
     """
     Detecta discrepâncias entre score compound e classificação de sentimento.
     Casos onde a classificação automática pode estar errada.
@@ -372,89 +1101,87 @@ def get_sentiment_discrepancies(limit: int = 50, db_path: str = "books_database.
     LIMIT ?
     """
     
-    return execute_query(query, db_path, (limit,))
+    df = execute_query(query, db_path, (limit,), conn=conn)
+    return compact_dtypes(
+        df,
+        category_columns=('sentimento_classificado', 'sentimento_esperado', 'nivel_discrepancia'),
+        float32_columns=('compound_score', 'score_discrepancia')
+    )
 
 
 # =================
 # 6. ANÁLISE DE DESEMPENHO DE LIVROS
 # =================
 
-def get_best_worst_books(limit: int = 20, db_path: str = "books_database.db") -> dict:
+def split_best_worst(df: pd.DataFrame, limit: int, best_columns: list, worst_columns: list) -> dict:
+    """
+    Separa o resultado de uma consulta única (performance_score e
+    problema_score na mesma linha) nos `limit` melhores e piores.
+    
+    Args:
+        df (pd.DataFrame): Resultado com as duas colunas de score
+        limit (int): Itens em cada lista
+        best_columns (list): Colunas exibidas na lista de melhores
+        worst_columns (list): Colunas exibidas na lista de piores
+    
+    Returns:
+        dict: {'melhores': DataFrame, 'piores': DataFrame}
+    """
+    # Ordenação estável: empates mantêm a ordem do agrupamento, como no ORDER BY
+    best = df.sort_values('performance_score', ascending=False, kind='stable').head(limit)
+    worst = df.sort_values('problema_score', ascending=False, kind='stable').head(limit)
+    
+    return {
+        'melhores': best[best_columns].reset_index(drop=True),
+        'piores': worst[worst_columns].reset_index(drop=True)
+    }
+
+
+def get_best_worst_books(limit: int = 20, db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> dict:
     """
     Identifica livros com melhor e pior desempenho - SQLite compatible
     """
+    # book_sentiment_stats é criada junto com as tabelas agregadas
+    ensure_materialized_tables(db_path)
     
-    # Query para melhores livros
-    best_query = """
+    # Uma leitura calcula os dois scores; melhores e piores são separados em Python
+    query = """
     WITH book_performance AS (
         SELECT 
-            b.Title_padrao as titulo,
-            b.authors_padrao as autor,
-            b.categories_padrao as categoria,
-            COUNT(r.sentimento) as total_reviews,
-            AVG(r.compound) as sentimento_medio,
-            SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_positivo,
+            titulo,
+            autor,
+            categoria,
+            total_reviews,
+            sentimento_medio,
+            n_pos * 100.0 / total_reviews as pct_positivo,
+            n_neg * 100.0 / total_reviews as pct_negativo,
             
             -- Score de performance (sem LOG)
             (
-                (AVG(r.compound) + 1) * 50 +  -- Sentimento normalizado (0-100)
-                (SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento)) * 0.3 +  -- % positivo
+                (sentimento_medio + 1) * 50 +  -- Sentimento normalizado (0-100)
+                (n_pos * 100.0 / total_reviews) * 0.3 +  -- % positivo
                 (CASE 
-                    WHEN COUNT(r.sentimento) <= 10 THEN 5
-                    WHEN COUNT(r.sentimento) <= 50 THEN 15
-                    WHEN COUNT(r.sentimento) <= 100 THEN 25
+                    WHEN total_reviews <= 10 THEN 5
+                    WHEN total_reviews <= 50 THEN 15
+                    WHEN total_reviews <= 100 THEN 25
                     ELSE 35
                 END)  -- Volume escalonado
-            ) as performance_score
-            
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE r.sentimento IS NOT NULL
-        GROUP BY b.Title_padrao, b.authors_padrao, b.categories_padrao
-        HAVING total_reviews >= 10  -- Mínimo 10 reviews
-    )
-    
-    SELECT 
-        titulo,
-        autor,
-        categoria,
-        total_reviews,
-        ROUND(sentimento_medio, 3) as sentimento_medio,
-        ROUND(pct_positivo, 1) as pct_positivo,
-        ROUND(performance_score, 1) as performance_score
-    FROM book_performance
-    ORDER BY performance_score DESC
-    LIMIT ?
-    """
-    
-    # Query para piores livros
-    worst_query = """
-    WITH book_performance AS (
-        SELECT 
-            b.Title_padrao as titulo,
-            b.authors_padrao as autor,
-            b.categories_padrao as categoria,
-            COUNT(r.sentimento) as total_reviews,
-            AVG(r.compound) as sentimento_medio,
-            SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_negativo,
+            ) as performance_score,
             
             -- Score de problema (sem LOG)
             (
-                (1 - AVG(r.compound)) * 50 +  -- Sentimento ruim normalizado
-                (SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento)) * 0.5 +  -- % negativo
+                (1 - sentimento_medio) * 50 +  -- Sentimento ruim normalizado
+                (n_neg * 100.0 / total_reviews) * 0.5 +  -- % negativo
                 (CASE 
-                    WHEN COUNT(r.sentimento) <= 10 THEN 2
-                    WHEN COUNT(r.sentimento) <= 50 THEN 6
-                    WHEN COUNT(r.sentimento) <= 100 THEN 10
+                    WHEN total_reviews <= 10 THEN 2
+                    WHEN total_reviews <= 50 THEN 6
+                    WHEN total_reviews <= 100 THEN 10
                     ELSE 14
                 END)  -- Volume
             ) as problema_score
             
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE r.sentimento IS NOT NULL
-        GROUP BY b.Title_padrao, b.authors_padrao, b.categories_padrao
-        HAVING total_reviews >= 10
+        FROM book_sentiment_stats
+        WHERE total_reviews >= 10  -- Mínimo 10 reviews
     )
     
     SELECT 
@@ -463,113 +1190,96 @@ def get_best_worst_books(limit: int = 20, db_path: str = "books_database.db") ->
         categoria,
         total_reviews,
         ROUND(sentimento_medio, 3) as sentimento_medio,
+        ROUND(pct_positivo, 1) as pct_positivo,
         ROUND(pct_negativo, 1) as pct_negativo,
+        ROUND(performance_score, 1) as performance_score,
         ROUND(problema_score, 1) as problema_score
     FROM book_performance
-    ORDER BY problema_score DESC
-    LIMIT ?
     """
     
-    best_books = execute_query(best_query, db_path, (limit,))
-    worst_books = execute_query(worst_query, db_path, (limit,))
+    books = execute_query(query, db_path, conn=conn)
     
-    return {
-        'melhores': best_books,
-        'piores': worst_books
-    }
+    columns = ['titulo', 'autor', 'categoria', 'total_reviews', 'sentimento_medio']
+    return split_best_worst(
+        books, limit,
+        columns + ['pct_positivo', 'performance_score'],
+        columns + ['pct_negativo', 'problema_score']
+    )
 
 # =================
 # 7. ANÁLISE DE DESEMPENHO DE EDITORAS
 # =================
 
-def get_best_worst_publishers(limit: int = 15, db_path: str = "books_database.db") -> dict:
+def get_best_worst_publishers(limit: int = 15, db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> dict:
     """
     Identifica editoras com melhor e pior desempenho - SQLite compatible
     """
+    # reviews_fact é criada junto com as tabelas agregadas
+    ensure_materialized_tables(db_path)
     
-    # Query para melhores editoras
-    best_query = """
+    # Uma leitura calcula os dois scores; melhores e piores são separados em Python
+    query = """
     WITH publisher_performance AS (
         SELECT 
-            b.publisher_padrao as editora,
-            COUNT(DISTINCT b.Title_padrao) as total_livros,
-            COUNT(r.sentimento) as total_reviews,
-            AVG(r.compound) as sentimento_medio,
-            SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_positivo,
-            ROUND(COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao), 1) as reviews_por_livro,
+            f.publisher_padrao as editora,
+            COUNT(DISTINCT f.Title) as total_livros,
+            COUNT(f.sentimento) as total_reviews,
+            AVG(f.compound) as sentimento_medio,
+            SUM(CASE WHEN f.sentimento_code = 1 THEN 1 ELSE 0 END) as positivos,
+            SUM(CASE WHEN f.sentimento_code = -1 THEN 1 ELSE 0 END) as negativos
+        FROM reviews_fact f
+        WHERE f.publisher_padrao IN (
+            -- Pré-seleção só com books_data_processed: editoras com menos de
+            -- 3 títulos nunca passam no HAVING e nem entram no agrupamento
+            SELECT publisher_padrao
+            FROM books_data_processed
+            WHERE publisher_padrao IS NOT NULL AND publisher_padrao != ''
+            GROUP BY publisher_padrao
+            HAVING COUNT(DISTINCT Title_padrao) >= 3
+        )
+        AND f.sentimento IS NOT NULL
+        GROUP BY f.publisher_padrao
+        HAVING total_livros >= 3  -- Mínimo 3 livros
+        AND total_reviews >= 20   -- Mínimo 20 reviews
+    ),
+    
+    publisher_scores AS (
+        SELECT 
+            *,
+            positivos * 100.0 / total_reviews as pct_positivo,
+            negativos * 100.0 / total_reviews as pct_negativo,
+            ROUND(total_reviews * 1.0 / total_livros, 1) as reviews_por_livro,
             
             -- Score de performance da editora (sem LOG)
             (
-                (AVG(r.compound) + 1) * 40 +  -- Qualidade do sentimento
-                (SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento)) * 0.4 +  -- % positivo
+                (sentimento_medio + 1) * 40 +  -- Qualidade do sentimento
+                (positivos * 100.0 / total_reviews) * 0.4 +  -- % positivo
                 (CASE 
-                    WHEN COUNT(DISTINCT b.Title_padrao) <= 3 THEN 10
-                    WHEN COUNT(DISTINCT b.Title_padrao) <= 10 THEN 20
-                    WHEN COUNT(DISTINCT b.Title_padrao) <= 20 THEN 30
+                    WHEN total_livros <= 3 THEN 10
+                    WHEN total_livros <= 10 THEN 20
+                    WHEN total_livros <= 20 THEN 30
                     ELSE 40
                 END) +  -- Volume de livros
                 (CASE 
-                    WHEN COUNT(r.sentimento) <= 20 THEN 5
-                    WHEN COUNT(r.sentimento) <= 100 THEN 15
-                    WHEN COUNT(r.sentimento) <= 500 THEN 25
+                    WHEN total_reviews <= 20 THEN 5
+                    WHEN total_reviews <= 100 THEN 15
+                    WHEN total_reviews <= 500 THEN 25
                     ELSE 35
                 END)  -- Engajamento
-            ) as performance_score
-            
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE r.sentimento IS NOT NULL
-        AND b.publisher_padrao IS NOT NULL
-        AND b.publisher_padrao != ''
-        GROUP BY b.publisher_padrao
-        HAVING total_livros >= 3  -- Mínimo 3 livros
-        AND total_reviews >= 20   -- Mínimo 20 reviews
-    )
-    
-    SELECT 
-        editora,
-        total_livros,
-        total_reviews,
-        reviews_por_livro,
-        ROUND(sentimento_medio, 3) as sentimento_medio,
-        ROUND(pct_positivo, 1) as pct_positivo,
-        ROUND(performance_score, 1) as performance_score
-    FROM publisher_performance
-    ORDER BY performance_score DESC
-    LIMIT ?
-    """
-    
-    # Query para piores editoras
-    worst_query = """
-    WITH publisher_performance AS (
-        SELECT 
-            b.publisher_padrao as editora,
-            COUNT(DISTINCT b.Title_padrao) as total_livros,
-            COUNT(r.sentimento) as total_reviews,
-            AVG(r.compound) as sentimento_medio,
-            SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_negativo,
-            ROUND(COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao), 1) as reviews_por_livro,
+            ) as performance_score,
             
             -- Score de problema da editora (sem LOG)
             (
-                (1 - AVG(r.compound)) * 40 +  -- Sentimento ruim
-                (SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento)) * 0.6 +  -- % negativo
+                (1 - sentimento_medio) * 40 +  -- Sentimento ruim
+                (negativos * 100.0 / total_reviews) * 0.6 +  -- % negativo
                 (CASE 
-                    WHEN COUNT(DISTINCT b.Title_padrao) <= 3 THEN 5
-                    WHEN COUNT(DISTINCT b.Title_padrao) <= 10 THEN 10
-                    WHEN COUNT(DISTINCT b.Title_padrao) <= 20 THEN 15
+                    WHEN total_livros <= 3 THEN 5
+                    WHEN total_livros <= 10 THEN 10
+                    WHEN total_livros <= 20 THEN 15
                     ELSE 20
                 END)  -- Volume
             ) as problema_score
-            
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE r.sentimento IS NOT NULL
-        AND b.publisher_padrao IS NOT NULL
-        AND b.publisher_padrao != ''
-        GROUP BY b.publisher_padrao
-        HAVING total_livros >= 3
-        AND total_reviews >= 20
+        FROM publisher_performance
     )
     
     SELECT 
@@ -578,171 +1288,146 @@ def get_best_worst_publishers(limit: int = 15, db_path: str = "books_database.db
         total_reviews,
         reviews_por_livro,
         ROUND(sentimento_medio, 3) as sentimento_medio,
+        ROUND(pct_positivo, 1) as pct_positivo,
         ROUND(pct_negativo, 1) as pct_negativo,
+        ROUND(performance_score, 1) as performance_score,
         ROUND(problema_score, 1) as problema_score
-    FROM publisher_performance
-    ORDER BY problema_score DESC
-    LIMIT ?
+    FROM publisher_scores
     """
     
-    best_publishers = execute_query(best_query, db_path, (limit,))
-    worst_publishers = execute_query(worst_query, db_path, (limit,))
+    publishers = execute_query(query, db_path, conn=conn)
     
-    return {
-        'melhores': best_publishers,
-        'piores': worst_publishers
-    }
+    columns = ['editora', 'total_livros', 'total_reviews', 'reviews_por_livro', 'sentimento_medio']
+    return split_best_worst(
+        publishers, limit,
+        columns + ['pct_positivo', 'performance_score'],
+        columns + ['pct_negativo', 'problema_score']
+    )
 
 
 # =================
 # 8. ANÁLISE DE DESEMPENHO POR TEMAS/CATEGORIAS
 # =================
 
-def get_best_worst_themes(limit: int = 15, db_path: str = "books_database.db") -> dict:
+def get_best_worst_themes(limit: int = 15, db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> dict:
     """
     Identifica temas/categorias com melhor e pior desempenho.
     """
+    # categories/category_id são criados junto com as tabelas agregadas
+    ensure_materialized_tables(db_path)
     
-    # Query para melhores temas
-    best_query = """
+    # Uma leitura calcula os dois scores; melhores e piores são separados em Python
+    query = """
     WITH theme_performance AS (
         SELECT 
-            TRIM(substr(b.categories_padrao, 1, 
-                CASE WHEN instr(b.categories_padrao, ',') > 0 
-                THEN instr(b.categories_padrao, ',') - 1
-                ELSE length(b.categories_padrao)
-                END)) as tema,
-            COUNT(DISTINCT b.Title_padrao) as total_livros,
-            COUNT(r.sentimento) as total_reviews,
-            AVG(r.compound) as sentimento_medio,
-            SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_positivo,
-            ROUND(COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao), 1) as reviews_por_livro,
-            
-            -- Score de performance do tema
-            (
-                (AVG(r.compound) + 1) * 45 +  -- Qualidade
-                (SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento)) * 0.3 +  -- % positivo
-                LOG(COUNT(DISTINCT b.Title_padrao) + 1) * 8 +  -- Volume
-                (COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao)) * 2  -- Engajamento
-            ) as performance_score
-            
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE r.sentimento IS NOT NULL
-        AND b.categories_padrao IS NOT NULL
-        AND b.categories_padrao != ''
-        GROUP BY tema
+            f.category_id,
+            COUNT(DISTINCT f.Title) as total_livros,
+            COUNT(f.sentimento) as total_reviews,
+            AVG(f.compound) as sentimento_medio,
+            SUM(CASE WHEN f.sentimento_code = 1 THEN 1 ELSE 0 END) as positivos,
+            SUM(CASE WHEN f.sentimento_code = -1 THEN 1 ELSE 0 END) as negativos
+        FROM reviews_fact f
+        WHERE f.category_id IN (
+            -- Pré-seleção só com books_data_processed: categorias com menos
+            -- de 5 títulos nunca passam no HAVING
+            SELECT category_id
+            FROM books_data_processed
+            WHERE category_id IS NOT NULL
+            GROUP BY category_id
+            HAVING COUNT(DISTINCT Title_padrao) >= 5
+        )
+        AND f.sentimento IS NOT NULL
+        GROUP BY f.category_id
         HAVING total_livros >= 5  -- Mínimo 5 livros
         AND total_reviews >= 30   -- Mínimo 30 reviews
-        AND tema IS NOT NULL
-        AND tema != ''
-    )
-    
-    SELECT 
-        tema,
-        total_livros,
-        total_reviews,
-        reviews_por_livro,
-        ROUND(sentimento_medio, 3) as sentimento_medio,
-        ROUND(pct_positivo, 1) as pct_positivo,
-        ROUND(performance_score, 1) as performance_score
-    FROM theme_performance
-    ORDER BY performance_score DESC
-    LIMIT ?
-    """
+    ),
     
-    # Query para piores temas
-    worst_query = """
-    WITH theme_performance AS (
+    theme_scores AS (
         SELECT 
-            TRIM(substr(b.categories_padrao, 1, 
-                CASE WHEN instr(b.categories_padrao, ',') > 0 
-                THEN instr(b.categories_padrao, ',') - 1
-                ELSE length(b.categories_padrao)
-                END)) as tema,
-            COUNT(DISTINCT b.Title_padrao) as total_livros,
-            COUNT(r.sentimento) as total_reviews,
-            AVG(r.compound) as sentimento_medio,
-            SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_negativo,
-            ROUND(COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao), 1) as reviews_por_livro,
+            *,
+            positivos * 100.0 / total_reviews as pct_positivo,
+            negativos * 100.0 / total_reviews as pct_negativo,
+            ROUND(total_reviews * 1.0 / total_livros, 1) as reviews_por_livro,
+            
+            -- Score de performance do tema
+            (
+                (sentimento_medio + 1) * 45 +  -- Qualidade
+                (positivos * 100.0 / total_reviews) * 0.3 +  -- % positivo
+                LOG(total_livros + 1) * 8 +  -- Volume
+                (total_reviews * 1.0 / total_livros) * 2  -- Engajamento
+            ) as performance_score,
             
             -- Score de problema do tema
             (
-                (1 - AVG(r.compound)) * 45 +  -- Sentimento ruim
-                (SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento)) * 0.5 +  -- % negativo
-                LOG(COUNT(DISTINCT b.Title_padrao) + 1) * 5  -- Volume
+                (1 - sentimento_medio) * 45 +  -- Sentimento ruim
+                (negativos * 100.0 / total_reviews) * 0.5 +  -- % negativo
+                LOG(total_livros + 1) * 5  -- Volume
             ) as problema_score
-            
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE r.sentimento IS NOT NULL
-        AND b.categories_padrao IS NOT NULL
-        AND b.categories_padrao != ''
-        GROUP BY tema
-        HAVING total_livros >= 5
-        AND total_reviews >= 30
-        AND tema IS NOT NULL
-        AND tema != ''
+        FROM theme_performance
     )
     
     SELECT 
-        tema,
+        c.name as tema,
         total_livros,
         total_reviews,
         reviews_por_livro,
         ROUND(sentimento_medio, 3) as sentimento_medio,
+        ROUND(pct_positivo, 1) as pct_positivo,
         ROUND(pct_negativo, 1) as pct_negativo,
+        ROUND(performance_score, 1) as performance_score,
         ROUND(problema_score, 1) as problema_score
-    FROM theme_performance
-    ORDER BY problema_score DESC
-    LIMIT ?
+    FROM theme_scores t
+    JOIN categories c ON c.id = t.category_id
+    ORDER BY t.category_id
     """
     
-    best_themes = execute_query(best_query, db_path, (limit,))
-    worst_themes = execute_query(worst_query, db_path, (limit,))
+    themes = execute_query(query, db_path, conn=conn)
     
-    return {
-        'melhores': best_themes,
-        'piores': worst_themes
-    }
+    columns = ['tema', 'total_livros', 'total_reviews', 'reviews_por_livro', 'sentimento_medio']
+    return split_best_worst(
+        themes, limit,
+        columns + ['pct_positivo', 'performance_score'],
+        columns + ['pct_negativo', 'problema_score']
+    )
 
 
 # =================
 # 9. ANÁLISE TEMPORAL DE REVIEWS
 # =================
 
-def get_reviews_by_period(db_path: str = "books_database.db") -> pd.DataFrame:
+def get_reviews_by_period(db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> pd.DataFrame:
     """
     Analisa distribuição de reviews ao longo do tempo.
     """
+    # reviews_fact é criada junto com as tabelas agregadas
+    ensure_materialized_tables(db_path)
     query = """
     WITH period_analysis AS (
         SELECT 
-            b.publishedDate_padrao as ano_publicacao,
+            f.publishedDate_padrao as ano_publicacao,
             
             -- Classificar em períodos
             CASE 
-                WHEN b.publishedDate_padrao >= 2020 THEN '2020+'
-                WHEN b.publishedDate_padrao >= 2015 THEN '2015-2019'
-                WHEN b.publishedDate_padrao >= 2010 THEN '2010-2014'
-                WHEN b.publishedDate_padrao >= 2005 THEN '2005-2009'
-                WHEN b.publishedDate_padrao >= 2000 THEN '2000-2004'
-                WHEN b.publishedDate_padrao >= 1990 THEN '1990-1999'
+                WHEN f.publishedDate_padrao >= 2020 THEN '2020+'
+                WHEN f.publishedDate_padrao >= 2015 THEN '2015-2019'
+                WHEN f.publishedDate_padrao >= 2010 THEN '2010-2014'
+                WHEN f.publishedDate_padrao >= 2005 THEN '2005-2009'
+                WHEN f.publishedDate_padrao >= 2000 THEN '2000-2004'
+                WHEN f.publishedDate_padrao >= 1990 THEN '1990-1999'
                 ELSE 'Antes de 1990'
             END as periodo,
             
-            COUNT(DISTINCT b.Title_padrao) as total_livros,
-            COUNT(r.sentimento) as total_reviews,
-            AVG(r.compound) as sentimento_medio,
-            SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_positivo,
-            SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_negativo,
-            ROUND(COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao), 1) as reviews_por_livro
+            COUNT(DISTINCT f.Title) as total_livros,
+            COUNT(f.sentimento) as total_reviews,
+            AVG(f.compound) as sentimento_medio,
+            SUM(CASE WHEN f.sentimento_code = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(f.sentimento) as pct_positivo,
+            SUM(CASE WHEN f.sentimento_code = -1 THEN 1 ELSE 0 END) * 100.0 / COUNT(f.sentimento) as pct_negativo,
+            ROUND(COUNT(f.sentimento) * 1.0 / COUNT(DISTINCT f.Title), 1) as reviews_por_livro
             
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE r.sentimento IS NOT NULL
-        AND b.publishedDate_padrao IS NOT NULL
-        AND b.publishedDate_padrao > 1950  -- Filtrar anos muito antigos/inválidos
+        FROM reviews_fact f
+        WHERE f.sentimento IS NOT NULL
+        AND f.publishedDate_padrao IS NOT NULL
+        AND f.publishedDate_padrao > 1950  -- Filtrar anos muito antigos/inválidos
         GROUP BY periodo
         HAVING total_livros >= 10  -- Mínimo de livros por período
     )
@@ -768,61 +1453,63 @@ def get_reviews_by_period(db_path: str = "books_database.db") -> pd.DataFrame:
         END
     """
     
-    return execute_query(query, db_path)
+    return execute_query(query, db_path, conn=conn)
 
 
-def get_reviews_by_year(start_year: int = 2000, db_path: str = "books_database.db") -> pd.DataFrame:
+def get_reviews_by_year(start_year: int = 2000, db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> pd.DataFrame:
     """
     Análise detalhada de reviews por ano específico.
     """
+    # reviews_fact é criada junto com as tabelas agregadas
+    ensure_materialized_tables(db_path)
     query = """
     SELECT 
-        b.publishedDate_padrao as ano,
-        COUNT(DISTINCT b.Title_padrao) as total_livros,
-        COUNT(r.sentimento) as total_reviews,
-        AVG(r.compound) as sentimento_medio,
-        SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) as reviews_positivos,
-        SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) as reviews_negativos,
-        SUM(CASE WHEN r.sentimento = 'neutro' THEN 1 ELSE 0 END) as reviews_neutros,
-        ROUND(COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao), 1) as reviews_por_livro
+        f.publishedDate_padrao as ano,
+        COUNT(DISTINCT f.Title) as total_livros,
+        COUNT(f.sentimento) as total_reviews,
+        AVG(f.compound) as sentimento_medio,
+        SUM(CASE WHEN f.sentimento_code = 1 THEN 1 ELSE 0 END) as reviews_positivos,
+        SUM(CASE WHEN f.sentimento_code = -1 THEN 1 ELSE 0 END) as reviews_negativos,
+        SUM(CASE WHEN f.sentimento_code = 0 THEN 1 ELSE 0 END) as reviews_neutros,
+        ROUND(COUNT(f.sentimento) * 1.0 / COUNT(DISTINCT f.Title), 1) as reviews_por_livro
         
-    FROM books_data_processed b
-    LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-    WHERE r.sentimento IS NOT NULL
-    AND b.publishedDate_padrao >= ?
-    AND b.publishedDate_padrao <= 2024  -- Até ano atual
-    GROUP BY b.publishedDate_padrao
+    FROM reviews_fact f
+    WHERE f.sentimento IS NOT NULL
+    AND f.publishedDate_padrao >= ?
+    AND f.publishedDate_padrao <= 2024  -- Até ano atual
+    GROUP BY f.publishedDate_padrao
     HAVING total_livros >= 5  -- Mínimo de livros por ano
     ORDER BY ano DESC
     """
     
-    return execute_query(query, db_path, (start_year,))
+    return execute_query(query, db_path, (start_year,), conn=conn)
 
 
-def get_trending_analysis(db_path: str = "books_database.db") -> dict:
+def get_trending_analysis(db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> dict:
     """
     Análise de tendências: compara períodos recentes vs antigos.
     """
+    # reviews_fact é criada junto com as tabelas agregadas
+    ensure_materialized_tables(db_path)
     query = """
     WITH period_comparison AS (
         SELECT 
             CASE 
-                WHEN b.publishedDate_padrao >= 2015 THEN 'Recente (2015+)'
-                WHEN b.publishedDate_padrao >= 2000 THEN 'Médio (2000-2014)'
+                WHEN f.publishedDate_padrao >= 2015 THEN 'Recente (2015+)'
+                WHEN f.publishedDate_padrao >= 2000 THEN 'Médio (2000-2014)'
                 ELSE 'Antigo (antes 2000)'
             END as categoria_periodo,
             
-            COUNT(DISTINCT b.Title_padrao) as total_livros,
-            COUNT(r.sentimento) as total_reviews,
-            AVG(r.compound) as sentimento_medio,
-            SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) * 100.0 / COUNT(r.sentimento) as pct_positivo,
-            ROUND(COUNT(r.sentimento) * 1.0 / COUNT(DISTINCT b.Title_padrao), 1) as reviews_por_livro
+            COUNT(DISTINCT f.Title) as total_livros,
+            COUNT(f.sentimento) as total_reviews,
+            AVG(f.compound) as sentimento_medio,
+            SUM(CASE WHEN f.sentimento_code = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(f.sentimento) as pct_positivo,
+            ROUND(COUNT(f.sentimento) * 1.0 / COUNT(DISTINCT f.Title), 1) as reviews_por_livro
             
-        FROM books_data_processed b
-        LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-        WHERE r.sentimento IS NOT NULL
-        AND b.publishedDate_padrao IS NOT NULL
-        AND b.publishedDate_padrao > 1980
+        FROM reviews_fact f
+        WHERE f.sentimento IS NOT NULL
+        AND f.publishedDate_padrao IS NOT NULL
+        AND f.publishedDate_padrao > 1980
         GROUP BY categoria_periodo
     )
     
@@ -835,7 +1522,7 @@ def get_trending_analysis(db_path: str = "books_database.db") -> dict:
         END
     """
     
-    result = execute_query(query, db_path)
+    result = execute_query(query, db_path, conn=conn)
     
     # Calcular tendências
     if len(result) >= 2:
@@ -857,58 +1544,114 @@ def get_trending_analysis(db_path: str = "books_database.db") -> dict:
     
     return {'dados': result, 'tendencias': {}}
 
-def search_books_for_summary(query_text: str, limit: int = 10, db_path: str = "books_database.db") -> pd.DataFrame:
+def search_books_for_summary(query_text: str, limit: int = 10, db_path: str = "books_database.db") -> list:
     """
     Busca livros por título ou autor para análise de resumo.
     """
-    query = """
+    # reviews_fact e books_fts são criados junto com as tabelas agregadas
+    ensure_materialized_tables(db_path)
+    
+    search_term = f"%{query_text}%"
+    params = (search_term, search_term, limit)
+    candidates = ""
+    
+    # Termos de 3+ caracteres sem curingas do LIKE: o índice trigram reduz a
+    # busca aos títulos candidatos; o LIKE abaixo continua valendo sobre eles
+    if len(query_text) >= 3 and not any(c in query_text for c in '%_') and get_connection(db_path).execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+    ).fetchone():
+        candidates = "f.Title IN (SELECT Title_padrao FROM books_fts WHERE books_fts MATCH ?) AND"
+        phrase = query_text.replace('"', '""')
+        params = (f'{{Title_padrao authors_padrao}} : "{phrase}"',) + params
+    
+    query = f"""
     SELECT DISTINCT
-        b.Title_padrao as titulo,
-        b.authors_padrao as autor,
-        b.categories_padrao as categoria,
-        b.publishedDate_padrao as ano,
-        COUNT(r.sentimento) as total_reviews,
-        SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) as positivos,
-        SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) as negativos,
-        SUM(CASE WHEN r.sentimento = 'neutro' THEN 1 ELSE 0 END) as neutros,
-        ROUND(AVG(r.compound), 3) as sentimento_medio
-    FROM books_data_processed b
-    LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-    WHERE (
-        LOWER(b.Title_padrao) LIKE LOWER(?) OR 
-        LOWER(b.authors_padrao) LIKE LOWER(?)
+        f.Title as titulo,
+        f.authors_padrao as autor,
+        f.categories_padrao as categoria,
+        f.publishedDate_padrao as ano,
+        COUNT(f.sentimento) as total_reviews,
+        SUM(CASE WHEN f.sentimento_code = 1 THEN 1 ELSE 0 END) as positivos,
+        SUM(CASE WHEN f.sentimento_code = -1 THEN 1 ELSE 0 END) as negativos,
+        SUM(CASE WHEN f.sentimento_code = 0 THEN 1 ELSE 0 END) as neutros,
+        ROUND(AVG(f.compound), 3) as sentimento_medio
+    FROM reviews_fact f
+    WHERE {candidates} (
+        LOWER(f.Title) LIKE LOWER(?) OR 
+        LOWER(f.authors_padrao) LIKE LOWER(?)
     )
-    AND r.sentimento IS NOT NULL
-    GROUP BY b.Title_padrao, b.authors_padrao, b.categories_padrao, b.publishedDate_padrao
+    AND f.sentimento IS NOT NULL
+    GROUP BY f.Title, f.authors_padrao, f.categories_padrao, f.publishedDate_padrao
     HAVING total_reviews >= 5  -- Mínimo 5 reviews para análise
     ORDER BY total_reviews DESC
     LIMIT ?
     """
     
-    search_term = f"%{query_text}%"
-    return execute_query(query, db_path, (search_term, search_term, limit))
+    return execute_query_dicts(query, db_path, params)
+
+
+def get_top_books_for_summary(limit: int = 20, db_path: str = "books_database.db") -> list:
+    """
+    Livros com mais reviews (mínimo 10) para análise de IA.
+    Lê a tabela agregada book_summary_stats em vez de reagrupar os reviews.
+    """
+    ensure_materialized_tables(db_path)
+    
+    query = """
+    SELECT 
+        titulo,
+        autor,
+        categoria,
+        total_reviews,
+        positivos,
+        negativos,
+        sentimento_medio,
+        positive_rate,
+        negative_rate,
+        recommendation,
+        business_priority,
+        recommendation_level
+    FROM book_summary_stats
+    ORDER BY total_reviews DESC
+    LIMIT ?
+    """
+    
+    return execute_query_dicts(query, db_path, (limit,))
 
 
 def get_book_info(book_title: str, db_path: str = "books_database.db") -> dict:
     """
     Obtém informações detalhadas de um livro específico.
+    Inclui taxas de reviews positivos/negativos e a recomendação de negócio.
     """
-    query = """
-    SELECT DISTINCT
-        b.Title_padrao as titulo,
-        b.authors_padrao as autor,
-        b.categories_padrao as categoria,
-        b.publishedDate_padrao as ano_publicacao,
-        COUNT(r.sentimento) as total_reviews,
-        SUM(CASE WHEN r.sentimento = 'positivo' THEN 1 ELSE 0 END) as total_positivos,
-        SUM(CASE WHEN r.sentimento = 'negativo' THEN 1 ELSE 0 END) as total_negativos,
-        SUM(CASE WHEN r.sentimento = 'neutro' THEN 1 ELSE 0 END) as total_neutros,
-        ROUND(AVG(r.compound), 3) as sentimento_medio
-    FROM books_data_processed b
-    LEFT JOIN books_rating_modified r ON b.Title_padrao = r.Title
-    WHERE b.Title_padrao = ?
-    AND r.sentimento IS NOT NULL
-    GROUP BY b.Title_padrao, b.authors_padrao, b.categories_padrao, b.publishedDate_padrao
+    # reviews_fact é criada junto com as tabelas agregadas
+    ensure_materialized_tables(db_path)
+    query = f"""
+    SELECT 
+        *,
+        {_BOOK_INSIGHTS_SQL}
+    FROM (
+        SELECT 
+            *,
+            COALESCE(100.0 * total_positivos / NULLIF(total_reviews, 0), 0) as positive_rate,
+            COALESCE(100.0 * total_negativos / NULLIF(total_reviews, 0), 0) as negative_rate
+        FROM (
+            SELECT DISTINCT
+                f.Title as titulo,
+                f.authors_padrao as autor,
+                f.categories_padrao as categoria,
+                f.publishedDate_padrao as ano_publicacao,
+                COUNT(f.sentimento) as total_reviews,
+                SUM(CASE WHEN f.sentimento_code = 1 THEN 1 ELSE 0 END) as total_positivos,
+                SUM(CASE WHEN f.sentimento_code = -1 THEN 1 ELSE 0 END) as total_negativos,
+                SUM(CASE WHEN f.sentimento_code = 0 THEN 1 ELSE 0 END) as total_neutros,
+                ROUND(AVG(f.compound), 3) as sentimento_medio
+            FROM reviews_fact f
+            WHERE f.Title = ?
+            AND f.sentimento IS NOT NULL
+            GROUP BY f.Title, f.authors_padrao, f.categories_padrao, f.publishedDate_padrao
+        )
+    )
     """
     
     result = execute_query(query, db_path, (book_title,))
@@ -919,100 +1662,119 @@ def get_book_info(book_title: str, db_path: str = "books_database.db") -> dict:
         return {}
 
 
-def get_reviews_by_sentiment(book_title: str, sentiment: str, limit: int = 10, db_path: str = "books_database.db") -> list:
+def _get_top_reviews(book_title: str, limits: dict, db_path: str = "books_database.db",
+                     max_chars: int = None) -> dict:
     """
-    Obtém reviews de um livro filtrados por sentimento.
+    Reviews mais "extremos" (maior |compound|) de cada sentimento em uma única consulta.
     
-    Args:
-        book_title: Título do livro
-        sentiment: 'positivo', 'negativo' ou 'neutro'
-        limit: Número máximo de reviews
-        db_path: Caminho do banco
+    ROW_NUMBER() por sentimento limita o resultado ao número de linhas de
+    cada sentimento em limits ({'positivo': n, 'negativo': n, 'neutro': n}).
+    Com max_chars, os textos já saem cortados nesse tamanho.
     
     Returns:
-        Lista de reviews
+        Dict com listas de reviews por sentimento
     """
     query = """
-    SELECT 
-        text as review_text,
-        compound,
-        sentimento
-    FROM books_rating_modified
-    WHERE Title = ?
-    AND sentimento = ?
-    AND text IS NOT NULL
-    AND LENGTH(TRIM(text)) > 20  -- Reviews com conteúdo mínimo
-    ORDER BY ABS(compound) DESC  -- Reviews mais "extremos" primeiro
-    LIMIT ?
+    SELECT sentimento, review_text
+    FROM (
+        SELECT 
+            sentimento,
+            SUBSTR(text, 1, COALESCE(?, LENGTH(text))) as review_text,
+            ROW_NUMBER() OVER (PARTITION BY sentimento ORDER BY ABS(compound) DESC) as rn
+        FROM books_rating_modified
+        WHERE Title = ?
+        AND sentimento IN ('positivo', 'negativo', 'neutro')
+        AND text IS NOT NULL
+        AND LENGTH(TRIM(text)) > 20  -- Reviews com conteúdo mínimo
+    )
+    WHERE rn <= CASE sentimento WHEN 'positivo' THEN ? WHEN 'negativo' THEN ? ELSE ? END
+    ORDER BY sentimento, rn
     """
     
-    result = execute_query(query, db_path, (book_title, sentiment, limit))
+    params = (max_chars, book_title, limits['positivo'], limits['negativo'], limits['neutro'])
+    result = execute_query(query, db_path, params)
     
-    if not result.empty:
-        return result['review_text'].tolist()
-    else:
-        return []
+    reviews_data = {'positivos': [], 'negativos': [], 'neutros': []}
+    for sentiment, review_text in zip(result['sentimento'], result['review_text']):
+        reviews_data[sentiment + 's'].append(review_text)
+    
+    return reviews_data
 
 
 def get_all_reviews_for_book(book_title: str, db_path: str = "books_database.db") -> dict:
     """
-    Obtém todos os reviews de um livro organizados por sentimento.
+    Obtém os reviews mais "extremos" de um livro, organizados por sentimento.
+    
+    Não traz todos os reviews: até 10 positivos, 10 negativos e 5 neutros,
+    com o texto completo.
     
     Returns:
         Dict com listas de reviews por sentimento
     """
-    reviews_data = {
-        'positivos': get_reviews_by_sentiment(book_title, 'positivo', 10, db_path),
-        'negativos': get_reviews_by_sentiment(book_title, 'negativo', 10, db_path),
-        'neutros': get_reviews_by_sentiment(book_title, 'neutro', 5, db_path)
-    }
+    return _get_top_reviews(book_title, {'positivo': 10, 'negativo': 10, 'neutro': 5}, db_path)
+
+
+def get_top_reviews_for_summary(book_title: str, per_bucket: int = 16, db_path: str = "books_database.db",
+                                max_chars: int = 200) -> dict:
+    """
+    Obtém os reviews mais "extremos" de cada sentimento em uma única consulta.
     
-    return reviews_data
+    Limitado a per_bucket linhas por sentimento, independente do volume de
+    reviews do livro. per_bucket fica acima dos 8 reviews usados no prompt
+    para sobrar margem após a remoção de duplicatas. Os textos já saem
+    cortados em max_chars caracteres (o trecho usado no prompt).
+    
+    Args:
+        book_title: Título do livro
+        per_bucket: Número máximo de reviews por sentimento
+        db_path: Caminho do banco
+        max_chars: Tamanho máximo de cada review retornado
+    
+    Returns:
+        Dict com listas de reviews por sentimento
+    """
+    limits = {'positivo': per_bucket, 'negativo': per_bucket, 'neutro': per_bucket}
+    return _get_top_reviews(book_title, limits, db_path, max_chars)
 
 
 # =================
 # FUNÇÕES AUXILIARES PARA DASHBOARD
 # =================
 
-def get_summary_stats(db_path: str = "books_database.db") -> dict:
+def get_summary_stats(db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> dict:
     """
     Estatísticas gerais para o dashboard.
+    Lê a tabela agregada summary_stats (calculada uma vez por carga do banco).
     """
-    queries = {
-        'total_books': "SELECT COUNT(*) as count FROM books_data_processed",
-        'total_reviews': "SELECT COUNT(*) as count FROM books_rating_modified WHERE sentimento IS NOT NULL",
-        'total_users': "SELECT COUNT(DISTINCT User_id) as count FROM books_rating_modified WHERE User_id IS NOT NULL",
-        'avg_sentiment': "SELECT ROUND(AVG(compound), 3) as avg FROM books_rating_modified WHERE compound IS NOT NULL"
-    }
+    keys = ['total_books', 'total_reviews', 'total_users', 'avg_sentiment']
     
-    stats = {}
-    for key, query in queries.items():
-        try:
-            result = execute_query(query, db_path)
-            stats[key] = result.iloc[0].values[0] if not result.empty else 0
-        except Exception as e:
-            print(f"Erro ao calcular {key}: {e}")
-            stats[key] = 0
+    try:
+        ensure_materialized_tables(db_path)
+        result = execute_query(f"SELECT {', '.join(keys)} FROM summary_stats", db_path, conn=conn)
+    except Exception as e:
+        print(f"Erro ao calcular estatísticas gerais: {e}")
+        return {key: 0 for key in keys}
+    
+    if result.empty:
+        return {key: 0 for key in keys}
     
-    return stats
+    return {key: result[key].iloc[0] for key in keys}
 
 
-def get_sentiment_distribution(db_path: str = "books_database.db") -> pd.DataFrame:
+def get_sentiment_distribution(db_path: str = "books_database.db", conn: sqlite3.Connection = None) -> pd.DataFrame:
     """
     Distribuição geral de sentimentos para gráficos.
+    Lê a tabela agregada sentiment_counts (uma linha por sentimento).
     """
+    ensure_materialized_tables(db_path)
+    
     query = """
-    SELECT 
-        sentimento,
-        COUNT(*) as quantidade,
-        ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM books_rating_modified WHERE sentimento IS NOT NULL), 1) as percentual
-    FROM books_rating_modified 
-    WHERE sentimento IS NOT NULL
-    GROUP BY sentimento
+    SELECT sentimento, quantidade, percentual
+    FROM sentiment_counts
     ORDER BY quantidade DESC
     """
     
-    return execute_query(query, db_path)
+    return execute_query(query, db_path, conn=conn)
 
 
 # =================
@@ -1125,8 +1887,8 @@ if __name__ == "__main__":
             books = search_books_for_summary("Harry Potter", limit=3, db_path=db_path)
             print(f"Livros encontrados na busca: {len(books)}")
             
-            if not books.empty:
-                first_book = books.iloc[0]['titulo']
+            if books:
+                first_book = books[0]['titulo']
                 book_info = get_book_info(first_book, db_path)
                 print(f"Info do livro '{first_book}': {book_info.get('total_reviews', 0)} reviews")
                 